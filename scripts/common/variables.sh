@@ -108,6 +108,14 @@ MQTT_IGNORED_TOPICS=(
 # Convertir en string pour l'export (séparateur |)
 MQTT_IGNORED_TOPICS_STRING=$(IFS='|'; echo "${MQTT_IGNORED_TOPICS[*]}")
 
+# ===============================================================================
+# CONFIGURATION DES COLLECTEURS
+# ===============================================================================
+
+# Tous les collecteurs dans un seul processus (maxlink-widget-host)
+# false : un service systemd par widget
+WIDGETS_HOST_ENABLED=true
+
 # ===============================================================================
 # CONFIGURATION NGINX
 # ===============================================================================
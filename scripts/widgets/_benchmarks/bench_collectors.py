@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Suite de benchmarks des collecteurs (servermonitoring, wifistats, mqttstats)
+Chaque collecteur tourne contre un broker MQTT en mémoire, des /proc et /sys
+factices, la fixture iw/nl80211 de wifistats et un dnsmasq.leases factice.
+Mesures : temps CPU et allocations par tick, publications/s, débit de
+_on_message à 1k/10k/100k msg/s et RSS. Résultats écrits en JSON et
+comparables entre deux versions (--compare)
+
+Usage : python3 bench_collectors.py [--ticks N] [--rates 1000,10000,100000] [--duration S]
+                                    [--collectors servermonitoring,wifistats,mqttstats]
+                                    [--output fichier.json] [--compare ancien.json] [--threshold 10]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+
+import psutil
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+WIDGETS_DIR = os.path.dirname(BENCH_DIR)
+for widget in ('servermonitoring', 'wifistats', 'mqttstats'):
+    sys.path.insert(0, os.path.join(WIDGETS_DIR, widget))
+
+from fakebroker import FakeBroker
+from fakesystem import FakeSystem
+from bench_mqttstats_on_message import generate_traffic
+
+from servermonitoring_collector import SystemMetricsCollector
+from wifistats_collector import WiFiStatsCollector
+from mqttstats_collector import MQTTStatsCollector
+from procfs import CPUSampler, PseudoFile, probe_cpu_thermal_zone, probe_cpufreq_policies
+from profiler import PROFILE_DIR
+from mqtt_manager import get_connection_manager
+
+WIFI_FIXTURE = os.path.join(WIDGETS_DIR, 'wifistats', 'fixtures', 'ap_two_stations.json')
+
+COLLECTORS = ('servermonitoring', 'wifistats', 'mqttstats')
+
+# Métriques comparées entre deux résultats : (sens, écart absolu ignoré)
+# sens 1 = plus haut est mieux, -1 = plus bas est mieux
+COMPARED = {
+    'cpu_us_mean': (-1, 0),
+    'cpu_us_p95': (-1, 0),
+    'wall_us_mean': (-1, 0),
+    'wall_us_p95': (-1, 0),
+    'publishes_per_s': (1, 0),
+    'alloc_bytes_per_tick': (-1, 1024),
+    'retained_bytes_per_tick': (-1, 256),
+    'rss_delta_kib': (-1, 256),
+    'us_per_message': (-1, 0),
+    'worker_cpu_pct': (-1, 0),
+    'dropped': (-1, 0),
+    'errors': (-1, 0)
+}
+
+class Message:
+    """Message reçu (attributs lus par on_mqtt_message)"""
+    
+    __slots__ = ('topic', 'payload')
+    
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))] if ordered else None
+
+def rss_kib():
+    """RSS du processus (lu dans le vrai /proc : psutil pointe vers l'arborescence factice)"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize() // 1024
+
+def write_config(widget, workdir, port, **collector):
+    """Copie de la configuration du widget pointant vers le broker en mémoire"""
+    with open(os.path.join(WIDGETS_DIR, widget, f"{widget}_widget.json")) as f:
+        config = json.load(f)
+    
+    config['mqtt']['broker'].update(host='127.0.0.1', port=port)
+    config['collector'].update(collector)
+    
+    path = os.path.join(workdir, f"{widget}-{'-'.join(map(str, collector.values())) or 'default'}.json")
+    with open(path, 'w') as f:
+        json.dump(config, f)
+    return path
+
+def point_to_fake_system(collector, system):
+    """Remplace initialize() de servermonitoring : capteurs lus dans l'arborescence factice"""
+    temp_path = probe_cpu_thermal_zone(system.thermal_dir)
+    collector.temp_file = PseudoFile(temp_path) if temp_path else None
+    collector.freq_files = [PseudoFile(path) for path in probe_cpufreq_policies(system.cpufreq_dir)]
+    collector.uptime_file = PseudoFile(system.uptime_path)
+    collector.cpu_sampler = CPUSampler(ewma_alpha=collector.cpu_sampler.ewma_alpha, path=system.stat_path)
+
+def make_tick(collector):
+    """Un tick = une exécution de chaque tâche du collecteur, horodatage partagé"""
+    tasks = collector.get_tasks()
+    serializer = collector.serializer
+    
+    def tick():
+        serializer.begin_tick()
+        try:
+            for _, _, callback in tasks:
+                callback()
+        finally:
+            serializer.end_tick()
+    return tick
+
+def bench_ticks(collector, system, broker, ticks, alloc_ticks):
+    """Temps CPU, allocations et publications par tick (ticks enchaînés sans attente)"""
+    tick = make_tick(collector)
+    
+    # Échauffement : caches, premiers échantillons CPU, bande morte
+    for _ in range(5):
+        system.advance()
+        tick()
+    
+    cpu, wall = [], []
+    sent = collector.stats['messages_sent']
+    received = broker.received
+    
+    for _ in range(ticks):
+        system.advance()
+        cpu_start = time.thread_time()
+        wall_start = time.perf_counter()
+        tick()
+        wall.append(time.perf_counter() - wall_start)
+        cpu.append(time.thread_time() - cpu_start)
+    
+    published = collector.stats['messages_sent'] - sent
+    delivered = broker.wait_for(received + published)
+    
+    # Passe séparée : tracemalloc fausserait les temps
+    peaks = []
+    tracemalloc.start()
+    try:
+        retained_start = tracemalloc.get_traced_memory()[0]
+        for _ in range(alloc_ticks):
+            system.advance()
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            tick()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        retained = tracemalloc.get_traced_memory()[0] - retained_start
+    finally:
+        tracemalloc.stop()
+    
+    return {
+        "ticks": ticks,
+        "cpu_us_mean": round(sum(cpu) / ticks * 1e6, 1),
+        "cpu_us_p95": round(percentile(cpu, 0.95) * 1e6, 1),
+        "wall_us_mean": round(sum(wall) / ticks * 1e6, 1),
+        "wall_us_p95": round(percentile(wall, 0.95) * 1e6, 1),
+        "publishes_per_tick": round(published / ticks, 2),
+        "publishes_per_s": round(published / sum(wall), 1),
+        "delivered": delivered,
+        "alloc_bytes_per_tick": round(sum(peaks) / alloc_ticks) if alloc_ticks else None,
+        "retained_bytes_per_tick": round(retained / alloc_ticks) if alloc_ticks else None
+    }
+
+def bench_ingest(collector, messages, rate, duration):
+    """Messages injectés à débit fixe dans on_mqtt_message (file + thread de traitement)"""
+    ingest = collector.ingest
+    worker_clock = time.pthread_getcpuclockid(ingest.thread.ident)
+    processed, dropped = ingest.processed, ingest.dropped
+    ingest.max_depth = 0
+    
+    put = collector.on_mqtt_message
+    count = len(messages)
+    total = int(rate * duration)
+    sent = 0
+    
+    worker_start = time.clock_gettime(worker_clock)
+    start = time.perf_counter()
+    
+    # Tranches de 10 ms : on rattrape l'échéancier puis on rend la main
+    while sent < total:
+        due = min(total, int(rate * (time.perf_counter() - start + 0.01)))
+        while sent < due:
+            put(None, None, messages[sent % count])
+            sent += 1
+        time.sleep(max(0.0, sent / rate - (time.perf_counter() - start)))
+    
+    offered = time.perf_counter() - start
+    
+    # Vidage de la file (limité à 10 s)
+    deadline = time.perf_counter() + 10
+    while (len(ingest) or ingest.processed + ingest.dropped - processed - dropped < sent) \
+            and time.perf_counter() < deadline:
+        time.sleep(0.002)
+    
+    elapsed = time.perf_counter() - start
+    worker_cpu = time.clock_gettime(worker_clock) - worker_start
+    handled = ingest.processed - processed
+    
+    return {
+        "target_rate": rate,
+        "offered_rate": round(sent / offered),
+        "processed": handled,
+        "dropped": ingest.dropped - dropped,
+        "max_depth": ingest.max_depth,
+        "drain_ms": round((elapsed - offered) * 1000, 1),
+        "worker_cpu_pct": round(worker_cpu / elapsed * 100, 1),
+        "us_per_message": round(worker_cpu / handled * 1e6, 2) if handled else None
+    }
+
+def run_collector(name, factory, config, system, broker, args, setup=None):
+    """Démarre un collecteur sur le broker en mémoire, le mesure puis le ferme"""
+    rss_before = rss_kib()
+    collector = factory(config)
+    
+    if not collector.connect_mqtt():
+        raise RuntimeError(f"{name}: connexion au broker en mémoire impossible")
+    
+    try:
+        if setup is not None:
+            setup(collector)
+        else:
+            collector.initialize()
+        
+        result = bench_ticks(collector, system, broker, args.ticks, args.alloc_ticks)
+        result["rss_kib"] = rss_kib()
+        result["rss_delta_kib"] = result["rss_kib"] - rss_before
+        
+        if isinstance(collector, MQTTStatsCollector):
+            rng = random.Random(args.seed)
+            messages = [Message(topic, payload) for topic, payload in generate_traffic(20000, 0.2, rng)]
+            result["ingest"] = {str(rate): bench_ingest(collector, messages, rate, args.duration)
+                                for rate in args.rates}
+        
+        result["durations"] = collector.instrumentation.snapshot()["durations"]
+        result["errors"] = collector.stats['errors']
+        result["json_backend"] = collector.serializer.json_backend
+        return result
+    
+    finally:
+        collector.cleanup()
+        collector.close_session()
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=WIDGETS_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def flatten(data, prefix=''):
+    """Feuilles numériques {chemin.pointé: valeur}"""
+    values = {}
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, path + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[path] = value
+    return values
+
+def compare(baseline, current, threshold):
+    """Affiche les écarts des métriques COMPARED ; retourne le nombre de régressions"""
+    old = flatten(baseline['results'])
+    new = flatten(current['results'])
+    regressions = 0
+    
+    print(f"\nComparaison avec {baseline['meta'].get('revision')} ({baseline['meta'].get('date')})")
+    if baseline['meta'].get('args') != current['meta']['args']:
+        # Ticks, débits ou collecteurs différents : écarts peu significatifs
+        print(f"  Attention : paramètres différents ({baseline['meta'].get('args')})")
+    for path in sorted(old.keys() & new.keys()):
+        rule = COMPARED.get(path.rsplit('.', 1)[-1])
+        if rule is None:
+            continue
+        
+        direction, noise = rule
+        before, after = old[path], new[path]
+        change = (after - before) * 100 / before if before else None
+        if abs(after - before) <= noise:
+            worse = False
+        elif change is not None:
+            worse = change * direction < -threshold
+        else:
+            worse = after * direction < 0
+        
+        regressions += worse
+        shown = f"{change:+7.1f} %" if change is not None else "    n/a"
+        print(f"  {path:<55} {before:>12} -> {after:>12}  {shown}{'  RÉGRESSION' if worse else ''}")
+    
+    print(f"{regressions} régression(s) au-delà de {threshold} %")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--ticks', type=int, default=200, help="ticks mesurés par collecteur")
+    parser.add_argument('--alloc-ticks', type=int, default=50, help="ticks de la passe tracemalloc")
+    parser.add_argument('--rates', type=lambda value: [int(rate) for rate in value.split(',')],
+                        default=[1000, 10000, 100000], help="débits injectés dans mqttstats (msg/s)")
+    parser.add_argument('--duration', type=float, default=2.0, help="durée d'injection par débit (s)")
+    parser.add_argument('--collectors', type=lambda value: value.split(','), default=list(COLLECTORS))
+    parser.add_argument('--output', help=f"fichier JSON des résultats (défaut : {PROFILE_DIR}/bench_collectors-<rev>-<date>.json)")
+    parser.add_argument('--compare', help="résultats JSON d'une version précédente")
+    parser.add_argument('--threshold', type=float, default=10.0, help="écart signalé comme régression (%%)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true', help="journaux des collecteurs sur la sortie")
+    args = parser.parse_args()
+    
+    unknown = set(args.collectors) - set(COLLECTORS)
+    if unknown:
+        parser.error(f"collecteurs inconnus: {', '.join(sorted(unknown))}")
+    
+    # Journaux écrits mais jetés : on mesure leur coût sans polluer la sortie
+    if not args.verbose:
+        devnull = open(os.devnull, 'w')
+        for handler in logging.getLogger().handlers:
+            handler.setStream(devnull)
+    
+    workdir = tempfile.mkdtemp(prefix='bench-collectors-')
+    system = FakeSystem(workdir, args.seed)
+    broker = FakeBroker().start()
+    
+    os.environ.update(COLLECTOR_RUNTIME='threads', COLLECTOR_SPOOL_DIR=os.path.join(workdir, 'spool'),
+                      WIFISTATS_FIXTURE=WIFI_FIXTURE, WIFISTATS_LEASES=system.leases_path)
+    os.environ.pop('COLLECTOR_METRICS_PORT', None)
+    
+    # psutil lit /proc/meminfo et /proc/vmstat (RAM, swap) dans l'arborescence factice
+    psutil.PROCFS_PATH = system.proc
+    
+    runs = []
+    if 'servermonitoring' in args.collectors:
+        runs.append(('servermonitoring', SystemMetricsCollector,
+                     write_config('servermonitoring', workdir, broker.port),
+                     lambda collector: point_to_fake_system(collector, system)))
+    if 'wifistats' in args.collectors:
+        for backend in ('nl80211', 'iw'):
+            runs.append((f"wifistats[{backend}]", WiFiStatsCollector,
+                         write_config('wifistats', workdir, broker.port, backend=backend, mode='poll'), None))
+    if 'mqttstats' in args.collectors:
+        runs.append(('mqttstats', MQTTStatsCollector, write_config('mqttstats', workdir, broker.port), None))
+    
+    results = {"rss_start_kib": rss_kib()}
+    try:
+        for name, factory, config, setup in runs:
+            print(f"{name} ...", flush=True)
+            results[name] = result = run_collector(name, factory, config, system, broker, args, setup)
+            
+            print(f"  {result['cpu_us_mean']:9.1f} µs CPU/tick (p95 {result['cpu_us_p95']:.1f})  "
+                  f"{result['publishes_per_tick']:6.2f} pub/tick  {result['publishes_per_s']:9.0f} pub/s  "
+                  f"{result['alloc_bytes_per_tick']} o alloués/tick  RSS +{result['rss_delta_kib']} Kio"
+                  + ("" if result['delivered'] else "  (publications non reçues par le broker)"))
+            for rate, ingest in result.get('ingest', {}).items():
+                print(f"  _on_message à {int(rate):>6} msg/s : {ingest['offered_rate']:>6} injectés/s  "
+                      f"{ingest['us_per_message']} µs/msg  worker {ingest['worker_cpu_pct']:5.1f} % d'un cœur  "
+                      f"perdus {ingest['dropped']}  profondeur max {ingest['max_depth']}")
+    finally:
+        get_connection_manager().shutdown()
+        broker.stop()
+    
+    results["rss_end_kib"] = rss_kib()
+    results["rss_peak_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "date": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'threshold', 'verbose')}
+        },
+        "results": results
+    }
+    
+    output = args.output or os.path.join(
+        PROFILE_DIR, f"bench_collectors-{report['meta']['revision'] or 'local'}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"RSS fin {results['rss_end_kib']} Kio (pic {results['rss_peak_kib']} Kio) - résultats : {output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, report, args.threshold):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
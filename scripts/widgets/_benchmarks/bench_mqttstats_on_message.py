@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark du traitement des messages de mqttstats (_on_message)
+Trafic mixte texte/binaire/$SYS rejoué à 10 000 msg/s, comparé à
+l'ancien chemin qui décodait tous les payloads en UTF-8
+
+Usage : python3 bench_mqttstats_on_message.py [--messages N] [--binary 0.2] [--text-size N] [--seed N]
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+
+WIDGETS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(WIDGETS_DIR, 'mqttstats'))
+
+# Filtres par défaut de scripts/common/variables.sh
+os.environ.setdefault('MQTT_IGNORED_TOPICS_STRING',
+                      'test/#|test/latency/+|test/widget/+|rpi/network/mqtt/stats|rpi/network/mqtt/topics')
+
+from mqttstats_collector import MQTTStatsCollector
+
+TARGET_RATE = 10000
+
+def generate_traffic(count, binary_ratio, rng, text_size=0):
+    """Messages (topic, payload) : topics utilisateur texte/binaire et $SYS"""
+    devices = [f"sensor/room{i}/{kind}" for i in range(50) for kind in ('temp', 'humidity', 'status')]
+    sys_topics = ["$SYS/broker/messages/received", "$SYS/broker/messages/sent",
+                  "$SYS/broker/clients/connected", "$SYS/broker/load/messages/received/1min",
+                  "$SYS/broker/uptime"]
+    
+    traffic = []
+    for i in range(count):
+        draw = rng.random()
+        if draw < 0.05:
+            topic = rng.choice(sys_topics)
+            payload = b"86400 seconds" if topic.endswith("uptime") else str(rng.randint(0, 10**6)).encode()
+        elif draw < 0.05 + binary_ratio:
+            # Payload binaire (protobuf, CBOR, image...) : invalide en UTF-8
+            topic = rng.choice(devices).replace('sensor', 'camera')
+            payload = bytes(rng.getrandbits(8) for _ in range(rng.randint(32, 512))) + b'\xff\xfe'
+        else:
+            topic = rng.choice(devices)
+            payload = f'{{"value": {rng.random() * 40:.2f}, "unit": "C", "pad": "{"x" * text_size}"}}'.encode()
+        traffic.append((topic, payload))
+    return traffic
+
+def legacy_on_message(collector, topic, raw_payload):
+    """Ancien chemin : décodage systématique avant de regarder le topic"""
+    try:
+        payload = raw_payload.decode('utf-8')
+        if topic.startswith("$SYS/"):
+            collector._process_sys_topic(topic, payload)
+        elif not collector.should_ignore_topic(topic) and not topic.startswith("rpi/network/mqtt/"):
+            collector.active_topics.touch(topic)
+            collector.top_talkers.add(topic, len(raw_payload))
+        return True
+    except Exception as e:
+        # Journalisé en erreur à chaque payload binaire
+        logging.getLogger('mqttstats').error(f"Erreur traitement message: {e}")
+        return False
+
+def run(name, handler, traffic):
+    start = time.perf_counter()
+    for topic, payload in traffic:
+        handler(topic, payload)
+    elapsed = time.perf_counter() - start
+    
+    per_message = elapsed / len(traffic)
+    capacity = 1 / per_message
+    print(f"{name:<24} {per_message * 1e6:8.2f} µs/msg  capacité {capacity:10.0f} msg/s  "
+          f"charge à {TARGET_RATE} msg/s : {TARGET_RATE * per_message * 100:5.1f} % d'un cœur")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--messages', type=int, default=TARGET_RATE * 5)
+    parser.add_argument('--binary', type=float, default=0.2, help="part de payloads binaires")
+    parser.add_argument('--text-size', type=int, default=0, help="octets ajoutés aux payloads texte")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    # Journaux écrits mais jetés : on mesure leur coût sans polluer la sortie
+    devnull = open(os.devnull, 'w')
+    for handler in logging.getLogger().handlers:
+        handler.setStream(devnull)
+    
+    traffic = generate_traffic(args.messages, args.binary, random.Random(args.seed), args.text_size)
+    config_file = os.path.join(WIDGETS_DIR, 'mqttstats', 'mqttstats_widget.json')
+    
+    print(f"{len(traffic)} messages ({args.binary * 100:.0f} % binaires, 5 % $SYS)")
+    
+    legacy = MQTTStatsCollector(config_file)
+    failures = sum(1 for topic, payload in traffic if not legacy_on_message(legacy, topic, payload))
+    legacy = MQTTStatsCollector(config_file)
+    run("ancien (décodage)", lambda t, p: legacy_on_message(legacy, t, p), traffic)
+    print(f"{'':<24} {failures} erreurs de décodage journalisées")
+    
+    current = MQTTStatsCollector(config_file)
+    now = time.perf_counter()
+    run("actuel (sans décodage)", lambda t, p: current._on_message(t, p, now), traffic)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
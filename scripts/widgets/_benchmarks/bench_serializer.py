@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark de l'encodage des publications (serializer)
+Rejoue à chaque tick les payloads d'exemple de tous les widgets et compare
+l'ancien encodage (datetime.utcnow() + json.dumps par publication) aux
+encodeurs du serializer : temps d'encodage par tick et octets émis
+
+Usage : python3 bench_serializer.py [--ticks N] [--repeat N]
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+from datetime import datetime
+
+WIDGETS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(WIDGETS_DIR, '_core'))
+import serializer
+from serializer import json_encoder, binary_encoder, utc_timestamp
+
+def load_payloads(repeat):
+    """(topic, données sans horodatage) des exemples documentés dans les JSON des widgets"""
+    payloads = []
+    for path in sorted(glob.glob(os.path.join(WIDGETS_DIR, '*', '*_widget.json'))):
+        with open(path) as f:
+            config = json.load(f)
+        
+        for entry in config['mqtt']['topics'].get('publish', []):
+            try:
+                data = json.loads(entry.get('example', ''))
+            except ValueError:
+                continue
+            data.pop('timestamp', None)
+            payloads.append((entry['topic'], data))
+    
+    # Un tick de servermonitoring publie plusieurs fois chaque métrique (cores...)
+    return payloads * repeat
+
+def legacy_tick(payloads):
+    """Ancien chemin : horodatage formaté et json.dumps à chaque publication"""
+    size = 0
+    for topic, data in payloads:
+        payload = {"timestamp": datetime.utcnow().isoformat() + "Z", **data}
+        size += len(json.dumps(payload).encode('utf-8'))
+    return size
+
+def make_tick(encode):
+    def tick(payloads):
+        """Horodatage formaté une fois, encodeur donné"""
+        timestamp = utc_timestamp()
+        size = 0
+        for topic, data in payloads:
+            encoded = encode({"timestamp": timestamp, **data})
+            size += len(encoded) if isinstance(encoded, bytes) else len(encoded.encode('utf-8'))
+        return size
+    return tick
+
+def measure(name, tick, payloads, ticks):
+    start = time.perf_counter()
+    for _ in range(ticks):
+        size = tick(payloads)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<30} {elapsed * 1e6 / ticks:10.1f} µs/tick  {size:8d} octets/tick")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--ticks', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=2)
+    args = parser.parse_args()
+    
+    payloads = load_payloads(args.repeat)
+    print(f"{len(payloads)} publications par tick, {args.ticks} ticks")
+    
+    measure("ancien (utcnow + json.dumps)", legacy_tick, payloads, args.ticks)
+    measure("tick + json compact", make_tick(json.JSONEncoder(separators=(',', ':')).encode),
+            payloads, args.ticks)
+    
+    backend, encode = json_encoder()
+    if backend != 'json':
+        measure(f"tick + {backend}", make_tick(encode), payloads, args.ticks)
+    
+    for fmt in serializer.BINARY_FORMATS:
+        encoder = binary_encoder(fmt)
+        if encoder is None:
+            print(f"{fmt:<30} (aucun encodeur installé)")
+            continue
+        measure(f"tick + {fmt} ({encoder[0]})", make_tick(encoder[1]), payloads, args.ticks)
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark du filtrage des topics ignorés (mqttstats)
+Compare l'ancienne boucle fnmatch, topic_matches_sub de Paho et l'arbre
+TopicFilterTrie (sans puis avec cache) sur 10 000 topics x 200 filtres
+
+Usage : python3 bench_topic_trie.py [--topics N] [--patterns N] [--seed N]
+"""
+
+import os
+import sys
+import time
+import random
+import fnmatch
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '_core'))
+from topic_trie import TopicFilterTrie
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:
+    mqtt = None
+
+WORDS = ['rpi', 'sensor', 'device', 'network', 'wifi', 'mqtt', 'system', 'cpu',
+         'temp', 'status', 'test', 'widget', 'room1', 'room2', 'kitchen', 'garage']
+
+def generate_topics(count, rng):
+    """Topics de 2 à 6 niveaux"""
+    return ['/'.join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))) for _ in range(count)]
+
+def generate_patterns(count, rng):
+    """Filtres mêlant niveaux exacts, + et # final"""
+    patterns = []
+    for _ in range(count):
+        levels = [rng.choice(WORDS + ['+']) for _ in range(rng.randint(1, 5))]
+        if rng.random() < 0.3:
+            levels.append('#')
+        patterns.append('/'.join(levels))
+    return patterns
+
+def fnmatch_ignore(patterns, topic):
+    """Ancienne implémentation de should_ignore_topic"""
+    for pattern in patterns:
+        fnmatch_pattern = pattern.replace('+', '*').replace('#', '**')
+        if fnmatch_pattern.endswith('/**'):
+            fnmatch_pattern = fnmatch_pattern[:-2] + '*'
+        if fnmatch.fnmatch(topic, fnmatch_pattern):
+            return True
+    return False
+
+def paho_ignore(patterns, topic):
+    for pattern in patterns:
+        if mqtt.topic_matches_sub(pattern, topic):
+            return True
+    return False
+
+def measure(name, func, topics):
+    start = time.perf_counter()
+    matched = sum(1 for topic in topics if func(topic))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed * 1000:10.1f} ms  {elapsed * 1e6 / len(topics):8.2f} µs/topic  ({matched} ignorés)")
+    return matched
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--topics', type=int, default=10000)
+    parser.add_argument('--patterns', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    topics = generate_topics(args.topics, rng)
+    patterns = generate_patterns(args.patterns, rng)
+    
+    # Trafic réaliste : les topics chauds reviennent souvent
+    stream = [rng.choice(topics[:500]) if rng.random() < 0.8 else rng.choice(topics) for _ in range(args.topics)]
+    
+    print(f"{args.topics} topics x {args.patterns} filtres")
+    
+    measure("fnmatch (ancien)", lambda t: fnmatch_ignore(patterns, t), topics)
+    if mqtt:
+        reference = measure("paho topic_matches_sub", lambda t: paho_ignore(patterns, t), topics)
+    else:
+        reference = None
+    
+    start = time.perf_counter()
+    trie = TopicFilterTrie(patterns, cache_size=0)
+    label = "construction de l'arbre"
+    print(f"{label:<28} {(time.perf_counter() - start) * 1000:10.1f} ms")
+    
+    matched = measure("arbre (sans cache)", lambda t: trie._match(t.split('/')), topics)
+    if reference is not None and matched != reference:
+        print("ERREUR : résultats différents de Paho")
+        return 1
+    
+    cached = TopicFilterTrie(patterns, cache_size=1024)
+    measure("arbre + cache (trafic réel)", cached.matches, stream)
+    print(f"{'succès du cache':<28} {cached.cache_hits * 100 / len(stream):10.1f} %")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Broker MQTT 3.1.1 minimal pour les benchmarks des collecteurs
+Un seul thread (selectors), en mémoire : CONNECT, PUBLISH QoS 0/1/2,
+SUBSCRIBE (relais en QoS 0), PINGREQ, DISCONNECT. Compte les publications
+reçues pour vérifier que tout ce qu'un collecteur annonce est bien arrivé
+"""
+
+import os
+import sys
+import socket
+import struct
+import selectors
+import threading
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '_core'))
+from topic_trie import TopicFilterTrie
+
+CONNACK = b'\x20\x02\x00\x00'
+PINGRESP = b'\xd0\x00'
+
+def encode_length(length):
+    """Longueur restante MQTT (1 à 4 octets)"""
+    encoded = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(encoded)
+
+class _Client:
+    __slots__ = ('sock', 'inbuf', 'outbuf', 'filters')
+    
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbuf = bytearray()
+        self.outbuf = bytearray()
+        self.filters = None
+
+class FakeBroker:
+    """Broker en mémoire sur 127.0.0.1 (port libre choisi par le noyau par défaut)"""
+    
+    def __init__(self, port=0):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(('127.0.0.1', port))
+        self.server.listen(16)
+        self.server.setblocking(False)
+        self.port = self.server.getsockname()[1]
+        
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.server, selectors.EVENT_READ)
+        self.clients = {}
+        self.thread = None
+        self._stop = threading.Event()
+        
+        # Compteurs (lus depuis le thread du benchmark)
+        self.received = 0
+        self.received_bytes = 0
+        self.topics = Counter()
+        self._changed = threading.Condition()
+    
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, name="fake-broker", daemon=True)
+        self.thread.start()
+        return self
+    
+    def stop(self):
+        self._stop.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        for client in list(self.clients.values()):
+            self._close(client)
+        self.selector.close()
+        self.server.close()
+    
+    def wait_for(self, count, timeout=5.0):
+        """Attend que count publications aient été reçues au total ; True si atteint"""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.received >= count, timeout)
+    
+    def _loop(self):
+        while not self._stop.is_set():
+            for key, events in self.selector.select(timeout=0.1):
+                if key.fileobj is self.server:
+                    self._accept()
+                    continue
+                
+                client = self.clients.get(key.fileobj)
+                if client is None:
+                    continue
+                if events & selectors.EVENT_READ:
+                    self._read(client)
+                if events & selectors.EVENT_WRITE and client.sock in self.clients:
+                    self._flush(client)
+    
+    def _accept(self):
+        try:
+            sock, _ = self.server.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.clients[sock] = _Client(sock)
+        self.selector.register(sock, selectors.EVENT_READ)
+    
+    def _close(self, client):
+        if self.clients.pop(client.sock, None) is not None:
+            self.selector.unregister(client.sock)
+        client.sock.close()
+    
+    def _send(self, client, data):
+        if not client.outbuf:
+            try:
+                sent = client.sock.send(data)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                self._close(client)
+                return
+            if sent == len(data):
+                return
+            data = data[sent:]
+            self.selector.modify(client.sock, selectors.EVENT_READ | selectors.EVENT_WRITE)
+        client.outbuf += data
+    
+    def _flush(self, client):
+        try:
+            sent = client.sock.send(client.outbuf)
+        except BlockingIOError:
+            return
+        except OSError:
+            self._close(client)
+            return
+        del client.outbuf[:sent]
+        if not client.outbuf:
+            self.selector.modify(client.sock, selectors.EVENT_READ)
+    
+    def _read(self, client):
+        try:
+            data = client.sock.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._close(client)
+            return
+        
+        buffer = client.inbuf
+        buffer += data
+        offset = 0
+        published = 0
+        
+        while len(buffer) - offset >= 2:
+            # En-tête fixe : type/flags puis longueur restante variable
+            length, multiplier, index = 0, 1, offset + 1
+            while index < len(buffer):
+                byte = buffer[index]
+                length += (byte & 0x7f) * multiplier
+                multiplier *= 128
+                index += 1
+                if not byte & 0x80:
+                    break
+            else:
+                break
+            if len(buffer) - index < length:
+                break
+            
+            header = buffer[offset]
+            body = bytes(buffer[index:index + length])
+            offset = index + length
+            
+            if not self._handle(client, header, body):
+                return
+            if header >> 4 == 3:
+                published += 1
+        
+        del buffer[:offset]
+        
+        if published:
+            with self._changed:
+                self._changed.notify_all()
+    
+    def _handle(self, client, header, body):
+        """Traite un paquet ; False si le client est déconnecté"""
+        kind = header >> 4
+        
+        if kind == 3:
+            qos = (header >> 1) & 3
+            topic_length = struct.unpack_from('!H', body)[0]
+            topic = body[2:2 + topic_length].decode('utf-8', 'replace')
+            position = 2 + topic_length
+            if qos:
+                mid = body[position:position + 2]
+                position += 2
+                self._send(client, (b'\x40\x02' if qos == 1 else b'\x50\x02') + mid)
+            
+            payload = body[position:]
+            self.received += 1
+            self.received_bytes += len(payload)
+            self.topics[topic] += 1
+            
+            # Relais QoS 0 aux abonnés
+            packet = None
+            for subscriber in list(self.clients.values()):
+                if subscriber.filters and subscriber.filters.matches(topic):
+                    if packet is None:
+                        packet = b'\x30' + encode_length(2 + topic_length + len(payload)) + body[:2 + topic_length] + payload
+                    self._send(subscriber, packet)
+        
+        elif kind == 1:
+            self._send(client, CONNACK)
+        
+        elif kind == 6:
+            self._send(client, b'\x70\x02' + body[:2])
+        
+        elif kind == 8:
+            filters, position = [], 2
+            while position < len(body):
+                length = struct.unpack_from('!H', body, position)[0]
+                filters.append(body[position + 2:position + 2 + length].decode('utf-8'))
+                position += 3 + length
+            if client.filters is None:
+                client.filters = TopicFilterTrie()
+            for topic_filter in filters:
+                client.filters.add(topic_filter)
+            self._send(client, b'\x90' + encode_length(2 + len(filters)) + body[:2] + b'\x00' * len(filters))
+        
+        elif kind == 10:
+            self._send(client, b'\xb0\x02' + body[:2])
+        
+        elif kind == 12:
+            self._send(client, PINGRESP)
+        
+        elif kind == 14:
+            self._close(client)
+            return False
+        
+        return True
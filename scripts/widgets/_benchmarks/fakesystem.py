@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Arborescence /proc, /sys et dnsmasq.leases factice pour les benchmarks
+Contenus au format du noyau (Raspberry Pi 4 : 4 cores, une zone thermale,
+une politique cpufreq), avancés entre deux ticks comme sur une vraie machine
+"""
+
+import os
+import random
+
+MEMINFO = """MemTotal:        3884376 kB
+MemFree:          912344 kB
+MemAvailable:    2871520 kB
+Buffers:          123456 kB
+Cached:          1734220 kB
+SwapCached:         1024 kB
+Active:          1452368 kB
+Inactive:        1177344 kB
+Active(file):     902144 kB
+Inactive(file):   896512 kB
+Shmem:             41236 kB
+SReclaimable:      98212 kB
+SwapTotal:        102396 kB
+SwapFree:          96252 kB
+"""
+
+VMSTAT = """pgpgin 1204516
+pgpgout 3321548
+pswpin 1536
+pswpout 6144
+"""
+
+# Baux dnsmasq : les deux stations de la fixture wifistats, plus des baux sans station
+LEASES = [
+    ("a4:83:e7:12:34:56", "192.168.4.10", "iPhone-de-Marie"),
+    ("dc:a6:32:ab:cd:ef", "192.168.4.11", "raspberrypi"),
+] + [(f"02:00:00:00:{i // 256:02x}:{i % 256:02x}", f"192.168.4.{20 + i}", f"capteur-{i}") for i in range(40)]
+
+class FakeSystem:
+    """Fichiers factices sous root : proc/, sys/ et dnsmasq.leases"""
+    
+    cores = 4
+    
+    def __init__(self, root, seed=42):
+        self.root = root
+        self.rng = random.Random(seed)
+        self.proc = os.path.join(root, 'proc')
+        self.thermal_dir = os.path.join(root, 'sys', 'class', 'thermal')
+        self.cpufreq_dir = os.path.join(root, 'sys', 'devices', 'system', 'cpu', 'cpufreq')
+        self.stat_path = os.path.join(self.proc, 'stat')
+        self.uptime_path = os.path.join(self.proc, 'uptime')
+        self.leases_path = os.path.join(root, 'dnsmasq.leases')
+        
+        # Compteurs de /proc/stat (jiffies) par cpu : user nice system idle iowait irq softirq steal
+        self.jiffies = [[1000, 10, 500, 50000, 100, 5, 20, 0] for _ in range(self.cores)]
+        self.uptime = 86400.0
+        
+        zone = os.path.join(self.thermal_dir, 'thermal_zone0')
+        self.temp_path = os.path.join(zone, 'temp')
+        policy = os.path.join(self.cpufreq_dir, 'policy0')
+        self.freq_path = os.path.join(policy, 'scaling_cur_freq')
+        
+        for directory in (self.proc, zone, policy):
+            os.makedirs(directory, exist_ok=True)
+        
+        self._write(os.path.join(zone, 'type'), "cpu-thermal\n")
+        self._write(os.path.join(self.proc, 'meminfo'), MEMINFO)
+        self._write(os.path.join(self.proc, 'vmstat'), VMSTAT)
+        self._write(self.leases_path, ''.join(
+            f"{1700000000 + i} {mac} {ip} {name} 01:{mac}\n" for i, (mac, ip, name) in enumerate(LEASES)
+        ))
+        self.advance()
+    
+    @staticmethod
+    def _write(path, content):
+        # Réécriture sur place : l'inode reste le même (descripteurs persistants de PseudoFile)
+        with open(path, 'w') as f:
+            f.write(content)
+    
+    def advance(self, seconds=1.0):
+        """Fait avancer les compteurs d'un intervalle (charge, température et fréquence aléatoires)"""
+        rng = self.rng
+        jiffies = int(seconds * 100)
+        
+        for counters in self.jiffies:
+            busy = int(jiffies * rng.uniform(0.05, 0.6))
+            counters[0] += busy * 3 // 4
+            counters[2] += busy // 4
+            counters[3] += jiffies - busy
+            counters[4] += rng.randint(0, 2)
+        
+        total = [sum(column) for column in zip(*self.jiffies)]
+        lines = [f"cpu  {' '.join(map(str, total))} 0 0"]
+        lines += [f"cpu{i} {' '.join(map(str, counters))} 0 0" for i, counters in enumerate(self.jiffies)]
+        lines += ["intr 123456789", "ctxt 987654321", "btime 1700000000", "processes 12345"]
+        self._write(self.stat_path, "\n".join(lines) + "\n")
+        
+        self.uptime += seconds
+        self._write(self.uptime_path, f"{self.uptime:.2f} {self.uptime * 3.5:.2f}\n")
+        self._write(self.temp_path, f"{rng.randint(42000, 61000)}\n")
+        self._write(self.freq_path, f"{rng.choice((600000, 1000000, 1500000))}\n")
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Runtime asyncio pour les collecteurs MaxLink (COLLECTOR_RUNTIME=asyncio)
+Une seule boucle et un seul thread pour les tâches des collecteurs et le
+réseau MQTT : les sockets des clients Paho du pool sont surveillées par la
+boucle, chaque tâche périodique est une tâche asyncio et les hooks
+async def (sous-processus iw...) sont attendus sans bloquer les autres.
+Seules les tentatives de connexion (bloquantes) passent par l'exécuteur
+"""
+
+import time
+import asyncio
+import inspect
+import logging
+
+from mqtt_manager import get_connection_manager
+from scheduler import ScheduledTask
+
+logger = logging.getLogger('async_runtime')
+
+class AsyncioNetworkDriver:
+    """Boucle réseau du pool MQTT portée par la boucle asyncio (remplace le thread select)"""
+    
+    def __init__(self, loop, manager):
+        self.loop = loop
+        self.manager = manager
+        
+        # Descripteurs surveillés par connexion
+        self.readers = {}
+        self.writers = {}
+        self._timer = None
+        
+        # Connexions dont la tentative de connexion tourne dans un thread de l'exécuteur
+        self.connecting = set()
+        self._stopped = False
+    
+    def add_connection(self, connection):
+        """Nouvelle connexion du pool : première tentative au prochain passage"""
+        self.wakeup(service=True)
+    
+    def remove_connection(self, connection):
+        """Socket fermée ou connexion retirée du pool : le descripteur n'est plus surveillé
+        
+        Appelé par Paho avant la fermeture du descripteur, pour qu'un numéro
+        réutilisé par la socket suivante ne reste pas enregistré dans la boucle.
+        """
+        try:
+            on_loop = asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            on_loop = False
+        
+        if on_loop:
+            self._unregister(connection)
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._unregister, connection)
+    
+    def wakeup(self, service=False):
+        """Réveil depuis n'importe quel thread (données à écrire, nouvelle connexion)"""
+        try:
+            self.loop.call_soon_threadsafe(self._service if service else self._refresh)
+        except RuntimeError:
+            # Boucle déjà fermée (arrêt)
+            pass
+    
+    def stop(self):
+        """Arrête la surveillance des sockets"""
+        self._stopped = True
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        for connection in set(self.readers) | set(self.writers):
+            self._unregister(connection)
+    
+    def _connections(self):
+        with self.manager.lock:
+            return list(self.manager.connections.values())
+    
+    def _service(self):
+        """Tentatives de (re)connexion selon le backoff, keepalive, puis prochain passage"""
+        if self._timer is not None:
+            self._timer.cancel()
+        
+        now = time.monotonic()
+        timeout = 1.0
+        
+        for connection in self._connections():
+            try:
+                if connection in self.connecting:
+                    continue
+                if connection.client.socket() is None:
+                    if now >= connection.next_attempt:
+                        self._connect(connection)
+                    else:
+                        timeout = min(timeout, max(0.1, connection.next_attempt - now))
+                else:
+                    # Keepalive (PINGREQ) et détection des connexions mortes
+                    connection.client.loop_misc()
+            except Exception as e:
+                logger.error(f"Erreur dans la boucle réseau MQTT: {e}")
+        
+        self._refresh()
+        self._timer = self.loop.call_later(timeout, self._service)
+    
+    def _connect(self, connection):
+        """Lance une tentative de connexion hors de la boucle
+        
+        reconnect() de Paho est bloquant (résolution DNS, connexion TCP jusqu'au
+        timeout) : exécuté dans la boucle, il figerait toutes les tâches des
+        collecteurs pendant une coupure du broker.
+        """
+        self.connecting.add(connection)
+        future = self.loop.run_in_executor(None, connection.try_connect)
+        future.add_done_callback(lambda future: self._on_connect_done(connection, future))
+    
+    def _on_connect_done(self, connection, future):
+        """Fin de tentative : socket à surveiller si connecté, sinon backoff déjà planifié"""
+        self.connecting.discard(connection)
+        if not future.cancelled() and future.exception() is not None:
+            delay = connection.schedule_retry()
+            logger.error(f"Erreur connexion MQTT: {future.exception()} (nouvelle tentative dans {delay:.1f}s)")
+        if not self._stopped:
+            self._service()
+    
+    def _refresh(self):
+        """Aligne les descripteurs surveillés sur l'état des clients (socket, écriture en attente)"""
+        connections = self._connections()
+        
+        for connection in (set(self.readers) | set(self.writers)) - set(connections):
+            self._unregister(connection)
+        
+        for connection in connections:
+            # Socket en cours de connexion : surveillée une fois reconnect() terminé
+            sock = connection.client.socket() if connection not in self.connecting else None
+            fd = sock.fileno() if sock is not None else -1
+            
+            current = self.readers.get(connection)
+            if current != fd:
+                self._unregister(connection)
+                if fd < 0:
+                    continue
+                self.loop.add_reader(fd, self._on_readable, connection)
+                self.readers[connection] = fd
+            
+            if fd < 0:
+                continue
+            
+            want_write = connection.client.want_write()
+            if want_write and connection not in self.writers:
+                self.loop.add_writer(fd, self._on_writable, connection)
+                self.writers[connection] = fd
+            elif not want_write and connection in self.writers:
+                self.loop.remove_writer(self.writers.pop(connection))
+    
+    def _unregister(self, connection):
+        for registry, remove in ((self.writers, self.loop.remove_writer),
+                                 (self.readers, self.loop.remove_reader)):
+            fd = registry.pop(connection, None)
+            if fd is None:
+                continue
+            try:
+                remove(fd)
+            except (OSError, ValueError):
+                # Descripteur déjà fermé : le sélecteur l'a oublié
+                pass
+    
+    def _on_readable(self, connection):
+        try:
+            connection.client.loop_read()
+        except Exception as e:
+            logger.error(f"Erreur lecture MQTT: {e}")
+        self._refresh()
+    
+    def _on_writable(self, connection):
+        try:
+            connection.client.loop_write()
+        except Exception as e:
+            logger.error(f"Erreur écriture MQTT: {e}")
+        self._refresh()
+
+class AsyncRuntime:
+    """Ordonnanceur asyncio, même interface que DeadlineScheduler (add_task, cancel_owner, run)
+    
+    Chaque tâche périodique est une tâche asyncio : une tâche qui attend
+    (sous-processus, socket) ne retarde pas les autres.
+    """
+    
+    def __init__(self, on_error=None, clock=time.monotonic):
+        """on_error(task, exception) est appelé quand une tâche lève une exception"""
+        self.on_error = on_error
+        self.clock = clock
+        self.loop = None
+        
+        # ScheduledTask -> tâche asyncio (None tant que la boucle n'a pas démarré)
+        self.tasks = {}
+    
+    def add_task(self, name, interval, callback, delay=0, owner=None):
+        """Ajoute une tâche dont la première exécution a lieu dans delay secondes"""
+        task = ScheduledTask(name, interval, callback, self.clock() + delay, owner)
+        self.tasks[task] = None
+        if self.loop is not None:
+            self._start(task)
+        return task
+    
+    def cancel_owner(self, owner):
+        """Annule toutes les tâches d'un propriétaire (plugin, collecteur...)"""
+        current = asyncio.current_task() if self.loop is not None else None
+        
+        for task, handle in list(self.tasks.items()):
+            if task.owner is not owner:
+                continue
+            
+            task.cancel()
+            del self.tasks[task]
+            
+            # La tâche en cours (redémarrage depuis on_error) se termine d'elle-même
+            if handle is not None and handle is not current:
+                handle.cancel()
+    
+    def run(self, stop_event, setup=None):
+        """Boucle jusqu'à stop_event ; setup() est appelé dans la boucle, réseau déjà branché"""
+        asyncio.run(self._main(stop_event, setup))
+    
+    async def _main(self, stop_event, setup):
+        self.loop = asyncio.get_running_loop()
+        manager = get_connection_manager()
+        manager.attach_driver(AsyncioNetworkDriver(self.loop, manager))
+        
+        try:
+            for task, handle in list(self.tasks.items()):
+                if handle is None:
+                    self._start(task)
+            
+            if setup is not None:
+                setup()
+            
+            # stop_event est un threading.Event (signal, autre thread) : attendu hors de la boucle
+            await self.loop.run_in_executor(None, stop_event.wait)
+        
+        finally:
+            stop_event.set()
+            handles = [handle for handle in self.tasks.values() if handle is not None]
+            for handle in handles:
+                handle.cancel()
+            await asyncio.gather(*handles, return_exceptions=True)
+            
+            manager.detach_driver()
+            self.loop = None
+    
+    def _start(self, task):
+        self.tasks[task] = self.loop.create_task(self._run_task(task), name=task.name)
+    
+    async def _run_task(self, task):
+        while not task.cancelled:
+            delay = task.due - self.clock()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if task.cancelled:
+                break
+            
+            task.last_lateness = self.clock() - task.due
+            await self._execute(task)
+            
+            if task.interval is None or task.cancelled:
+                break
+            task.advance(self.clock())
+        
+        if self.tasks.get(task) is asyncio.current_task():
+            del self.tasks[task]
+    
+    async def _execute(self, task):
+        """Exécute une tâche (fonction ou coroutine) en isolant ses erreurs"""
+        try:
+            result = task.callback()
+            if inspect.isawaitable(result):
+                await result
+            task.runs += 1
+            task.consecutive_errors = 0
+        except Exception as e:
+            task.consecutive_errors += 1
+            if self.on_error:
+                self.on_error(task, e)
+            else:
+                logger.error(f"Erreur dans la tâche {task.name}: {e}")
@@ -8,8 +8,9 @@ import os
 import sys
 import time
 import json
+import inspect
 import logging
-from datetime import datetime
+import threading
 from abc import ABC, abstractmethod
 
 # Configuration du logging
@@ -21,29 +22,66 @@ logging.basicConfig(
     ]
 )
 
-try:
-    import paho.mqtt.client as mqtt
-except ImportError:
-    logging.error("Module paho-mqtt non installé")
-    sys.exit(1)
+from paho.mqtt.client import MQTT_ERR_SUCCESS, MQTT_ERR_NO_CONN, MQTT_ERR_QUEUE_SIZE
+
+from mqtt_manager import get_connection_manager
+from scheduler import DeadlineScheduler
+from async_runtime import AsyncRuntime
+from serializer import Serializer
+from spool import Spool, SPOOL_DIR
+from instrumentation import Instrumentation, INTERNALS_TOPIC, register, unregister, start_metrics_server
+from profiler import setup_profiling, stop_profiling
 
 class BaseCollector(ABC):
     """Classe de base pour tous les collecteurs de widgets"""
     
+    # Pause par défaut avant la première connexion (surchargée par STARTUP_DELAY)
+    default_startup_delay = 0
+    
+    # Nombre d'erreurs consécutives tolérées avant l'arrêt de la boucle
+    max_consecutive_errors = 10
+    
+    # Intervalle d'affichage des statistiques (secondes)
+    stats_log_interval = 300
+    
+    # Méthodes mesurées en plus de collect et collect_* (ex. traitement des messages)
+    timed_methods = ()
+    
+    # Publications en attente d'accusé suivies au plus (latence PUBACK)
+    max_tracked_acks = 1000
+    
+    # Publication sans accusé après ce délai (secondes) : oubliée par prune_acks()
+    ack_timeout = 60
+    
+    # Période de vérification de la connexion avant la première collecte (hôte, asyncio)
+    connect_poll = 0.5
+    
     def __init__(self, config_file, logger_name):
         """Initialise le collecteur avec gestion de retry MQTT"""
         self.logger = logging.getLogger(logger_name)
         self.config = self.load_config(config_file)
         self.mqtt_client = None
+        self.mqtt_session = None
         self.connected = False
+        self._stop_event = threading.Event()
+        
+        # Signalé à la connexion (et à l'arrêt, pour réveiller connect_mqtt)
+        self._connected_event = threading.Event()
         
         # Configuration MQTT
         self.mqtt_config = self.config['mqtt']['broker']
         
-        # Configuration retry MQTT uniquement
+        # Encodage des payloads selon le format déclaré pour chaque topic publié
+        self.serializer = Serializer(self.config['mqtt'].get('topics', {}).get('publish', []))
+        
+        # Configuration retry MQTT uniquement (délai maximal du backoff du pool)
         self.retry_enabled = os.environ.get('MQTT_RETRY_ENABLED', 'true').lower() == 'true'
         self.retry_delay = int(os.environ.get('MQTT_RETRY_DELAY', '10'))
         self.max_retries = int(os.environ.get('MQTT_MAX_RETRIES', '0'))  # 0 = infini
+        self.connect_timeout = 30
+        
+        # Runtime : threads (ordonnanceur + thread réseau) ou asyncio (une seule boucle)
+        self.runtime = os.environ.get('COLLECTOR_RUNTIME', 'threads').lower()
         
         # Compteur de tentatives
         self.connection_attempts = 0
@@ -54,11 +92,56 @@ class BaseCollector(ABC):
             'messages_sent': 0,
             'errors': 0,
             'start_time': time.time(),
-            'connection_failures': 0
+            'connection_failures': 0,
+            'spooled': 0,
+            'replayed': 0
         }
         
+        # Tampon disque pendant les coupures du broker (rejoué à débit limité)
+        self.spool = None
+        spool_config = self.config.get('collector', {}).get('spool', {})
+        self.spool_replay_rate = spool_config.get('replay_rate', 50)
+        if spool_config.get('enabled', False):
+            directory = os.path.join(os.environ.get('COLLECTOR_SPOOL_DIR', SPOOL_DIR), logger_name)
+            try:
+                self.spool = Spool(
+                    directory,
+                    max_bytes=spool_config.get('max_bytes', 8 * 1024 * 1024),
+                    segment_bytes=spool_config.get('segment_bytes', 512 * 1024)
+                )
+            except OSError as e:
+                self.logger.warning(f"Tampon disque indisponible ({directory}): {e}")
+        
+        # Instrumentation interne : durées, accusés, retard de l'ordonnanceur, files
+        instrumentation_config = self.config.get('collector', {}).get('instrumentation', {})
+        self.internals_interval = instrumentation_config.get('interval', 30)
+        self.metrics_port = int(os.environ.get('COLLECTOR_METRICS_PORT',
+                                               instrumentation_config.get('metrics_port', 0)))
+        self.instrumentation = Instrumentation(logger_name)
+        self._publish_histogram = self.instrumentation.histogram('publish')
+        self._ack_histogram = self.instrumentation.histogram('publish_ack')
+        self._lag_histogram = self.instrumentation.histogram('loop_lag')
+        
+        # mid -> instant d'envoi ; mid -> instant d'accusé reçu avant la fin de publish()
+        # (PUBACK traité par le thread réseau avant le retour de publish())
+        self._acks_lock = threading.Lock()
+        self._pending_acks = {}
+        self._early_acks = {}
+        self.scheduled_tasks = []
+        self._instrument_methods()
+        
+        for name in ('messages_sent', 'errors', 'connection_failures', 'spooled', 'replayed'):
+            self.instrumentation.gauge(name, lambda name=name: self.stats[name], 'counter')
+        self.instrumentation.gauge('publish_inflight', lambda: len(self._pending_acks))
+        self.instrumentation.gauge('loop_lag_seconds', lambda: round(max(
+            (task.last_lateness for task in self.scheduled_tasks), default=0.0), 6))
+        if self.spool is not None:
+            self.instrumentation.gauge('spool_pending_bytes', lambda: self.spool.pending)
+        register(self.instrumentation)
+        
         self.logger.info(f"Collecteur initialisé - Version {self.config['widget']['version']}")
-        self.logger.info(f"Retry MQTT: {self.retry_enabled}, Delay: {self.retry_delay}s, Max: {self.max_retries}")
+        self.logger.info(f"Retry MQTT: {self.retry_enabled}, Backoff max: {self.retry_delay}s, Max: {self.max_retries}")
+        self.logger.info(f"Encodeur JSON: {self.serializer.json_backend}")
     
     def load_config(self, config_file):
         """Charge la configuration depuis le fichier JSON"""
@@ -69,79 +152,87 @@ class BaseCollector(ABC):
             self.logger.error(f"Erreur chargement config: {e}")
             sys.exit(1)
     
+    def open_session(self):
+        """Ouvre, sans bloquer, une session sur la connexion MQTT partagée du pool"""
+        if self.mqtt_session is None:
+            self.mqtt_session = get_connection_manager().acquire(
+                self.mqtt_config,
+                self.logger.name,
+                subscriptions=self.get_subscriptions(),
+                on_connect=self.on_connect,
+                on_disconnect=self.on_disconnect,
+                on_message=self.on_mqtt_message,
+                on_publish=self.on_publish_ack
+            )
+            self.mqtt_client = self.mqtt_session.client
+        
+        return self.mqtt_session
+    
+    def close_session(self):
+        """Rend la connexion MQTT au pool, ferme le tampon disque et retire l'instrumentation"""
+        if self.mqtt_session is not None:
+            self.mqtt_session.release()
+            self.mqtt_session = None
+        
+        if self.spool is not None:
+            self.spool.close()
+        
+        unregister(self.instrumentation)
+        self.connected = False
+    
     def connect_mqtt(self):
-        """Connexion au broker MQTT avec retry robuste"""
-        while True:
-            try:
-                self.connection_attempts += 1
-                self.last_connection_attempt = time.time()
-                
-                # Vérifier si on a atteint la limite de tentatives
-                if self.max_retries > 0 and self.connection_attempts > self.max_retries:
-                    self.logger.error(f"Limite de tentatives atteinte ({self.max_retries})")
-                    return False
-                
-                self.logger.info(f"Tentative de connexion MQTT #{self.connection_attempts}")
-                
-                # Créer le client MQTT
-                self.mqtt_client = mqtt.Client()
-                
-                # Callbacks
-                self.mqtt_client.on_connect = self.on_connect
-                self.mqtt_client.on_disconnect = self.on_disconnect
-                
-                # Authentification
-                self.mqtt_client.username_pw_set(
-                    self.mqtt_config['username'],
-                    self.mqtt_config['password']
-                )
-                
-                # Connexion
-                self.mqtt_client.connect(
-                    self.mqtt_config['host'], 
-                    self.mqtt_config['port'], 
-                    60
-                )
-                
-                # Démarrer la boucle
-                self.mqtt_client.loop_start()
-                
-                # Attendre la connexion
-                timeout = 30
-                while not self.connected and timeout > 0:
-                    time.sleep(0.5)
-                    timeout -= 0.5
-                
-                if self.connected:
-                    self.logger.info("Connexion MQTT établie avec succès")
-                    self.stats['connection_failures'] = 0
-                    return True
-                else:
-                    raise Exception("Timeout de connexion")
-                
-            except Exception as e:
-                self.stats['connection_failures'] += 1
-                self.logger.error(f"Erreur connexion MQTT: {e}")
-                
-                if self.mqtt_client:
-                    try:
-                        self.mqtt_client.loop_stop()
-                        self.mqtt_client.disconnect()
-                    except:
-                        pass
-                
-                if not self.retry_enabled:
-                    return False
-                
-                # Attendre avant de réessayer
-                self.logger.info(f"Nouvelle tentative dans {self.retry_delay} secondes...")
-                time.sleep(self.retry_delay)
+        """Attend la première connexion au broker MQTT
+        
+        Le client du pool est réutilisé : la boucle réseau partagée enchaîne les
+        tentatives (backoff exponentiel avec gigue) et la connexion est signalée
+        par un Event, sans attente active.
+        """
+        self.open_session()
+        
+        while not self._stop_event.is_set():
+            self.connection_attempts += 1
+            self.last_connection_attempt = time.time()
+            
+            # Vérifier si on a atteint la limite de tentatives
+            if self.max_retries > 0 and self.connection_attempts > self.max_retries:
+                self.logger.error(f"Limite de tentatives atteinte ({self.max_retries})")
+                return False
+            
+            self.logger.info(f"Attente de la connexion MQTT #{self.connection_attempts}")
+            
+            self._connected_event.wait(self.connect_timeout)
+            
+            if self.connected:
+                self.logger.info("Connexion MQTT établie avec succès")
+                self.stats['connection_failures'] = 0
+                return True
+            
+            if self._stop_event.is_set():
+                break
+            
+            self.stats['connection_failures'] += 1
+            self.logger.error("Erreur connexion MQTT: Timeout de connexion")
+            
+            if not self.retry_enabled:
+                self.close_session()
+                return False
+        
+        return False
+    
+    def reconnect_exhausted(self):
+        """Vrai si la reconnexion est désactivée ou a dépassé MQTT_MAX_RETRIES échecs"""
+        if not self.retry_enabled:
+            return True
+        
+        failures = self.mqtt_session.connection.failures if self.mqtt_session else 0
+        return self.max_retries > 0 and failures > self.max_retries
     
     def on_connect(self, client, userdata, flags, rc):
         """Callback de connexion"""
         if rc == 0:
             self.logger.info("Connecté au broker MQTT")
             self.connected = True
+            self._connected_event.set()
             self.on_mqtt_connected()
         else:
             self.logger.error(f"Échec connexion MQTT, code: {rc}")
@@ -151,55 +242,135 @@ class BaseCollector(ABC):
         """Callback de déconnexion"""
         self.logger.warning(f"Déconnecté du broker MQTT (code: {rc})")
         self.connected = False
+        self._connected_event.clear()
+        with self._acks_lock:
+            self._pending_acks.clear()
+            self._early_acks.clear()
+        self.stats['connection_failures'] += 1
+        self.on_mqtt_disconnected()
         
-        # Le client Paho gère la reconnexion automatiquement si rc != 0
+        # La boucle réseau du pool reconnecte le même client automatiquement
     
-    def publish_metric(self, topic, value, unit=None):
-        """Publie une métrique sur MQTT"""
-        if not self.connected:
+    def publish_metric(self, topic, value, unit=None, retain=False):
+        """Publie une métrique sur MQTT (retain : dernière valeur conservée par le broker)"""
+        if not self.connected and self.spool is None:
             return False
         
         try:
             payload = {
-                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "timestamp": self.serializer.timestamp(),
                 "value": value
             }
             
             if unit:
                 payload["unit"] = unit
             
-            result = self.mqtt_client.publish(topic, json.dumps(payload), qos=1)
-            
-            if result.rc == 0:
-                self.stats['messages_sent'] += 1
-                return True
-            else:
-                self.stats['errors'] += 1
-                return False
-                
+            return self._publish(topic, payload, retain)
+        
         except Exception as e:
             self.logger.error(f"Erreur publication: {e}")
             self.stats['errors'] += 1
             return False
     
-    def publish_data(self, topic, data):
+    def publish_data(self, topic, data, retain=False):
         """Publie des données complexes sur MQTT"""
-        if not self.connected:
+        if not self.connected and self.spool is None:
             return False
         
         try:
             payload = {
-                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "timestamp": self.serializer.timestamp(),
                 **data
             }
             
-            result = self.mqtt_client.publish(topic, json.dumps(payload), qos=1)
-            return result.rc == 0
-            
+            return self._publish(topic, payload, retain)
+        
         except Exception as e:
             self.logger.error(f"Erreur publication: {e}")
+            self.stats['errors'] += 1
             return False
     
+    def _publish(self, topic, payload, retain):
+        """Encode et publie un payload (durée mesurée dans l'histogramme publish)"""
+        start = time.perf_counter()
+        try:
+            return self._send(topic, self.serializer.encode(topic, payload), retain)
+        finally:
+            self._publish_histogram.observe(time.perf_counter() - start)
+    
+    def _send(self, topic, payload, retain):
+        """Publie un payload encodé, ou le met en tampon disque si le broker est injoignable"""
+        if self.connected:
+            sent = time.perf_counter()
+            result = self.mqtt_client.publish(topic, payload, qos=1, retain=retain)
+            
+            # NO_CONN : connexion perdue avant on_disconnect, Paho garde le message QoS 1
+            # et le renverra à la reconnexion (le mettre en tampon le dupliquerait)
+            if result.rc in (MQTT_ERR_SUCCESS, MQTT_ERR_NO_CONN):
+                self.stats['messages_sent'] += 1
+                self._track_ack(result.mid, sent)
+                return True
+            
+            # Seul un refus de Paho (file pleine) passe par le tampon disque
+            if result.rc != MQTT_ERR_QUEUE_SIZE or self.spool is None:
+                self.stats['errors'] += 1
+                return False
+        
+        self.spool.append(topic, payload)
+        self.stats['spooled'] += 1
+        return True
+    
+    def _track_ack(self, mid, sent):
+        """Suit une publication jusqu'à son accusé (déjà reçu si le PUBACK a devancé publish())"""
+        with self._acks_lock:
+            acked = self._early_acks.pop(mid, None)
+            if acked is None and len(self._pending_acks) < self.max_tracked_acks:
+                self._pending_acks[mid] = sent
+        
+        if acked is not None:
+            self._ack_histogram.observe(acked - sent)
+    
+    def on_publish_ack(self, mid):
+        """Accusé PUBACK (thread réseau) : latence depuis la publication
+        
+        Un mid inconnu est gardé comme accusé précoce pour _track_ack() ; les
+        accusés des autres sessions du pool (mid d'un autre collecteur) y
+        passent aussi et sont évincés par la borne ou par prune_acks().
+        """
+        now = time.perf_counter()
+        with self._acks_lock:
+            sent = self._pending_acks.pop(mid, None)
+            if sent is None:
+                if len(self._early_acks) >= self.max_tracked_acks:
+                    del self._early_acks[next(iter(self._early_acks))]
+                self._early_acks[mid] = now
+        
+        if sent is not None:
+            self._ack_histogram.observe(now - sent)
+    
+    def prune_acks(self):
+        """Oublie les publications sans accusé et les accusés précoces de plus de ack_timeout secondes"""
+        limit = time.perf_counter() - self.ack_timeout
+        with self._acks_lock:
+            for acks in (self._pending_acks, self._early_acks):
+                for mid in [mid for mid, at in acks.items() if at < limit]:
+                    del acks[mid]
+    
+    def replay_spool(self):
+        """Rejoue le tampon disque après reconnexion, au plus replay_rate messages par seconde"""
+        if not self.connected or not self.spool.pending:
+            return
+        
+        # Historique rejoué sans retain : la dernière valeur conservée reste la plus récente
+        def publish(topic, payload):
+            return self.mqtt_client.publish(topic, payload, qos=1).rc == 0
+        
+        replayed = self.spool.replay(publish, self.spool_replay_rate)
+        self.stats['replayed'] += replayed
+        
+        if replayed and not self.spool.pending:
+            self.logger.info(f"Tampon disque rejoué ({self.stats['replayed']} messages au total)")
+    
     def log_statistics(self):
         """Affiche les statistiques"""
         runtime = time.time() - self.stats['start_time']
@@ -212,10 +383,159 @@ class BaseCollector(ABC):
             f"Erreurs: {self.stats['errors']} | "
             f"Échecs connexion: {self.stats['connection_failures']}"
         )
+        
+        if self.spool is not None:
+            spool = self.spool.stats()
+            self.logger.info(
+                f"Tampon disque - Mis en tampon: {self.stats['spooled']} | "
+                f"Rejoués: {self.stats['replayed']} | "
+                f"En attente: {spool['pending']} octets | "
+                f"Segments évincés: {spool['evicted_segments']}"
+            )
+        
+        durations = [
+            f"{name}: {histogram.quantile(0.95) * 1000:.2f}ms"
+            for name, histogram in self.instrumentation.active_histograms()
+        ]
+        if durations:
+            self.logger.info(f"Durées p95 - {' | '.join(durations)}")
+    
+    def publish_internals(self):
+        """Publie les métriques internes du collecteur (topic retenu)"""
+        if not self.connected:
+            return
+        
+        internals = self.instrumentation.snapshot()
+        internals["uptime_seconds"] = int(time.time() - self.stats['start_time'])
+        self.publish_data(INTERNALS_TOPIC.format(widget=self.logger.name), internals, retain=True)
+    
+    def start_metrics_endpoint(self):
+        """Endpoint Prometheus local, si un port est configuré (COLLECTOR_METRICS_PORT)"""
+        if self.metrics_port:
+            start_metrics_server(self.metrics_port)
+    
+    def get_tasks(self):
+        """Tâches périodiques du collecteur : liste de (nom, intervalle, fonction)
+        
+        Par défaut une seule tâche collect_and_publish (collect avec le runtime
+        asyncio) à get_update_interval(). Un collecteur peut surcharger cette
+        méthode pour déclarer plusieurs groupes de métriques avec des
+        intervalles différents.
+        """
+        callback = self.collect if self.runtime == 'asyncio' else self.collect_and_publish
+        return [('collect', self.get_update_interval(), callback)]
+    
+    def schedule_tasks(self, scheduler, delay=0, owner=None):
+        """Enregistre les tâches du collecteur dans un ordonnanceur"""
+        tasks = []
+        
+        for name, interval, callback in self.get_tasks():
+            task = scheduler.add_task(f"{self.logger.name}.{name}", interval, callback, delay, owner)
+            task.callback = self._tick_task(task)
+            tasks.append(task)
+        
+        # Relecture du tampon disque, une fois par seconde
+        if self.spool is not None:
+            tasks.append(scheduler.add_task(
+                f"{self.logger.name}.spool", 1, self.replay_spool, delay, owner
+            ))
+        
+        # Accusés jamais reçus (suivi de latence borné par max_tracked_acks)
+        tasks.append(scheduler.add_task(
+            f"{self.logger.name}.acks", self.ack_timeout, self.prune_acks, self.ack_timeout, owner
+        ))
+        
+        # Afficher les statistiques toutes les 5 minutes
+        tasks.append(scheduler.add_task(
+            f"{self.logger.name}.stats", self.stats_log_interval, self.log_statistics,
+            self.stats_log_interval, owner
+        ))
+        
+        # Métriques internes (topic retenu)
+        if self.internals_interval:
+            tasks.append(scheduler.add_task(
+                f"{self.logger.name}.internals", self.internals_interval, self.publish_internals,
+                self.internals_interval, owner
+            ))
+        
+        self.scheduled_tasks = tasks
+        return tasks
+    
+    def schedule_when_connected(self, scheduler, delay=0, owner=None):
+        """Planifie les tâches dès la première connexion (comme run() après connect_mqtt)
+        
+        Les premières mesures sont publiées en direct (retain compris) au lieu
+        de passer par le tampon disque et d'être rejouées après des valeurs
+        plus récentes. Vérifié toutes les connect_poll secondes, sans bloquer
+        l'ordonnanceur partagé.
+        """
+        if self._stop_event.is_set():
+            return []
+        if self.connected:
+            return self.schedule_tasks(scheduler, delay, owner)
+        
+        scheduler.add_task(
+            f"{self.logger.name}.connect", None,
+            lambda: self.schedule_when_connected(scheduler, delay, owner), self.connect_poll, owner
+        )
+        return []
+    
+    def _tick_task(self, task):
+        """Enveloppe le callback d'une tâche (retard sur l'échéance mesuré)
+        
+        Les publications du tick partagent un horodatage formaté une fois.
+        """
+        serializer = self.serializer
+        callback = task.callback
+        lag = self._lag_histogram
+        
+        if inspect.iscoroutinefunction(callback):
+            async def run_async():
+                lag.observe(max(task.last_lateness, 0.0))
+                serializer.begin_tick()
+                try:
+                    return await callback()
+                finally:
+                    serializer.end_tick()
+            
+            return run_async
+        
+        def run():
+            lag.observe(max(task.last_lateness, 0.0))
+            serializer.begin_tick()
+            try:
+                return callback()
+            finally:
+                serializer.end_tick()
+        
+        return run
+    
+    def on_task_error(self, task, error):
+        """Erreur levée par une tâche de l'ordonnanceur"""
+        self.logger.error(f"Erreur dans la boucle de collecte ({task.name}): {error}")
+        self.stats['errors'] += 1
+    
+    def stop(self, *args):
+        """Demande l'arrêt de la boucle principale"""
+        self._stop_event.set()
+        self._connected_event.set()
     
     def run(self):
         """Boucle principale du collecteur"""
         self.logger.info("Démarrage du collecteur")
+        self.start_metrics_endpoint()
+        
+        # Profilage à la demande : COLLECTOR_PROFILE=1 ou kill -USR2 <pid>
+        setup_profiling(self.logger.name)
+        
+        if self.runtime == 'asyncio':
+            self.run_asyncio()
+            return
+        
+        startup_delay = int(os.environ.get('STARTUP_DELAY', str(self.default_startup_delay)))
+        if startup_delay > 0:
+            self.logger.info(f"Pause de {startup_delay}s au démarrage...")
+            time.sleep(startup_delay)
         
         # Se connecter au broker MQTT
         if not self.connect_mqtt():
@@ -227,48 +547,86 @@ class BaseCollector(ABC):
         # Initialiser les variables spécifiques au widget
         self.initialize()
         
-        # Compteur pour les statistiques
-        stats_counter = 0
+        # Ordonnanceur à échéances : le thread dort jusqu'à la prochaine tâche due
+        scheduler = DeadlineScheduler(on_error=self.on_task_error)
+        tasks = self.schedule_tasks(scheduler, delay=self.get_initial_delay())
         
         try:
-            while True:
-                try:
-                    # Vérifier la connexion MQTT
-                    if not self.connected:
-                        self.logger.warning("Connexion MQTT perdue, tentative de reconnexion...")
-                        if not self.connect_mqtt():
-                            self.logger.error("Reconnexion échouée, arrêt du collecteur")
-                            break
-                    
-                    # Collecter et publier les données
-                    self.collect_and_publish()
-                    
-                    # Afficher les statistiques toutes les 5 minutes
-                    stats_counter += 1
-                    if stats_counter >= 300:  # 5 minutes si sleep de 1s
-                        self.log_statistics()
-                        stats_counter = 0
-                    
-                    # Pause selon l'intervalle configuré
-                    time.sleep(self.get_update_interval())
-                    
-                except Exception as e:
-                    self.logger.error(f"Erreur dans la boucle de collecte: {e}")
-                    self.stats['errors'] += 1
-                    time.sleep(5)  # Pause en cas d'erreur
+            while not self._stop_event.is_set():
+                # Connexion perdue : la collecte continue (tampon disque) pendant que la
+                # boucle réseau du pool reconnecte le client avec backoff
+                if not self.connected and self.reconnect_exhausted():
+                    self.logger.error("Reconnexion échouée, arrêt du collecteur")
+                    break
+                
+                # Collecter et publier les données échues
+                delay = scheduler.run_pending()
                 
+                # Si trop d'erreurs consécutives, arrêter
+                if max(task.consecutive_errors for task in tasks) > self.max_consecutive_errors:
+                    self.logger.error("Trop d'erreurs consécutives, arrêt du collecteur")
+                    break
+                
+                # Pause jusqu'à la prochaine échéance
+                self._stop_event.wait(delay)
+        
         except KeyboardInterrupt:
             self.logger.info("Arrêt demandé par l'utilisateur")
         except Exception as e:
             self.logger.error(f"Erreur dans la boucle principale: {e}")
         finally:
             self.cleanup()
+            self.close_session()
             
-            if self.mqtt_client:
-                self.mqtt_client.loop_stop()
-                self.mqtt_client.disconnect()
+            self.log_statistics()
+            stop_profiling()
+            self.logger.info("Collecteur arrêté")
+    
+    def run_asyncio(self):
+        """Boucle principale sur le runtime asyncio (COLLECTOR_RUNTIME=asyncio)
+        
+        Tâches de collecte et réseau MQTT partagent une boucle et un thread :
+        un hook collect() qui attend un sous-processus ne retarde pas les autres
+        tâches. La collecte démarre à la première connexion, le tampon disque
+        couvre les coupures suivantes.
+        """
+        startup_delay = int(os.environ.get('STARTUP_DELAY', str(self.default_startup_delay)))
+        if startup_delay > 0:
+            self.logger.info(f"Pause de {startup_delay}s au démarrage...")
+            time.sleep(startup_delay)
+        
+        runtime = AsyncRuntime(on_error=self.on_task_error)
+        
+        def watchdog():
+            # Mêmes conditions d'arrêt que la boucle de l'ordonnanceur, une fois
+            # qu'une connexion a été perdue ou qu'une tentative a échoué
+            failed = self.stats['connection_failures'] or self.mqtt_session.connection.failures
+            if not self.connected and failed and self.reconnect_exhausted():
+                self.logger.error("Reconnexion échouée, arrêt du collecteur")
+                self.stop()
+            elif max((task.consecutive_errors for task in self.scheduled_tasks), default=0) > self.max_consecutive_errors:
+                self.logger.error("Trop d'erreurs consécutives, arrêt du collecteur")
+                self.stop()
+        
+        def setup():
+            self.open_session()
+            self.initialize()
+            self.schedule_when_connected(runtime, delay=self.get_initial_delay())
+            runtime.add_task(f"{self.logger.name}.watchdog", 1, watchdog, 1)
+            self.logger.info("Collecteur opérationnel (runtime asyncio)")
+        
+        try:
+            runtime.run(self._stop_event, setup)
+        except KeyboardInterrupt:
+            self.logger.info("Arrêt demandé par l'utilisateur")
+        except Exception as e:
+            self.logger.error(f"Erreur dans la boucle principale: {e}")
+        finally:
+            self.cleanup()
+            self.close_session()
             
             self.log_statistics()
+            stop_profiling()
             self.logger.info("Collecteur arrêté")
     
     @abstractmethod
@@ -291,6 +649,42 @@ class BaseCollector(ABC):
         """Retourne l'intervalle de mise à jour en secondes (à implémenter)"""
         pass
     
+    async def collect(self):
+        """Collecte asynchrone, utilisée par le runtime asyncio (peut être surchargé)
+        
+        Par défaut collect_and_publish() : les lectures /proc ne bloquent pas.
+        Un collecteur qui lance des sous-processus surcharge ce hook pour les
+        attendre sans retarder les autres tâches de la boucle.
+        """
+        self.collect_and_publish()
+    
+    def _instrument_methods(self):
+        """Remplace, sur l'instance, collect, collect_* et timed_methods par leurs versions mesurées"""
+        names = [name for name in dir(type(self)) if name == 'collect' or name.startswith('collect_')]
+        for name in names + list(self.timed_methods):
+            method = getattr(self, name, None)
+            if callable(method):
+                setattr(self, name, self.instrumentation.timed(name, method))
+    
+    def get_initial_delay(self):
+        """Délai avant la première collecte en secondes (peut être surchargé)"""
+        return 0
+    
+    def get_subscriptions(self):
+        """Topics auxquels le collecteur doit être abonné (peut être surchargé)
+        
+        Les abonnements sont repris par le pool à chaque reconnexion.
+        """
+        return []
+    
+    def on_mqtt_message(self, client, userdata, msg):
+        """Réception d'un message sur un topic abonné (peut être surchargé)"""
+        pass
+    
+    def on_mqtt_disconnected(self):
+        """Appelé quand la connexion MQTT est perdue (peut être surchargé)"""
+        pass
+    
     def cleanup(self):
         """Nettoyage optionnel avant l'arrêt (peut être surchargé)"""
-        pass
\ No newline at end of file
+        pass
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Hôte multi-widgets MaxLink
+Charge tous les collecteurs activés dans un seul processus Python et les
+pilote avec un seul ordonnanceur ; les collecteurs partagent la connexion
+MQTT du pool (mqtt_manager). Avec COLLECTOR_RUNTIME=asyncio, ordonnanceur et
+réseau MQTT tournent dans une seule boucle asyncio (async_runtime)
+"""
+
+import os
+import sys
+import glob
+import json
+import signal
+import inspect
+import logging
+import threading
+import importlib.util
+
+from collector_base import BaseCollector
+from mqtt_manager import get_connection_manager
+from scheduler import DeadlineScheduler
+from async_runtime import AsyncRuntime
+from instrumentation import stop_metrics_server
+from profiler import setup_profiling, stop_profiling
+
+logger = logging.getLogger('collector_host')
+
+# Répertoire contenant les widgets (scripts/widgets)
+WIDGETS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class CollectorPlugin:
+    """Widget chargé dans l'hôte : classe du collecteur et état de supervision"""
+    
+    def __init__(self, name, config_file, collector_class):
+        self.name = name
+        self.config_file = config_file
+        self.collector_class = collector_class
+        self.instance = None
+        
+        # Supervision
+        self.restarts = 0
+
+class CollectorHost:
+    """Pilote plusieurs collecteurs dans un seul processus"""
+    
+    def __init__(self, widgets_dir=WIDGETS_DIR, only=None):
+        """Initialise l'hôte (only = liste optionnelle de widgets à charger)"""
+        self.widgets_dir = widgets_dir
+        self.only = set(only) if only else None
+        self.plugins = {}
+        self._stop_event = threading.Event()
+        
+        # Un seul ordonnanceur pour les tâches de tous les plugins
+        if os.environ.get('COLLECTOR_RUNTIME', 'threads').lower() == 'asyncio':
+            self.scheduler = AsyncRuntime(on_error=self.on_task_error)
+        else:
+            self.scheduler = DeadlineScheduler(on_error=self.on_task_error)
+        
+        # Délai avant redémarrage d'un plugin en échec (équivalent RestartSec)
+        self.restart_delay = int(os.environ.get('COLLECTOR_RESTART_DELAY', '30'))
+    
+    # ===========================================================================
+    # CHARGEMENT DES PLUGINS
+    # ===========================================================================
+    
+    def discover(self):
+        """Retourne les widgets dont le collecteur est activé"""
+        widgets = []
+        
+        pattern = os.path.join(self.widgets_dir, '*', '*_widget.json')
+        for config_file in sorted(glob.glob(pattern)):
+            widget_dir = os.path.dirname(config_file)
+            name = os.path.basename(widget_dir)
+            
+            # Ignorer le core commun (template)
+            if name.startswith('_'):
+                continue
+            
+            if self.only is not None and name not in self.only:
+                continue
+            
+            try:
+                with open(config_file, 'r') as f:
+                    config = json.load(f)
+            except Exception as e:
+                logger.error(f"Configuration invalide pour {name}: {e}")
+                continue
+            
+            collector = config.get('collector', {})
+            if not collector.get('enabled'):
+                logger.info(f"Widget {name} passif (pas de collecteur)")
+                continue
+            
+            script = os.path.join(widget_dir, collector.get('script', f"{name}_collector.py"))
+            widgets.append((name, config_file, script, config))
+        
+        return widgets
+    
+    def load_collector_class(self, name, script):
+        """Importe le script d'un widget et retourne sa sous-classe de BaseCollector"""
+        widget_dir = os.path.dirname(script)
+        if widget_dir not in sys.path:
+            sys.path.insert(0, widget_dir)
+        
+        module_name = f"maxlink_widget_{name}"
+        spec = importlib.util.spec_from_file_location(module_name, script)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+        
+        for obj in vars(module).values():
+            if (inspect.isclass(obj) and issubclass(obj, BaseCollector)
+                    and obj.__module__ == module_name and not inspect.isabstract(obj)):
+                return obj
+        
+        raise ImportError(f"Aucune sous-classe de BaseCollector dans {script}")
+    
+    def load_plugins(self):
+        """Charge tous les widgets activés comme plugins"""
+        for name, config_file, script, config in self.discover():
+            try:
+                collector_class = self.load_collector_class(name, script)
+            except (Exception, SystemExit) as e:
+                # Un module manquant (sys.exit dans le collecteur) ne doit pas arrêter l'hôte
+                logger.error(f"Impossible de charger le widget {name}: {e}")
+                continue
+            
+            self.plugins[name] = CollectorPlugin(name, config_file, collector_class)
+            logger.info(f"Widget {name} chargé ({collector_class.__name__})")
+        
+        return len(self.plugins)
+    
+    # ===========================================================================
+    # CYCLE DE VIE DES PLUGINS
+    # ===========================================================================
+    
+    def schedule_start(self, plugin, delay=0):
+        """Planifie le démarrage d'un plugin"""
+        self.scheduler.add_task(
+            f"{plugin.name}.start", None, lambda: self.start_plugin(plugin), delay, plugin
+        )
+    
+    def start_plugin(self, plugin):
+        """Instancie, initialise et planifie les tâches du collecteur d'un plugin"""
+        try:
+            instance = plugin.collector_class(plugin.config_file)
+            plugin.instance = instance
+            
+            # Endpoint Prometheus unique pour tous les plugins (démarré par le premier)
+            instance.start_metrics_endpoint()
+            
+            # Session sur la connexion partagée (aucun nouveau socket si déjà ouverte)
+            instance.open_session()
+            instance.initialize()
+        except SystemExit as e:
+            # load_config sort par sys.exit (mode autonome) : seul ce plugin échoue, pas l'hôte
+            raise RuntimeError(f"Démarrage du collecteur interrompu (sys.exit {e.code})") from None
+        
+        # Première collecte après la connexion partagée (sinon publiée via le tampon disque)
+        instance.schedule_when_connected(self.scheduler, delay=instance.get_initial_delay(), owner=plugin)
+        
+        logger.info(f"Widget {plugin.name} démarré")
+    
+    def stop_plugin(self, plugin):
+        """Arrête proprement le collecteur d'un plugin"""
+        self.scheduler.cancel_owner(plugin)
+        
+        if plugin.instance is None:
+            return
+        
+        try:
+            plugin.instance.cleanup()
+            plugin.instance.close_session()
+            plugin.instance.log_statistics()
+        except Exception as e:
+            logger.error(f"Erreur arrêt du widget {plugin.name}: {e}")
+        
+        plugin.instance = None
+    
+    def restart_plugin(self, plugin):
+        """Redémarre un plugin en échec sans toucher aux autres"""
+        plugin.restarts += 1
+        logger.warning(f"Redémarrage du widget {plugin.name} (#{plugin.restarts}) dans {self.restart_delay}s")
+        
+        self.stop_plugin(plugin)
+        self.schedule_start(plugin, self.restart_delay)
+    
+    def on_task_error(self, task, error):
+        """Erreur dans une tâche : le plugin est redémarré s'il échoue en boucle"""
+        plugin = task.owner
+        logger.error(f"Erreur dans le widget {plugin.name} ({task.name}): {error}")
+        
+        if plugin.instance is not None and task.interval is not None:
+            plugin.instance.stats['errors'] += 1
+            max_errors = plugin.instance.max_consecutive_errors
+        else:
+            # Échec au démarrage
+            max_errors = 0
+        
+        if task.consecutive_errors > max_errors:
+            self.restart_plugin(plugin)
+    
+    # ===========================================================================
+    # BOUCLE PRINCIPALE
+    # ===========================================================================
+    
+    def stop(self, *args):
+        """Demande l'arrêt de l'hôte"""
+        self._stop_event.set()
+    
+    def run(self):
+        """Boucle principale : un seul ordonnanceur pour tous les plugins"""
+        logger.info("Démarrage de l'hôte des collecteurs")
+        
+        # Un seul profileur pour tous les plugins : COLLECTOR_PROFILE=1 ou kill -USR2 <pid>
+        setup_profiling('collector_host')
+        
+        if not self.load_plugins():
+            logger.error("Aucun widget à exécuter")
+            return
+        
+        for name in sorted(self.plugins):
+            self.schedule_start(self.plugins[name])
+        
+        try:
+            self.scheduler.run(self._stop_event)
+            
+        except KeyboardInterrupt:
+            logger.info("Arrêt demandé par l'utilisateur")
+        finally:
+            for plugin in self.plugins.values():
+                self.stop_plugin(plugin)
+            
+            get_connection_manager().shutdown()
+            stop_metrics_server()
+            stop_profiling()
+            
+            logger.info("Hôte des collecteurs arrêté")
+
+if __name__ == "__main__":
+    # Widgets à charger : arguments ou variable d'environnement (tous par défaut)
+    only = sys.argv[1:] or [w for w in os.environ.get('MAXLINK_WIDGETS', '').split(',') if w]
+    
+    host = CollectorHost(only=only)
+    signal.signal(signal.SIGTERM, host.stop)
+    host.run()
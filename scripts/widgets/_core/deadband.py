@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Filtre de bande morte pour les publications des collecteurs MaxLink
+Une valeur n'est republiée que si elle a changé de façon significative
+(seuil absolu ou en pourcentage) ou si le délai de silence maximal est écoulé
+"""
+
+import time
+
+import paho.mqtt.client as mqtt
+
+class DeadbandRule:
+    """Seuils d'un topic : écart absolu et/ou relatif (en %) déclenchant une publication"""
+    
+    __slots__ = ('absolute', 'percent', 'max_silence')
+    
+    def __init__(self, absolute=None, percent=None, max_silence=None):
+        self.absolute = absolute
+        self.percent = percent
+        self.max_silence = max_silence
+    
+    def exceeded(self, previous, value):
+        """Vérifie si l'écart entre deux valeurs dépasse un des seuils"""
+        if not isinstance(value, (int, float)) or not isinstance(previous, (int, float)):
+            return value != previous
+        
+        delta = abs(value - previous)
+        
+        if self.absolute is not None and delta >= self.absolute:
+            return True
+        
+        if self.percent is not None:
+            reference = abs(previous)
+            if reference == 0:
+                return delta > 0
+            if delta * 100.0 / reference >= self.percent:
+                return True
+        
+        # Sans seuil configuré : publication à chaque changement
+        if self.absolute is None and self.percent is None:
+            return delta > 0
+        
+        return False
+
+class DeadbandFilter:
+    """Filtre par topic avec battement de cœur (max_silence)"""
+    
+    def __init__(self, rules=None, max_silence=60, clock=time.monotonic):
+        """rules : {filtre MQTT: {"absolute": x, "percent": y, "max_silence": s}}"""
+        self.max_silence = max_silence
+        self.clock = clock
+        self.rules = [
+            (topic_filter, DeadbandRule(
+                rule.get('absolute'), rule.get('percent'), rule.get('max_silence')
+            ))
+            for topic_filter, rule in (rules or {}).items()
+        ]
+        
+        # Règle résolue par topic (None = topic non filtré)
+        self._topic_rules = {}
+        
+        # Dernière valeur publiée par topic : (valeur, instant)
+        self._last = {}
+        
+        self.suppressed = 0
+    
+    def rule_for(self, topic):
+        """Première règle dont le filtre correspond au topic"""
+        try:
+            return self._topic_rules[topic]
+        except KeyError:
+            pass
+        
+        rule = None
+        for topic_filter, candidate in self.rules:
+            if mqtt.topic_matches_sub(topic_filter, topic):
+                rule = candidate
+                break
+        
+        self._topic_rules[topic] = rule
+        return rule
+    
+    def should_publish(self, topic, value):
+        """Indique si la valeur doit être publiée (changement ou silence trop long)"""
+        rule = self.rule_for(topic)
+        if rule is None:
+            return True
+        
+        last = self._last.get(topic)
+        if last is None:
+            return True
+        
+        previous, published_at = last
+        max_silence = rule.max_silence if rule.max_silence is not None else self.max_silence
+        
+        if max_silence and self.clock() - published_at >= max_silence:
+            return True
+        
+        if rule.exceeded(previous, value):
+            return True
+        
+        self.suppressed += 1
+        return False
+    
+    def record(self, topic, value):
+        """Enregistre une valeur effectivement publiée"""
+        if self.rule_for(topic) is not None:
+            self._last[topic] = (value, self.clock())
+    
+    def reset(self):
+        """Oublie les dernières valeurs (tout sera republié au prochain cycle)"""
+        self._last.clear()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Instrumentation interne des collecteurs MaxLink
+Histogrammes de durée (fonctions de collecte, traitement des messages,
+publication, accusés PUBACK, retard de l'ordonnanceur) et jauges (profondeur
+des files), exposés en JSON sur MQTT et au format texte Prometheus par un
+petit serveur HTTP local partagé par tous les collecteurs du processus
+"""
+
+import time
+import inspect
+import logging
+import threading
+from bisect import bisect_left
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger('instrumentation')
+
+# Bornes des seaux (secondes) : de 10 µs à 5 s
+DURATION_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001,
+                    0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Topic retenu des métriques internes d'un collecteur
+INTERNALS_TOPIC = "rpi/maxlink/collectors/{widget}/internals"
+
+class Histogram:
+    """Histogramme cumulatif à seaux fixes (compatible Prometheus)
+    
+    Écritures sans verrou (chemin critique : un appel par message) : chaque
+    histogramme est alimenté par un seul thread en pratique, une mesure
+    concurrente peut au pire être perdue.
+    """
+    
+    __slots__ = ('bounds', 'counts', 'sum', 'max')
+    
+    def __init__(self, bounds=DURATION_BUCKETS):
+        self.bounds = bounds
+        # Un compteur par seau, plus le seau +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.max = 0.0
+    
+    @property
+    def count(self):
+        return sum(self.counts)
+    
+    def observe(self, value):
+        """Enregistre une durée en secondes"""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+    
+    def quantile(self, q):
+        """Estimation d'un quantile (interpolation linéaire dans le seau), ou None"""
+        counts = list(self.counts)
+        count = sum(counts)
+        maximum = self.max
+        
+        if not count:
+            return None
+        
+        rank = q * count
+        cumulative = 0
+        for index, bucket in enumerate(counts):
+            if cumulative + bucket >= rank and bucket:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else maximum
+                return min(lower + (upper - lower) * (rank - cumulative) / bucket, maximum)
+            cumulative += bucket
+        
+        return maximum
+    
+    def summary(self):
+        """Résumé publié sur MQTT (durées en millisecondes)"""
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+        
+        count = self.count
+        return {
+            "count": count,
+            "avg_ms": ms(self.sum / count) if count else None,
+            "p50_ms": ms(self.quantile(0.5)),
+            "p95_ms": ms(self.quantile(0.95)),
+            "p99_ms": ms(self.quantile(0.99)),
+            "max_ms": ms(self.max) if count else None
+        }
+    
+    def buckets(self):
+        """(borne, effectif cumulé) pour l'exposition Prometheus, +Inf compris"""
+        counts = list(self.counts)
+        
+        result = []
+        cumulative = 0
+        for bound, bucket in zip(self.bounds + (float('inf'),), counts):
+            cumulative += bucket
+            result.append((bound, cumulative))
+        return result
+
+class Instrumentation:
+    """Métriques internes d'un collecteur"""
+    
+    def __init__(self, widget):
+        self.widget = widget
+        self.histograms = {}
+        
+        # Nom -> (fonction de lecture, 'gauge' ou 'counter')
+        self.gauges = {}
+    
+    def histogram(self, name):
+        """Histogramme de durée nommé (créé au premier usage)"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+    
+    def observe(self, name, seconds):
+        self.histogram(name).observe(seconds)
+    
+    def timed(self, name, func):
+        """Enveloppe une fonction (ou coroutine) pour mesurer chacune de ses exécutions"""
+        histogram = self.histogram(name)
+        clock = time.perf_counter
+        
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def timed_async(*args, **kwargs):
+                start = clock()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.observe(clock() - start)
+            
+            return timed_async
+        
+        @wraps(func)
+        def timed_call(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(clock() - start)
+        
+        return timed_call
+    
+    def active_histograms(self):
+        """(nom, histogramme) triés, sans ceux jamais alimentés (ex. collect hors asyncio)"""
+        return [(name, histogram) for name, histogram in sorted(self.histograms.items()) if histogram.count]
+    
+    def gauge(self, name, read, kind='gauge'):
+        """Déclare une valeur lue à la demande (profondeur de file, compteur...)"""
+        self.gauges[name] = (read, kind)
+    
+    def read_gauges(self):
+        values = {}
+        for name, (read, _) in self.gauges.items():
+            try:
+                values[name] = read()
+            except Exception as e:
+                logger.debug(f"Jauge {self.widget}.{name} illisible: {e}")
+                values[name] = None
+        return values
+    
+    def snapshot(self):
+        """Résumé JSON publié sur le topic internals"""
+        return {
+            "widget": self.widget,
+            "durations": {name: histogram.summary() for name, histogram in self.active_histograms()},
+            "gauges": self.read_gauges()
+        }
+
+# ===============================================================================
+# EXPOSITION PROMETHEUS
+# ===============================================================================
+
+_registry = {}
+_registry_lock = threading.Lock()
+_server = None
+
+def register(instrumentation):
+    """Expose les métriques d'un collecteur (remplace une instance précédente du même widget)"""
+    with _registry_lock:
+        _registry[instrumentation.widget] = instrumentation
+
+def unregister(instrumentation):
+    with _registry_lock:
+        if _registry.get(instrumentation.widget) is instrumentation:
+            del _registry[instrumentation.widget]
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+def render_prometheus():
+    """Métriques de tous les collecteurs enregistrés, format texte Prometheus 0.0.4"""
+    with _registry_lock:
+        instrumentations = sorted(_registry.values(), key=lambda item: item.widget)
+    
+    lines = [
+        "# HELP maxlink_collector_duration_seconds Durée des fonctions instrumentées des collecteurs",
+        "# TYPE maxlink_collector_duration_seconds histogram"
+    ]
+    gauges = {}
+    
+    for instrumentation in instrumentations:
+        widget = _escape(instrumentation.widget)
+        
+        for name, histogram in instrumentation.active_histograms():
+            labels = f'widget="{widget}",name="{_escape(name)}"'
+            buckets = histogram.buckets()
+            for bound, cumulative in buckets:
+                lines.append(f'maxlink_collector_duration_seconds_bucket{{{labels},le="{_format_bound(bound)}"}} {cumulative}')
+            lines.append(f'maxlink_collector_duration_seconds_sum{{{labels}}} {histogram.sum!r}')
+            # _count égal au seau +Inf, même si une mesure arrive pendant la lecture
+            lines.append(f'maxlink_collector_duration_seconds_count{{{labels}}} {buckets[-1][1]}')
+        
+        values = instrumentation.read_gauges()
+        for name, (_, kind) in instrumentation.gauges.items():
+            value = values.get(name)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                gauges.setdefault((name, kind), []).append((widget, value))
+    
+    # Une famille par jauge, tous widgets confondus
+    for (name, kind), samples in sorted(gauges.items()):
+        metric = f"maxlink_collector_{name}" + ("_total" if kind == 'counter' else "")
+        lines.append(f"# TYPE {metric} {kind}")
+        for widget, value in samples:
+            lines.append(f'{metric}{{widget="{widget}"}} {value!r}')
+    
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        # Pas de ligne de journal par requête de scrape
+        pass
+
+def start_metrics_server(port, host='127.0.0.1'):
+    """Démarre (une seule fois par processus) l'endpoint Prometheus ; False si impossible"""
+    global _server
+    
+    with _registry_lock:
+        if _server is not None:
+            return True
+        
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            logger.warning(f"Endpoint Prometheus indisponible sur {host}:{port}: {e}")
+            return False
+        
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    
+    logger.info(f"Métriques Prometheus sur http://{host}:{port}/metrics")
+    return True
+
+def stop_metrics_server():
+    """Arrête l'endpoint Prometheus"""
+    global _server
+    
+    with _registry_lock:
+        server, _server = _server, None
+    
+    if server is not None:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+File de messages bornée pour les collecteurs MaxLink
+Découple le thread réseau MQTT du traitement : la réception ne fait
+qu'empiler, un thread de travail vide la file par lots
+"""
+
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger('message_queue')
+
+class MessageQueue:
+    """Tampon circulaire borné (politique : le plus ancien est perdu) et son thread de traitement"""
+    
+    def __init__(self, maxlen=10000, batch_size=500):
+        self.maxlen = maxlen
+        self.batch_size = batch_size
+        self._items = deque(maxlen=maxlen)
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self.thread = None
+        
+        # Compteurs
+        self.enqueued = 0
+        self.dropped = 0
+        self.processed = 0
+        self.batches = 0
+        self.max_depth = 0
+    
+    def __len__(self):
+        return len(self._items)
+    
+    def put(self, item):
+        """Empile un élément sans jamais bloquer (thread réseau)"""
+        depth = len(self._items)
+        if depth >= self.maxlen:
+            # deque(maxlen) évince le plus ancien à l'ajout
+            self.dropped += 1
+        elif depth >= self.max_depth:
+            self.max_depth = depth + 1
+        
+        self._items.append(item)
+        self.enqueued += 1
+        
+        if not self._ready.is_set():
+            self._ready.set()
+    
+    def drain(self, limit=None):
+        """Retire jusqu'à limit éléments (tous par défaut)"""
+        items = []
+        popleft = self._items.popleft
+        limit = limit or len(self._items)
+        
+        try:
+            while len(items) < limit:
+                items.append(popleft())
+        except IndexError:
+            pass
+        
+        return items
+    
+    def start(self, handler, name="message-worker"):
+        """Démarre le thread qui appelle handler(lot) pour chaque lot de messages"""
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._worker, args=(handler,), name=name, daemon=True)
+        self.thread.start()
+    
+    def stop(self, timeout=5):
+        """Arrête le thread de traitement"""
+        self._stop.set()
+        self._ready.set()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+            self.thread = None
+    
+    def stats(self):
+        """Compteurs de la file"""
+        return {
+            "depth": len(self._items),
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "batches": self.batches
+        }
+    
+    def _worker(self, handler):
+        while not self._stop.is_set():
+            self._ready.wait(1.0)
+            self._ready.clear()
+            
+            while not self._stop.is_set():
+                batch = self.drain(self.batch_size)
+                if not batch:
+                    break
+                
+                try:
+                    handler(batch)
+                except Exception as e:
+                    logger.error(f"Erreur traitement d'un lot de messages: {e}")
+                
+                self.processed += len(batch)
+                self.batches += 1
@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Gestionnaire de connexions MQTT partagées pour les collecteurs MaxLink
+Pool de clients Paho réutilisables pilotés par une seule boucle réseau
+"""
+
+import os
+import time
+import random
+import socket
+import select
+import logging
+import threading
+
+import paho.mqtt.client as mqtt
+
+from topic_trie import TopicFilterTrie
+
+logger = logging.getLogger('mqtt_manager')
+
+class MQTTSession:
+    """Accès d'un collecteur à une connexion partagée du pool"""
+    
+    def __init__(self, connection, owner, subscriptions=(), on_connect=None,
+                 on_disconnect=None, on_message=None, on_publish=None):
+        self.connection = connection
+        self.owner = owner
+        self.subscriptions = list(subscriptions)
+        self.filters = TopicFilterTrie(self.subscriptions)
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.on_message = on_message
+        
+        # on_publish(mid) : accusé d'un message (PUBACK en QoS 1), pour toutes les sessions
+        self.on_publish = on_publish
+        self.released = False
+    
+    @property
+    def client(self):
+        """Client Paho sous-jacent (partagé, ne pas déconnecter)"""
+        return self.connection.client
+    
+    @property
+    def connected(self):
+        """État de la connexion partagée"""
+        return self.connection.connected
+    
+    def wait_connected(self, timeout=None):
+        """Attend la connexion (Event du pool, sans attente active) ; False si timeout"""
+        return self.connection.ready.wait(timeout)
+    
+    def publish(self, topic, payload, qos=1, retain=False):
+        """Publie via la connexion partagée"""
+        return self.connection.client.publish(topic, payload, qos=qos, retain=retain)
+    
+    def subscribe(self, topic):
+        """Ajoute un abonnement à la session (effectif immédiatement si connecté)"""
+        if topic not in self.subscriptions:
+            self.subscriptions.append(topic)
+            self._compile_filters()
+            self.connection.subscribe(topic)
+    
+    def unsubscribe(self, topic):
+        """Retire un abonnement de la session"""
+        if topic in self.subscriptions:
+            self.subscriptions.remove(topic)
+            self._compile_filters()
+            self.connection.unsubscribe(topic)
+    
+    def _compile_filters(self):
+        """Reconstruit l'arbre des abonnements
+        
+        Un nouvel arbre remplace l'ancien d'un seul coup : le thread réseau
+        qui distribue un message ne voit jamais un arbre (ni un cache) à moitié
+        mis à jour.
+        """
+        self.filters = TopicFilterTrie(self.subscriptions)
+    
+    def matches(self, topic):
+        """Vérifie si un topic correspond aux abonnements de la session (appelé par message reçu)"""
+        return self.filters.matches(topic)
+    
+    def release(self):
+        """Rend la connexion au pool"""
+        if not self.released:
+            self.released = True
+            self.connection.manager.release(self)
+
+class PooledConnection:
+    """Client Paho du pool, partagé par toutes les sessions d'un même broker"""
+    
+    def __init__(self, manager, key, broker_config, client_id=None):
+        self.manager = manager
+        self.key = key
+        self.broker_config = broker_config
+        self.sessions = []
+        self.connected = False
+        self.next_attempt = 0
+        self.failures = 0
+        self.lock = threading.RLock()
+        
+        # Signalé à chaque connexion établie, effacé à la déconnexion
+        self.ready = threading.Event()
+        
+        # Un seul client par connexion, réutilisé à chaque reconnexion
+        self.client = mqtt.Client(client_id=client_id or "")
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_message = self._on_message
+        self.client.on_publish = self._on_publish
+        
+        # La boucle réseau du gestionnaire remplace loop_start()
+        self.client.on_socket_register_write = lambda c, u, s: manager.wakeup()
+        self.client.on_socket_unregister_write = lambda c, u, s: None
+        self.client.on_socket_close = lambda c, u, s: manager.socket_closed(self)
+        
+        if broker_config.get('username'):
+            self.client.username_pw_set(
+                broker_config['username'],
+                broker_config.get('password')
+            )
+        
+        self.client.connect_async(broker_config['host'], broker_config['port'], 60)
+    
+    def add_session(self, session):
+        """Ajoute une session et s'abonne à ses topics si déjà connecté"""
+        with self.lock:
+            self.sessions.append(session)
+            connected = self.connected
+        
+        if connected:
+            for topic in session.subscriptions:
+                self.client.subscribe(topic)
+            if session.on_connect:
+                session.on_connect(self.client, None, {}, 0)
+    
+    def remove_session(self, session):
+        """Retire une session et se désabonne des topics devenus inutiles"""
+        with self.lock:
+            if session in self.sessions:
+                self.sessions.remove(session)
+            remaining = set()
+            for other in self.sessions:
+                remaining.update(other.subscriptions)
+            connected = self.connected
+        
+        if connected:
+            for topic in set(session.subscriptions) - remaining:
+                self.client.unsubscribe(topic)
+    
+    def subscribe(self, topic):
+        """Abonnement au broker (rétabli par _on_connect après une reconnexion)"""
+        if self.connected:
+            self.client.subscribe(topic)
+    
+    def unsubscribe(self, topic):
+        """Désabonnement si plus aucune session n'utilise le filtre"""
+        with self.lock:
+            needed = any(topic in other.subscriptions for other in self.sessions)
+            connected = self.connected
+        
+        if connected and not needed:
+            self.client.unsubscribe(topic)
+    
+    def try_connect(self):
+        """Tentative de (re)connexion du client existant"""
+        self.manager.connection_attempts += 1
+        try:
+            self.client.reconnect()
+        except (OSError, socket.error) as e:
+            delay = self.schedule_retry()
+            logger.error(f"Erreur connexion MQTT {self.broker_config['host']}:{self.broker_config['port']}: {e} "
+                         f"(nouvelle tentative dans {delay:.1f}s)")
+    
+    def schedule_retry(self):
+        """Échec de connexion : prochaine tentative après un backoff exponentiel avec gigue
+        
+        Le délai double à chaque échec jusqu'à retry_max ; la gigue (entre la
+        moitié et la totalité du délai) évite que tous les collecteurs se
+        reconnectent au même instant après un redémarrage du broker.
+        """
+        self.failures += 1
+        delay = min(self.manager.retry_max, self.manager.retry_base * 2 ** min(self.failures - 1, 16))
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        self.next_attempt = time.monotonic() + delay
+        return delay
+    
+    def _on_connect(self, client, userdata, flags, rc):
+        """Connexion établie : abonnements cumulés puis notification des sessions"""
+        if rc != 0:
+            delay = self.schedule_retry()
+            logger.error(f"Échec connexion MQTT, code: {rc} (nouvelle tentative dans {delay:.1f}s)")
+            return
+        
+        with self.lock:
+            self.connected = True
+            self.failures = 0
+            sessions = list(self.sessions)
+        self.ready.set()
+        
+        logger.info(f"Connexion MQTT partagée établie ({len(sessions)} session(s))")
+        
+        topics = set()
+        for session in sessions:
+            topics.update(session.subscriptions)
+        for topic in sorted(topics):
+            client.subscribe(topic)
+        
+        for session in sessions:
+            if session.on_connect:
+                try:
+                    session.on_connect(client, userdata, flags, rc)
+                except Exception as e:
+                    logger.error(f"Erreur callback connexion ({session.owner}): {e}")
+    
+    def _on_disconnect(self, client, userdata, rc):
+        """Connexion perdue : la boucle réseau reconnectera le même client"""
+        with self.lock:
+            was_connected = self.connected
+            self.connected = False
+            sessions = list(self.sessions)
+        self.ready.clear()
+        
+        if rc == 0:
+            self.next_attempt = 0
+        elif was_connected:
+            # Perte inattendue : première tentative rapide, étalée entre les clients
+            self.next_attempt = time.monotonic() + random.uniform(0, self.manager.retry_base)
+        else:
+            # Fermée avant l'acquittement de connexion : c'est un échec
+            self.schedule_retry()
+        
+        for session in sessions:
+            if session.on_disconnect:
+                try:
+                    session.on_disconnect(client, userdata, rc)
+                except Exception as e:
+                    logger.error(f"Erreur callback déconnexion ({session.owner}): {e}")
+    
+    def _on_message(self, client, userdata, msg):
+        """Distribue un message aux sessions abonnées au topic"""
+        for session in self.sessions:
+            if session.on_message and session.matches(msg.topic):
+                try:
+                    session.on_message(client, userdata, msg)
+                except Exception as e:
+                    logger.error(f"Erreur traitement message ({session.owner}): {e}")
+    
+    def _on_publish(self, client, userdata, mid):
+        """Accusé de publication : chaque session retrouve (ou ignore) ses propres mid"""
+        for session in self.sessions:
+            if session.on_publish:
+                try:
+                    session.on_publish(mid)
+                except Exception as e:
+                    logger.error(f"Erreur callback publication ({session.owner}): {e}")
+
+class MQTTConnectionManager:
+    """Pool de connexions MQTT et boucle réseau unique du processus"""
+    
+    def __init__(self):
+        self.connections = {}
+        self.lock = threading.Lock()
+        self.thread = None
+        self.running = False
+        self.connection_attempts = 0
+        
+        # Pilote externe de la boucle réseau (boucle asyncio), à la place du thread
+        self.driver = None
+        
+        # Backoff de reconnexion : délai initial, doublé à chaque échec jusqu'à MQTT_RETRY_DELAY
+        self.retry_base = float(os.environ.get('MQTT_BACKOFF_BASE', '0.5'))
+        self.retry_max = float(os.environ.get('MQTT_RETRY_DELAY', '10'))
+        
+        # Paire de sockets pour réveiller select() depuis un autre thread
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+    
+    def acquire(self, broker_config, owner, subscriptions=(), on_connect=None,
+                on_disconnect=None, on_message=None, client_id=None, on_publish=None):
+        """Retourne une session sur la connexion partagée du broker"""
+        key = (
+            broker_config['host'],
+            int(broker_config['port']),
+            broker_config.get('username'),
+            client_id
+        )
+        
+        with self.lock:
+            connection = self.connections.get(key)
+            if connection is None:
+                connection = PooledConnection(self, key, broker_config, client_id)
+                self.connections[key] = connection
+                logger.info(f"Nouvelle connexion dans le pool: {key[0]}:{key[1]}")
+            driver = self.driver
+        
+        if driver is not None:
+            driver.add_connection(connection)
+        
+        session = MQTTSession(connection, owner, subscriptions,
+                              on_connect, on_disconnect, on_message, on_publish)
+        connection.add_session(session)
+        
+        self.start()
+        self.wakeup()
+        return session
+    
+    def release(self, session):
+        """Libère une session (la connexion est fermée quand plus personne ne l'utilise)"""
+        connection = session.connection
+        connection.remove_session(session)
+        
+        with self.lock:
+            if connection.sessions or self.connections.get(connection.key) is not connection:
+                return
+            del self.connections[connection.key]
+            driver = self.driver
+        
+        if driver is not None:
+            driver.remove_connection(connection)
+        
+        try:
+            connection.client.disconnect()
+            connection.client.loop_write()
+        except Exception:
+            pass
+        
+        self.wakeup()
+    
+    def wakeup(self):
+        """Réveille la boucle réseau (données à écrire, nouvelle connexion...)"""
+        driver = self.driver
+        if driver is not None:
+            driver.wakeup()
+            return
+        
+        try:
+            self._wake_w.send(b'\x00')
+        except (BlockingIOError, OSError):
+            pass
+    
+    def socket_closed(self, connection):
+        """Socket d'un client sur le point d'être fermée (appelé par Paho avant close)"""
+        driver = self.driver
+        if driver is not None:
+            driver.remove_connection(connection)
+    
+    def attach_driver(self, driver):
+        """Confie la boucle réseau à un pilote externe (sockets surveillées par asyncio)
+        
+        À appeler avant toute connexion : le thread réseau n'est alors pas démarré.
+        """
+        with self.lock:
+            if self.running:
+                raise RuntimeError("Boucle réseau déjà démarrée dans un thread")
+            self.driver = driver
+            connections = list(self.connections.values())
+        
+        for connection in connections:
+            driver.add_connection(connection)
+    
+    def detach_driver(self):
+        """Retire le pilote externe (arrêt de la boucle asyncio)"""
+        with self.lock:
+            driver, self.driver = self.driver, None
+        
+        if driver is not None:
+            driver.stop()
+    
+    def start(self):
+        """Démarre la boucle réseau si nécessaire"""
+        with self.lock:
+            if self.running or self.driver is not None:
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self._network_loop, name="mqtt-network", daemon=True)
+            self.thread.start()
+    
+    def shutdown(self):
+        """Déconnecte tous les clients et arrête la boucle réseau"""
+        with self.lock:
+            connections = list(self.connections.values())
+            self.connections.clear()
+            self.running = False
+        
+        for connection in connections:
+            try:
+                connection.client.disconnect()
+                connection.client.loop_write()
+            except Exception:
+                pass
+        
+        self.wakeup()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+    
+    def _network_loop(self):
+        """Boucle réseau unique : select() sur les sockets de tous les clients"""
+        while self.running:
+            try:
+                with self.lock:
+                    connections = list(self.connections.values())
+                
+                now = time.monotonic()
+                readers = [self._wake_r]
+                writers = []
+                sockets = {}
+                timeout = 1.0
+                
+                for connection in connections:
+                    sock = connection.client.socket()
+                    
+                    if sock is None:
+                        if now >= connection.next_attempt:
+                            connection.try_connect()
+                            sock = connection.client.socket()
+                        if sock is None:
+                            timeout = min(timeout, max(0.1, connection.next_attempt - now))
+                            continue
+                    
+                    sockets[sock] = connection
+                    readers.append(sock)
+                    if connection.client.want_write():
+                        writers.append(sock)
+                
+                readable, writable, _ = select.select(readers, writers, [], timeout)
+                
+                if self._wake_r in readable:
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                
+                for sock in readable:
+                    if sock in sockets:
+                        sockets[sock].client.loop_read()
+                
+                for sock in writable:
+                    if sock in sockets:
+                        sockets[sock].client.loop_write()
+                
+                # Keepalive (PINGREQ) et détection des connexions mortes
+                for connection in sockets.values():
+                    connection.client.loop_misc()
+            
+            except Exception as e:
+                logger.error(f"Erreur dans la boucle réseau MQTT: {e}")
+                time.sleep(1)
+
+# Gestionnaire unique du processus (partagé par tous les collecteurs)
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_connection_manager():
+    """Retourne le gestionnaire de connexions du processus"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = MQTTConnectionManager()
+        return _manager
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Lecture de /proc et /sys pour les collecteurs MaxLink
+Échantillonneur CPU non bloquant : l'utilisation est calculée à partir des
+écarts entre deux lectures successives de /proc/stat, sans aucune attente.
+Pseudo-fichiers ouverts une fois et relus par pread (températures, fréquences...)
+"""
+
+import os
+import glob
+import time
+
+PROC_STAT = "/proc/stat"
+
+# Colonnes des lignes "cpu" de /proc/stat (en jiffies)
+CPU_FIELDS = ('user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal', 'guest', 'guest_nice')
+
+class CPUUsage:
+    """Répartition de l'utilisation d'un CPU (en %) sur le dernier intervalle"""
+    
+    __slots__ = ('usage', 'iowait', 'steal', 'irq', 'smoothed')
+    
+    def __init__(self, usage=0.0, iowait=0.0, steal=0.0, irq=0.0, smoothed=0.0):
+        self.usage = usage
+        self.iowait = iowait
+        self.steal = steal
+        self.irq = irq
+        self.smoothed = smoothed
+
+def read_cpu_times(path=PROC_STAT):
+    """Retourne {nom: (total, inactif, iowait, steal, irq)} pour chaque ligne cpu"""
+    times = {}
+    
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.startswith('cpu'):
+                # Les lignes cpu sont en tête de fichier
+                break
+            
+            parts = line.split()
+            values = [int(v) for v in parts[1:len(CPU_FIELDS) + 1]]
+            values += [0] * (len(CPU_FIELDS) - len(values))
+            user, nice, system, idle, iowait, irq, softirq, steal, guest, guest_nice = values
+            
+            # guest et guest_nice sont déjà comptés dans user et nice
+            total = user + nice + system + idle + iowait + irq + softirq + steal
+            times[parts[0]] = (total, idle + iowait, iowait, steal, irq + softirq)
+    
+    return times
+
+class CPUSampler:
+    """Utilisation CPU par écart entre lectures de /proc/stat (équivalent interval=None)
+    
+    Chaque appel à sample() lit /proc/stat une seule fois et retourne
+    l'utilisation depuis l'appel précédent ; il peut donc être appelé depuis
+    l'ordonnanceur à n'importe quelle fréquence sans ajouter de latence.
+    """
+    
+    def __init__(self, ewma_alpha=0.3, path=PROC_STAT):
+        """ewma_alpha : poids du dernier échantillon dans la moyenne lissée"""
+        self.path = path
+        self.ewma_alpha = ewma_alpha
+        self.usage = {}
+        
+        # Lecture de référence : le premier sample() couvre la période depuis la création
+        self._previous = read_cpu_times(path)
+    
+    def sample(self):
+        """Retourne {nom: CPUUsage} ('cpu' = total, 'cpu0'... = cores)"""
+        current = read_cpu_times(self.path)
+        
+        for name, times in current.items():
+            previous = self._previous.get(name)
+            if previous is None:
+                continue
+            
+            total = times[0] - previous[0]
+            if total <= 0:
+                # Deux lectures dans le même jiffy : on garde la valeur précédente
+                self.usage.setdefault(name, CPUUsage())
+                continue
+            
+            idle, iowait, steal, irq = (times[i] - previous[i] for i in range(1, 5))
+            busy = max(0.0, min(100.0, (total - idle) * 100.0 / total))
+            
+            usage = self.usage.get(name)
+            if usage is None:
+                usage = self.usage[name] = CPUUsage(smoothed=busy)
+            else:
+                usage.smoothed += self.ewma_alpha * (busy - usage.smoothed)
+            
+            usage.usage = busy
+            usage.iowait = iowait * 100.0 / total
+            usage.steal = steal * 100.0 / total
+            usage.irq = irq * 100.0 / total
+        
+        self._previous = current
+        return self.usage
+    
+    def cores(self):
+        """Utilisation des cores dans l'ordre (cpu0, cpu1...)"""
+        names = [name for name in self.usage if name != 'cpu']
+        names.sort(key=lambda name: int(name[3:]))
+        return [self.usage[name] for name in names]
+    
+    def total(self):
+        """Utilisation globale (ligne 'cpu' de /proc/stat)"""
+        return self.usage.get('cpu', CPUUsage())
+
+# ===============================================================================
+# PSEUDO-FICHIERS À DESCRIPTEUR PERSISTANT
+# ===============================================================================
+
+THERMAL_DIR = "/sys/class/thermal"
+CPUFREQ_DIR = "/sys/devices/system/cpu/cpufreq"
+
+# Types de zones thermales correspondant au CPU (Raspberry Pi, x86, SoC génériques)
+CPU_THERMAL_TYPES = ('cpu-thermal', 'cpu_thermal', 'x86_pkg_temp', 'soc_thermal', 'soc-thermal')
+
+# Les valeurs de /proc et /sys se terminent par un saut de ligne
+NEWLINE = ord('\n')
+
+class PseudoFile:
+    """Fichier /proc ou /sys ouvert une seule fois et relu par pread à l'offset 0
+    
+    La lecture se fait dans un tampon préalloué. Si le fichier disparaît
+    (capteur retiré, module déchargé), read() retourne None et la réouverture
+    est retentée au plus toutes les reopen_interval secondes.
+    """
+    
+    def __init__(self, path, size=256, reopen_interval=60):
+        self.path = path
+        self.reopen_interval = reopen_interval
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._fd = None
+        self._next_open = 0
+        self._open()
+    
+    @property
+    def available(self):
+        """Le fichier est actuellement ouvert"""
+        return self._fd is not None
+    
+    def _open(self):
+        try:
+            self._fd = os.open(self.path, os.O_RDONLY | os.O_CLOEXEC)
+        except OSError:
+            self._fd = None
+            self._next_open = time.monotonic() + self.reopen_interval
+    
+    def close(self):
+        """Ferme le descripteur"""
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+    
+    def read(self):
+        """Contenu du fichier (bytes sans espaces de fin) ou None si indisponible"""
+        if self._fd is None:
+            if time.monotonic() < self._next_open:
+                return None
+            self._open()
+            if self._fd is None:
+                return None
+        
+        try:
+            length = os.preadv(self._fd, [self._buffer], 0)
+        except OSError:
+            self.close()
+            self._next_open = time.monotonic() + self.reopen_interval
+            return None
+        
+        # Saut de ligne final retiré sur la vue : une seule copie du tampon
+        # (strip() rend le même objet quand il n'y a plus rien à retirer)
+        if length and self._buffer[length - 1] == NEWLINE:
+            length -= 1
+        return self._view[:length].tobytes().strip()
+    
+    def read_int(self):
+        """Contenu entier (ex: millidegrés, kHz) ou None"""
+        data = self.read()
+        if not data:
+            return None
+        try:
+            return int(data)
+        except ValueError:
+            return None
+    
+    def read_fields(self):
+        """Champs séparés par des espaces ou None"""
+        data = self.read()
+        return data.split() if data else None
+
+def probe_cpu_thermal_zone(base=THERMAL_DIR):
+    """Chemin du fichier temp de la zone thermale du CPU (None si aucune)"""
+    zones = sorted(
+        glob.glob(os.path.join(base, 'thermal_zone*')),
+        key=lambda path: int(path.rsplit('thermal_zone', 1)[1] or 0)
+    )
+    
+    for zone in zones:
+        try:
+            with open(os.path.join(zone, 'type'), 'r') as f:
+                zone_type = f.read().strip()
+        except OSError:
+            continue
+        
+        if zone_type in CPU_THERMAL_TYPES:
+            return os.path.join(zone, 'temp')
+    
+    # Par défaut la première zone (thermal_zone0 sur Raspberry Pi)
+    for zone in zones:
+        temp = os.path.join(zone, 'temp')
+        if os.path.exists(temp):
+            return temp
+    
+    return None
+
+def probe_cpufreq_policies(base=CPUFREQ_DIR):
+    """Fichiers scaling_cur_freq de chaque politique cpufreq (policy0, policy1...)"""
+    policies = sorted(
+        glob.glob(os.path.join(base, 'policy*')),
+        key=lambda path: int(path.rsplit('policy', 1)[1] or 0)
+    )
+    
+    paths = []
+    for policy in policies:
+        path = os.path.join(policy, 'scaling_cur_freq')
+        if os.path.exists(path):
+            paths.append(path)
+    
+    # Anciens noyaux : pas de policyN, seulement cpuN/cpufreq
+    if not paths:
+        legacy = "/sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq"
+        if os.path.exists(legacy):
+            paths.append(legacy)
+    
+    return paths
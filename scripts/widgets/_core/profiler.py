@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Profilage à la demande des collecteurs MaxLink
+Échantillonnage périodique des piles de tous les threads (format collapsed,
+lisible par flamegraph.pl / speedscope) et principaux allocateurs
+tracemalloc, pendant une fenêtre de quelques secondes, sans redémarrer
+le service : COLLECTOR_PROFILE=1 au démarrage ou signal SIGUSR2
+"""
+
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+
+logger = logging.getLogger('profiler')
+
+# Répertoire des profils : logs/python à la racine de MaxLink
+PROFILE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))),
+    'logs', 'python'
+)
+
+class SamplingProfiler:
+    """Profileur par échantillonnage (sys._current_frames), un seul par processus"""
+    
+    # Période d'échantillonnage (secondes) : 100 Hz
+    sample_interval = 0.01
+    
+    # Nombre de lignes tracemalloc conservées
+    top_allocations = 25
+    
+    def __init__(self, name, output_dir=PROFILE_DIR):
+        self.name = name
+        self.output_dir = output_dir
+        self.thread = None
+        self._stop = threading.Event()
+        
+        # Réentrant : start() est aussi appelé par le gestionnaire de SIGUSR2 (thread principal)
+        self.lock = threading.RLock()
+    
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+    
+    def start(self, duration):
+        """Démarre une fenêtre de profilage de duration secondes ; False si déjà en cours"""
+        with self.lock:
+            if self.running:
+                logger.info("Profilage déjà en cours")
+                return False
+            
+            self._stop.clear()
+            self.thread = threading.Thread(target=self._run, args=(duration,), name="profiler", daemon=True)
+            self.thread.start()
+        
+        logger.info(f"Profilage démarré pour {duration}s (échantillonnage {1 / self.sample_interval:.0f} Hz + tracemalloc)")
+        return True
+    
+    def stop(self, timeout=5):
+        """Termine la fenêtre en cours (les résultats partiels sont écrits)"""
+        self._stop.set()
+        thread = self.thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+    
+    def _run(self, duration):
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        
+        stacks = Counter()
+        samples = 0
+        own_ident = threading.get_ident()
+        names = {}
+        start = time.monotonic()
+        deadline = start + duration
+        
+        try:
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                frames = sys._current_frames()
+                
+                # Noms des threads relus seulement quand un nouveau thread apparaît
+                if not names.keys() >= frames.keys():
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                
+                for ident, frame in frames.items():
+                    if ident != own_ident:
+                        stacks[self._collapse(names.get(ident, str(ident)), frame)] += 1
+                samples += 1
+                
+                self._stop.wait(self.sample_interval)
+            
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+        
+        elapsed = time.monotonic() - start
+        self._dump(stacks, samples, elapsed, snapshot, current, peak)
+    
+    @staticmethod
+    def _collapse(thread_name, frame):
+        """Pile au format collapsed : thread;fichier:fonction;... (de la racine vers la feuille)"""
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        parts.append(thread_name.replace(';', '_'))
+        parts.reverse()
+        return ';'.join(parts)
+    
+    def _dump(self, stacks, samples, elapsed, snapshot, current, peak):
+        """Écrit profile-<nom>-<date>.collapsed et .tracemalloc.txt dans output_dir"""
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+        except OSError as e:
+            logger.error(f"Répertoire des profils inaccessible ({self.output_dir}): {e}")
+            return
+        
+        prefix = os.path.join(self.output_dir, f"profile-{self.name}-{time.strftime('%Y%m%d-%H%M%S')}")
+        
+        try:
+            with open(prefix + '.collapsed', 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            
+            # Allocations encore vivantes, hors profileur et machinerie d'import
+            snapshot = snapshot.filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+            ))
+            
+            with open(prefix + '.tracemalloc.txt', 'w') as f:
+                f.write(f"# {self.name} - {elapsed:.1f}s - {samples} échantillons\n")
+                f.write(f"# Mémoire tracée : {current / 1024:.1f} Kio (pic {peak / 1024:.1f} Kio)\n")
+                f.write(f"# Top {self.top_allocations} des lignes allouant pendant la fenêtre\n")
+                for stat in snapshot.statistics('lineno')[:self.top_allocations]:
+                    f.write(f"{stat}\n")
+        
+        except OSError as e:
+            logger.error(f"Écriture du profil impossible ({prefix}): {e}")
+            return
+        
+        logger.info(f"Profil écrit: {prefix}.collapsed, {prefix}.tracemalloc.txt "
+                    f"({samples} échantillons en {elapsed:.1f}s)")
+
+_profiler = None
+
+def setup_profiling(name):
+    """Profileur du processus : SIGUSR2 lance une fenêtre, COLLECTOR_PROFILE=1 dès le démarrage
+    
+    Durée de la fenêtre : COLLECTOR_PROFILE_SECONDS (60 par défaut).
+    À appeler depuis le thread principal (installation du gestionnaire de signal).
+    """
+    global _profiler
+    
+    if _profiler is None:
+        _profiler = SamplingProfiler(name, os.environ.get('COLLECTOR_PROFILE_DIR', PROFILE_DIR))
+    
+    duration = float(os.environ.get('COLLECTOR_PROFILE_SECONDS', '60'))
+    
+    if os.environ.get('COLLECTOR_PROFILE', '').lower() in ('1', 'true', 'yes'):
+        _profiler.start(duration)
+    
+    try:
+        signal.signal(signal.SIGUSR2, lambda signum, frame: _profiler.start(duration))
+    except (ValueError, AttributeError) as e:
+        # Hors du thread principal, ou plateforme sans SIGUSR2
+        logger.debug(f"Profilage par SIGUSR2 indisponible: {e}")
+    
+    return _profiler
+
+def stop_profiling():
+    """Termine une fenêtre éventuellement en cours (arrêt du collecteur)"""
+    if _profiler is not None and _profiler.running:
+        _profiler.stop()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Ordonnanceur à échéances pour les collecteurs MaxLink
+Tas de tâches sur horloge monotone : le thread dort exactement jusqu'à la
+prochaine tâche due, sans boucle d'attente active
+"""
+
+import time
+import heapq
+import logging
+import itertools
+
+logger = logging.getLogger('scheduler')
+
+class ScheduledTask:
+    """Tâche périodique (ou ponctuelle si interval est None)"""
+    
+    def __init__(self, name, interval, callback, due, owner=None):
+        self.name = name
+        self.interval = interval
+        self.callback = callback
+        self.due = due
+        self.owner = owner
+        self.cancelled = False
+        
+        # Statistiques d'exécution
+        self.runs = 0
+        self.skipped = 0
+        self.consecutive_errors = 0
+        self.last_lateness = 0.0
+    
+    def cancel(self):
+        """Annule la tâche (retirée du tas à sa prochaine échéance)"""
+        self.cancelled = True
+    
+    def advance(self, now):
+        """Calcule l'échéance suivante après une exécution terminée à l'instant now
+        
+        Compensation de dérive : l'échéance suivante reste sur la grille
+        initiale (due + n * interval) au lieu de glisser avec le temps
+        d'exécution ; les échéances manquées sont sautées, pas rattrapées
+        """
+        next_due = self.due + self.interval
+        if next_due <= now:
+            missed = int((now - next_due) // self.interval) + 1
+            self.skipped += missed
+            next_due += missed * self.interval
+        
+        self.due = next_due
+
+class DeadlineScheduler:
+    """Ordonnanceur à échéances avec compensation de dérive"""
+    
+    def __init__(self, on_error=None, clock=time.monotonic):
+        """on_error(task, exception) est appelé quand une tâche lève une exception"""
+        self.on_error = on_error
+        self.clock = clock
+        self._heap = []
+        self._counter = itertools.count()
+    
+    def add_task(self, name, interval, callback, delay=0, owner=None):
+        """Ajoute une tâche dont la première exécution a lieu dans delay secondes"""
+        task = ScheduledTask(name, interval, callback, self.clock() + delay, owner)
+        self._push(task)
+        return task
+    
+    def cancel_owner(self, owner):
+        """Annule toutes les tâches d'un propriétaire (plugin, collecteur...)"""
+        for _, _, task in self._heap:
+            if task.owner is owner:
+                task.cancel()
+    
+    def next_delay(self):
+        """Secondes avant la prochaine échéance (None si aucune tâche)"""
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        
+        if not self._heap:
+            return None
+        
+        return max(0.0, self._heap[0][0] - self.clock())
+    
+    def run_pending(self):
+        """Exécute toutes les tâches échues et retourne le délai avant la suivante"""
+        now = self.clock()
+        
+        while self._heap and self._heap[0][0] <= now:
+            due, _, task = heapq.heappop(self._heap)
+            
+            if task.cancelled:
+                continue
+            
+            task.last_lateness = now - due
+            self._execute(task)
+            
+            if task.interval is None or task.cancelled:
+                continue
+            
+            now = self.clock()
+            task.advance(now)
+            self._push(task)
+        
+        return self.next_delay()
+    
+    def run(self, stop_event):
+        """Boucle jusqu'à stop_event, en dormant jusqu'à l'échéance suivante"""
+        while not stop_event.is_set():
+            delay = self.run_pending()
+            stop_event.wait(delay if delay is not None else 1.0)
+    
+    def _push(self, task):
+        heapq.heappush(self._heap, (task.due, next(self._counter), task))
+    
+    def _execute(self, task):
+        """Exécute une tâche en isolant ses erreurs"""
+        try:
+            task.callback()
+            task.runs += 1
+            task.consecutive_errors = 0
+        except Exception as e:
+            task.consecutive_errors += 1
+            if self.on_error:
+                self.on_error(task, e)
+            else:
+                logger.error(f"Erreur dans la tâche {task.name}: {e}")
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Sérialisation des publications pour les collecteurs MaxLink
+Horodatage formaté une fois par tick de l'ordonnanceur, encodeur JSON le
+plus rapide disponible (orjson, msgspec, sinon json) et encodage binaire
+compact (MessagePack, CBOR) choisi par le champ format des topics du widget
+"""
+
+import re
+import json
+import time
+import logging
+import contextvars
+from datetime import datetime, timezone
+
+# Encodeurs optionnels : utilisés seulement s'ils sont installés
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+logger = logging.getLogger('serializer')
+
+BINARY_FORMATS = ('msgpack', 'cbor')
+
+# Horodatage du tick en cours : propre à chaque thread et à chaque tâche asyncio
+_tick_timestamp = contextvars.ContextVar('tick_timestamp', default=None)
+
+def utc_timestamp(now=None):
+    """Horodatage ISO 8601 UTC, de la forme datetime.utcnow().isoformat() + "Z" """
+    moment = datetime.fromtimestamp(time.time() if now is None else now, timezone.utc)
+    return moment.replace(tzinfo=None).isoformat() + "Z"
+
+def json_encoder():
+    """(nom, fonction) de l'encodeur JSON le plus rapide disponible"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        return 'orjson', lambda obj: orjson.dumps(obj, option=option)
+    
+    if msgspec is not None:
+        return 'msgspec', msgspec.json.Encoder().encode
+    
+    # Encodeur construit une fois : json.dumps avec options en recrée un à chaque appel
+    return 'json', json.JSONEncoder(separators=(',', ':')).encode
+
+def binary_encoder(fmt):
+    """(nom, fonction) de l'encodeur du format binaire fmt, ou None si aucun n'est installé"""
+    if fmt == 'msgpack':
+        if msgspec is not None:
+            return 'msgspec', msgspec.msgpack.Encoder().encode
+        if msgpack is not None:
+            return 'msgpack', lambda obj: msgpack.packb(obj, use_bin_type=True)
+    
+    elif fmt == 'cbor':
+        if cbor2 is not None:
+            return 'cbor2', cbor2.dumps
+    
+    return None
+
+def topic_pattern(template):
+    """Expression régulière d'un topic documenté (rpi/system/cpu/core{n}, filtres + et #)"""
+    parts = []
+    for token in re.split(r'(\{[^}]*\}|\+|#)', template):
+        if token == '#':
+            parts.append('.*')
+        elif token == '+' or (token.startswith('{') and token.endswith('}')):
+            parts.append('[^/]+')
+        else:
+            parts.append(re.escape(token))
+    
+    return re.compile(''.join(parts) + '$')
+
+class Serializer:
+    """Encodage des payloads d'un collecteur selon le format déclaré pour chaque topic"""
+    
+    def __init__(self, publish_topics=()):
+        """publish_topics : entrées mqtt.topics.publish du JSON du widget (topic, format)"""
+        self.json_backend, self._json = json_encoder()
+        
+        # Topics au format binaire (les autres restent en JSON), résolution mise en cache
+        self.rules = []
+        self._encoders = {}
+        
+        for entry in publish_topics:
+            fmt = entry.get('format', 'json')
+            if fmt not in BINARY_FORMATS:
+                continue
+            
+            encoder = binary_encoder(fmt)
+            if encoder is None:
+                logger.warning(f"Aucun encodeur {fmt} installé pour {entry['topic']}, publication en JSON")
+                continue
+            
+            self.rules.append((topic_pattern(entry['topic']), fmt, encoder[1]))
+    
+    def begin_tick(self, now=None):
+        """Formate l'horodatage partagé par les publications du tick (thread ou tâche courante)"""
+        _tick_timestamp.set(utc_timestamp(now))
+    
+    def end_tick(self):
+        _tick_timestamp.set(None)
+    
+    def timestamp(self):
+        """Horodatage du tick en cours, sinon de l'instant présent"""
+        return _tick_timestamp.get() or utc_timestamp()
+    
+    def format_for(self, topic):
+        """Format de publication du topic : json, msgpack ou cbor"""
+        return self._encoder_for(topic)[0]
+    
+    def encode(self, topic, payload):
+        """Encode le payload (dict) pour le topic"""
+        return self._encoder_for(topic)[1](payload)
+    
+    def _encoder_for(self, topic):
+        try:
+            return self._encoders[topic]
+        except KeyError:
+            pass
+        
+        result = ('json', self._json)
+        for pattern, fmt, encoder in self.rules:
+            if pattern.match(topic):
+                result = (fmt, encoder)
+                break
+        
+        self._encoders[topic] = result
+        return result
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Tampon disque des publications pour les collecteurs MaxLink
+Pendant une coupure du broker, les messages déjà encodés sont ajoutés à des
+segments sur disque (ajout seul, taille totale bornée, les plus anciens
+segments sont évincés) puis rejoués à débit limité après la reconnexion
+"""
+
+import os
+import glob
+import struct
+import logging
+import threading
+
+logger = logging.getLogger('spool')
+
+# Répertoire par défaut (un sous-répertoire par collecteur)
+SPOOL_DIR = "/var/lib/maxlink/spool"
+
+# Enregistrement : longueur du topic, longueur du payload, topic, payload
+HEADER = struct.Struct('<HI')
+
+class Spool:
+    """File de messages sur disque en segments d'ajout seul"""
+    
+    def __init__(self, directory, max_bytes=8 * 1024 * 1024, segment_bytes=512 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.lock = threading.Lock()
+        
+        os.makedirs(directory, exist_ok=True)
+        
+        # Segments existants (reprise après redémarrage du collecteur) : numéro -> taille
+        self.segments = {}
+        for path in glob.glob(os.path.join(directory, '*.seg')):
+            try:
+                self.segments[int(os.path.basename(path)[:-4])] = os.path.getsize(path)
+            except (ValueError, OSError):
+                continue
+        
+        # Position de relecture : (segment, offset) persistée dans le fichier cursor
+        self.cursor_path = os.path.join(directory, 'cursor')
+        self.read_segment, self.read_offset = self._load_cursor()
+        
+        # Segment en écriture : toujours un nouveau (la fin du précédent peut être tronquée)
+        self._writer = None
+        self._write_segment = None
+        
+        # Compteurs
+        self.appended = 0
+        self.replayed = 0
+        self.evicted_segments = 0
+        
+        if self.segments:
+            logger.info(f"Tampon disque repris: {len(self.segments)} segment(s), {self.pending} octets à rejouer")
+    
+    @property
+    def size(self):
+        """Taille totale des segments sur disque"""
+        return sum(self.segments.values())
+    
+    @property
+    def pending(self):
+        """Octets restant à rejouer"""
+        return self.size - (self.read_offset if self.read_segment in self.segments else 0)
+    
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f"{number:010d}.seg")
+    
+    def _load_cursor(self):
+        try:
+            with open(self.cursor_path, 'r') as f:
+                segment, offset = f.read().split()
+                return int(segment), int(offset)
+        except (OSError, ValueError):
+            return (min(self.segments) if self.segments else 0), 0
+    
+    def _save_cursor(self):
+        tmp_path = self.cursor_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(f"{self.read_segment} {self.read_offset}")
+        os.replace(tmp_path, self.cursor_path)
+    
+    def append(self, topic, payload):
+        """Ajoute un message encodé (str ou bytes) à la fin du tampon"""
+        topic = topic.encode('utf-8')
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        record = HEADER.pack(len(topic), len(payload)) + topic + payload
+        
+        with self.lock:
+            if self._writer is None or self.segments[self._write_segment] + len(record) > self.segment_bytes:
+                self._roll()
+            
+            self._writer.write(record)
+            self._writer.flush()
+            self.segments[self._write_segment] += len(record)
+            self.appended += 1
+            
+            # Taille bornée : les segments les plus anciens sont sacrifiés
+            while self.size > self.max_bytes and len(self.segments) > 1:
+                self._evict_oldest()
+    
+    def _roll(self):
+        """Ferme le segment courant et en ouvre un nouveau"""
+        if self._writer is not None:
+            self._writer.close()
+        
+        number = max(self.segments) + 1 if self.segments else self.read_segment
+        self._writer = open(self._segment_path(number), 'ab')
+        self._write_segment = number
+        self.segments[number] = 0
+        
+        if len(self.segments) == 1:
+            self.read_segment, self.read_offset = number, 0
+    
+    def _evict_oldest(self):
+        oldest = min(self.segments)
+        self._remove_segment(oldest)
+        self.evicted_segments += 1
+        
+        # Un avertissement par coupure, pas un par segment
+        log = logger.warning if self.evicted_segments == 1 else logger.debug
+        log(f"Tampon disque plein ({self.max_bytes} octets), segment {oldest} évincé")
+    
+    def _remove_segment(self, number):
+        del self.segments[number]
+        try:
+            os.remove(self._segment_path(number))
+        except OSError:
+            pass
+        
+        if number == self._write_segment:
+            if self._writer is not None:
+                self._writer.close()
+            self._writer = None
+            self._write_segment = None
+        
+        if number == self.read_segment:
+            self.read_segment = min(self.segments) if self.segments else number + 1
+            self.read_offset = 0
+    
+    def replay(self, publish, limit):
+        """Rejoue au plus limit messages, du plus ancien au plus récent
+        
+        publish(topic, payload) retourne False pour interrompre la relecture
+        (le message sera repris au prochain appel). Retourne le nombre de
+        messages rejoués.
+        """
+        count = 0
+        
+        with self.lock:
+            while count < limit and self.segments:
+                if self.read_segment not in self.segments:
+                    self.read_segment, self.read_offset = min(self.segments), 0
+                
+                number = self.read_segment
+                sent, offset, complete = self._replay_segment(number, publish, limit - count)
+                count += sent
+                self.read_offset = offset
+                
+                if not complete:
+                    break
+                
+                # Segment entièrement rejoué (ou fin tronquée) : supprimé
+                self._remove_segment(number)
+            
+            if count:
+                self.replayed += count
+                self._save_cursor()
+        
+        return count
+    
+    def _replay_segment(self, number, publish, limit):
+        """Rejoue un segment depuis read_offset : (messages, nouvel offset, segment terminé)"""
+        offset = self.read_offset
+        end = self.segments[number]
+        sent = 0
+        
+        with open(self._segment_path(number), 'rb') as f:
+            f.seek(offset)
+            
+            while sent < limit and offset < end:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    break
+                topic_length, payload_length = HEADER.unpack(header)
+                body = f.read(topic_length + payload_length)
+                if len(body) < topic_length + payload_length:
+                    # Enregistrement tronqué (coupure pendant l'écriture)
+                    break
+                
+                try:
+                    topic = body[:topic_length].decode('utf-8')
+                except UnicodeDecodeError:
+                    break
+                
+                if not publish(topic, body[topic_length:]):
+                    return sent, offset, False
+                
+                sent += 1
+                offset += HEADER.size + len(body)
+        
+        if sent >= limit and offset < end:
+            return sent, offset, False
+        
+        return sent, offset, True
+    
+    def close(self):
+        """Ferme le segment en écriture"""
+        with self.lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            # Segment vide : inutile de le garder
+            if self._write_segment is not None and self.segments.get(self._write_segment) == 0:
+                self._remove_segment(self._write_segment)
+            self._write_segment = None
+    
+    def stats(self):
+        """Compteurs du tampon"""
+        return {
+            "segments": len(self.segments),
+            "bytes": self.size,
+            "pending": self.pending,
+            "appended": self.appended,
+            "replayed": self.replayed,
+            "evicted_segments": self.evicted_segments
+        }
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Arbre de filtres de topics MQTT pour les collecteurs MaxLink
+Les filtres sont découpés par niveau une seule fois ; le coût d'une
+recherche dépend de la profondeur du topic et non du nombre de filtres
+"""
+
+class _Node:
+    __slots__ = ('children', 'terminal')
+    
+    def __init__(self):
+        self.children = {}
+        self.terminal = False
+
+class TopicFilterTrie:
+    """Ensemble de filtres MQTT (+, #) avec cache des résultats récents"""
+    
+    def __init__(self, filters=(), cache_size=1024):
+        self.root = _Node()
+        self.filters = []
+        self.cache_size = cache_size
+        self._cache = {}
+        self.cache_hits = 0
+        
+        for topic_filter in filters:
+            self.add(topic_filter)
+    
+    def __len__(self):
+        return len(self.filters)
+    
+    def __bool__(self):
+        return bool(self.filters)
+    
+    @staticmethod
+    def validate(topic_filter):
+        """Vérifie un filtre : # seul et en dernier niveau, + seul dans son niveau"""
+        if not topic_filter:
+            raise ValueError("Filtre vide")
+        
+        levels = topic_filter.split('/')
+        for i, level in enumerate(levels):
+            if '#' in level and (level != '#' or i != len(levels) - 1):
+                raise ValueError(f"'#' doit occuper seul le dernier niveau: {topic_filter}")
+            if '+' in level and level != '+':
+                raise ValueError(f"'+' doit occuper seul un niveau: {topic_filter}")
+        
+        return levels
+    
+    def add(self, topic_filter):
+        """Ajoute un filtre (ValueError si le filtre est invalide)"""
+        node = self.root
+        for level in self.validate(topic_filter):
+            child = node.children.get(level)
+            if child is None:
+                child = node.children[level] = _Node()
+            node = child
+        
+        node.terminal = True
+        self.filters.append(topic_filter)
+        self._cache.clear()
+    
+    def matches(self, topic):
+        """Vérifie si au moins un filtre correspond au topic"""
+        try:
+            result = self._cache[topic]
+            self.cache_hits += 1
+            return result
+        except KeyError:
+            pass
+        
+        result = self._match(topic.split('/'))
+        
+        # Cache borné : on évince l'entrée la plus ancienne
+        if len(self._cache) >= self.cache_size:
+            del self._cache[next(iter(self._cache))]
+        self._cache[topic] = result
+        return result
+    
+    def _match(self, levels):
+        depth_max = len(levels)
+        stack = [(self.root, 0)]
+        
+        while stack:
+            node, depth = stack.pop()
+            children = node.children
+            
+            # Les topics $SYS... ne sont pas couverts par un joker de premier niveau
+            wildcards = depth > 0 or not levels[0].startswith('$')
+            
+            # "a/#" couvre aussi "a" (le niveau parent)
+            if wildcards:
+                multi = children.get('#')
+                if multi is not None and multi.terminal:
+                    return True
+            
+            if depth == depth_max:
+                if node.terminal:
+                    return True
+                continue
+            
+            child = children.get(levels[depth])
+            if child is not None:
+                stack.append((child, depth + 1))
+            
+            if wildcards:
+                single = children.get('+')
+                if single is not None:
+                    stack.append((single, depth + 1))
+        
+        return False
@@ -18,6 +18,8 @@ fi
 WIDGETS_DIR="$BASE_DIR/scripts/widgets"
 WIDGETS_CONFIG_DIR="/etc/maxlink/widgets"
 WIDGETS_TRACKING_FILE="/etc/maxlink/widgets_installed.json"
+WIDGETS_HOST_SERVICE="maxlink-widget-host"
+WIDGETS_HOST_ENABLED="${WIDGETS_HOST_ENABLED:-true}"
 
 # Créer les répertoires
 mkdir -p "$WIDGETS_CONFIG_DIR" "$(dirname "$WIDGETS_TRACKING_FILE")"
@@ -108,6 +110,46 @@ with open('$WIDGETS_TRACKING_FILE', 'w') as f:
     log_success "Widget $widget_name enregistré"
 }
 
+# Retirer un widget du suivi des installations
+widget_unregister() {
+    local widget_name=$1
+    
+    [ -f "$WIDGETS_TRACKING_FILE" ] || return 0
+    
+    python3 -c "
+import json
+
+try:
+    with open('$WIDGETS_TRACKING_FILE', 'r') as f:
+        data = json.load(f)
+except:
+    data = {}
+
+data.pop('$widget_name', None)
+
+with open('$WIDGETS_TRACKING_FILE', 'w') as f:
+    json.dump(data, f, indent=2)
+"
+    
+    log_info "Widget $widget_name retiré du suivi"
+}
+
+# Widgets installés dans l'hôte des collecteurs (liste séparée par des virgules)
+widget_host_widgets() {
+    [ -f "$WIDGETS_TRACKING_FILE" ] || return 0
+    
+    python3 -c "
+import json
+try:
+    with open('$WIDGETS_TRACKING_FILE', 'r') as f:
+        widgets = json.load(f)
+    print(','.join(sorted(name for name, info in widgets.items()
+                          if info.get('service_name') == '$WIDGETS_HOST_SERVICE')))
+except:
+    print('')
+"
+}
+
 # ===============================================================================
 # INSTALLATION PYTHON
 # ===============================================================================
@@ -216,6 +258,94 @@ EOF
     fi
 }
 
+# Créer le service hôte qui exécute tous les collecteurs dans un seul processus
+widget_create_host_service() {
+    local host_script="$WIDGETS_DIR/_core/collector_host.py"
+    local service_name="$WIDGETS_HOST_SERVICE"
+    
+    # Seuls les widgets installés sont chargés (sans liste, l'hôte prendrait tout le dépôt)
+    local host_widgets=$(widget_host_widgets)
+    
+    if [ -z "$host_widgets" ]; then
+        systemctl disable --now "$service_name" >/dev/null 2>&1 || true
+        rm -f "/etc/systemd/system/${service_name}.service"
+        systemctl daemon-reload
+        log_info "Aucun widget dans l'hôte, service $service_name supprimé"
+        return 0
+    fi
+    
+    log_info "Création du service $service_name ($host_widgets)"
+    
+    cat > "/etc/systemd/system/${service_name}.service" << EOF
+[Unit]
+Description=MaxLink Widgets Collector Host
+After=network-online.target mosquitto.service
+Wants=network-online.target
+Requires=mosquitto.service
+
+ConditionPathExists=$host_script
+
+[Service]
+Type=simple
+ExecStart=/usr/bin/python3 $host_script
+Restart=always
+RestartSec=30
+StartLimitInterval=600
+StartLimitBurst=5
+
+User=root
+StandardOutput=journal
+StandardError=journal
+
+# Environnement
+Environment="PYTHONUNBUFFERED=1"
+Environment="MAXLINK_WIDGETS=$host_widgets"
+Environment="MQTT_RETRY_ENABLED=true"
+Environment="MQTT_RETRY_DELAY=10"
+Environment="MQTT_MAX_RETRIES=0"
+Environment="COLLECTOR_RESTART_DELAY=30"
+# Runtime des collecteurs : threads ou asyncio (une seule boucle, iw sans blocage)
+Environment="COLLECTOR_RUNTIME=threads"
+
+# Sécurité
+PrivateTmp=true
+NoNewPrivileges=true
+
+TimeoutStartSec=90
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
+    systemctl daemon-reload
+    
+    # Les services individuels sont remplacés par l'hôte
+    if [ -f "$WIDGETS_TRACKING_FILE" ]; then
+        local services=$(python3 -c "
+import json
+with open('$WIDGETS_TRACKING_FILE', 'r') as f:
+    widgets = json.load(f)
+for info in widgets.values():
+    service = info.get('service_name', 'none')
+    if service not in ('none', '$service_name'):
+        print(service)
+")
+        for service in $services; do
+            systemctl disable --now "$service" >/dev/null 2>&1 || true
+            log_info "Service individuel désactivé: $service"
+        done
+    fi
+    
+    # Redémarrage : l'hôte ne découvre les widgets qu'au lancement
+    if systemctl enable "$service_name" >/dev/null 2>&1 && systemctl restart "$service_name"; then
+        log_success "Service hôte démarré: $service_name"
+        return 0
+    else
+        log_error "Impossible de démarrer le service hôte"
+        return 1
+    fi
+}
+
 # ===============================================================================
 # VALIDATION
 # ===============================================================================
@@ -299,10 +429,33 @@ widget_standard_install() {
     if [ "$collector_enabled" = "true" ] || [ "$collector_enabled" = "True" ]; then
         chmod +x "$collector_script"
         
+        local service_name=$(widget_get_value "$config_file" "collector.service_name")
+        [ -z "$service_name" ] && service_name="maxlink-widget-$widget_name"
+        
+        if [ "$WIDGETS_HOST_ENABLED" = "true" ]; then
+            # Collecteur exécuté par l'hôte : pas de service individuel (publication en double)
+            systemctl disable --now "$service_name" >/dev/null 2>&1 || true
+            rm -f "/etc/systemd/system/${service_name}.service"
+            
+            # Enregistré avant la génération du service : MAXLINK_WIDGETS lit le suivi
+            local version=$(widget_get_value "$config_file" "widget.version")
+            widget_register "$widget_name" "$WIDGETS_HOST_SERVICE" "$version"
+            
+            if widget_create_host_service; then
+                echo "  ↦ Widget $widget_name installé dans l'hôte $WIDGETS_HOST_SERVICE ✓"
+                return 0
+            else
+                widget_unregister "$widget_name"
+                echo "  ↦ Erreur lors de l'installation ✗"
+                return 1
+            fi
+        fi
+        
+        # Services individuels : l'hôte publierait les mêmes métriques
+        systemctl disable --now "$WIDGETS_HOST_SERVICE" >/dev/null 2>&1 || true
+        
         if widget_create_service "$widget_name" "$config_file" "$collector_script"; then
             local version=$(widget_get_value "$config_file" "widget.version")
-            local service_name=$(widget_get_value "$config_file" "collector.service_name")
-            [ -z "$service_name" ] && service_name="maxlink-widget-$widget_name"
             
             widget_register "$widget_name" "$service_name" "$version"
             
@@ -324,6 +477,31 @@ widget_standard_install() {
     fi
 }
 
+# Désinstaller un widget (service individuel supprimé, ou retiré de l'hôte)
+widget_uninstall() {
+    local widget_name=$1
+    
+    if [ "$(widget_is_installed "$widget_name")" != "yes" ]; then
+        echo "  ↦ Widget $widget_name non installé"
+        return 0
+    fi
+    
+    local service_name=$(widget_get_value "$WIDGETS_TRACKING_FILE" "$widget_name.service_name")
+    widget_unregister "$widget_name"
+    
+    if [ "$service_name" = "$WIDGETS_HOST_SERVICE" ]; then
+        # Service hôte régénéré sans le widget (MAXLINK_WIDGETS)
+        widget_create_host_service || return 1
+    elif [ -n "$service_name" ] && [ "$service_name" != "none" ]; then
+        systemctl disable --now "$service_name" >/dev/null 2>&1 || true
+        rm -f "/etc/systemd/system/${service_name}.service"
+        systemctl daemon-reload
+    fi
+    
+    echo "  ↦ Widget $widget_name désinstallé ✓"
+    return 0
+}
+
 # ===============================================================================
 # FONCTIONS UTILITAIRES
 # ===============================================================================
@@ -388,9 +566,13 @@ export -f widget_load_config
 export -f widget_get_value
 export -f widget_is_installed
 export -f widget_register
+export -f widget_unregister
+export -f widget_host_widgets
 export -f widget_install_python_deps
 export -f widget_create_service
+export -f widget_create_host_service
 export -f widget_validate
 export -f widget_standard_install
+export -f widget_uninstall
 export -f widget_check_all_status
 export -f widget_restart_all
\ No newline at end of file
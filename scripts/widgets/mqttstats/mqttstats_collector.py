@@ -7,12 +7,11 @@ Version utilisant les topics système $SYS de Mosquitto
 import os
 import sys
 import time
-import json
 import re
+import socket
 import logging
-from datetime import datetime, timedelta
-from collections import defaultdict
-import fnmatch  # Pour le pattern matching MQTT
+import threading
+from collections import deque
 
 # Configuration du logging
 logging.basicConfig(
@@ -24,33 +23,28 @@ logging.basicConfig(
 )
 logger = logging.getLogger('mqttstats')
 
-try:
-    import paho.mqtt.client as mqtt
-except ImportError:
-    logger.error("Module paho-mqtt non installé")
-    sys.exit(1)
+# Core commun des widgets (BaseCollector)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '_core'))
+from collector_base import BaseCollector
+from topic_stats import TopicTracker, TopTalkers, SIZE_BUCKETS
+from sys_series import SysSeries, SYS_PREFIX
+from topic_trie import TopicFilterTrie
+from message_queue import MessageQueue
 
-class MQTTStatsCollector:
+class MQTTStatsCollector(BaseCollector):
+    # Pause au démarrage par défaut (STARTUP_DELAY)
+    default_startup_delay = 10
+    
+    # Traitement des messages mesuré par l'instrumentation
+    timed_methods = ('_on_message',)
+    
     def __init__(self, config_file):
         """Initialise le collecteur"""
-        self.config = self.load_config(config_file)
-        self.mqtt_client = None
-        self.stats_client = None  # Client séparé pour écouter les topics système
-        self.connected = False
-        self.stats_connected = False
+        super().__init__(config_file, 'mqttstats')
         
         # Configuration
-        self.mqtt_config = self.config['mqtt']['broker']
         self.update_interval = self.config['collector']['update_intervals']['default']
         
-        # Configuration retry depuis l'environnement
-        self.retry_enabled = os.environ.get('MQTT_RETRY_ENABLED', 'true').lower() == 'true'
-        self.retry_delay = int(os.environ.get('MQTT_RETRY_DELAY', '10'))
-        self.max_retries = int(os.environ.get('MQTT_MAX_RETRIES', '0'))  # 0 = infini
-        
-        # Compteur de tentatives
-        self.connection_attempts = 0
-        
         # Charger les topics à ignorer depuis l'environnement
         ignored_topics_env = os.environ.get('MQTT_IGNORED_TOPICS_STRING', '')
         self.ignored_topics = ignored_topics_env.split('|') if ignored_topics_env else []
@@ -58,6 +52,14 @@ class MQTTStatsCollector:
         if self.ignored_topics:
             logger.info(f"Topics ignorés pour les stats: {self.ignored_topics}")
         
+        # Filtres compilés une fois en arbre (sémantique MQTT + et #)
+        self.ignored_filter = TopicFilterTrie()
+        for pattern in self.ignored_topics:
+            try:
+                self.ignored_filter.add(pattern.strip())
+            except ValueError as e:
+                logger.warning(f"Filtre ignoré invalide: {e}")
+        
         # Structure de données MQTT - état actuel
         self.mqttData = {
             'received': 0,
@@ -74,193 +76,217 @@ class MQTTStatsCollector:
             'broker_load': {}
         }
         
-        # Topics actifs (hors système)
-        self.active_topics = set()
-        self.topic_last_seen = {}
+        # Topics actifs (hors système) : LRU borné avec compteurs par topic
+        tracking = self.config['collector'].get('topic_tracking', {})
+        self.topics_published = tracking.get('publish_top', 15)
+        self.active_topics = TopicTracker(capacity=tracking.get('capacity', 15))
+        
+        # Gros émetteurs : débits et tailles par topic, nombre de topics borné
+        talkers = self.config['collector'].get('top_talkers', {})
+        self.top_talkers_published = talkers.get('publish_top', 10)
+        self.top_talkers = TopTalkers(capacity=talkers.get('capacity', 64))
         
         # Cache des valeurs système
         self.sys_values = {}
         
-        # Statistiques internes
-        self.stats = {
-            'messages_sent': 0,
-            'errors': 0,
-            'start_time': time.time(),
-            'connection_failures': 0
-        }
+        # Séries temporelles des métriques $SYS numériques (débits, moyennes 1/5/15 min)
+        series = self.config['collector'].get('sys_series', {})
+        self.sys_series = SysSeries(capacity=series.get('capacity', 120))
+        self.sys_history = series.get('publish_history', 30)
+        self.sys_summary = {}
+        self.sys_dirty = False
+        self.sys_published = None
         
-        logger.info(f"Collecteur MQTT Stats initialisé - Version {self.config['widget']['version']}")
-        logger.info(f"Retry: {self.retry_enabled}, Delay: {self.retry_delay}s, Max: {self.max_retries}")
-    
-    def load_config(self, config_file):
-        """Charge la configuration"""
-        try:
-            with open(config_file, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Erreur chargement config: {e}")
-            sys.exit(1)
+        # File bornée entre le thread réseau et le thread de traitement
+        queue_config = self.config['collector'].get('ingest_queue', {})
+        self.ingest = MessageQueue(
+            maxlen=queue_config.get('maxlen', 10000),
+            batch_size=queue_config.get('batch_size', 500)
+        )
+        self.instrumentation.gauge('ingest_queue_depth', lambda: len(self.ingest))
+        self.instrumentation.gauge('ingest_dropped', lambda: self.ingest.dropped, 'counter')
+        self._update_snapshot()
+        
+        # Découverte des topics : "full" (#), "filters" (liste du JSON) ou
+        # "sampled" (filtres posés pendant des fenêtres de discovery_window secondes
+        # toutes les discovery_period secondes, sur demande : activité sous-estimée)
+        discovery = self.config['collector'].get('discovery', {})
+        self.discovery_mode = discovery.get('mode', 'full')
+        self.discovery_filters = ['#'] if self.discovery_mode == 'full' else discovery.get('filters', ['#'])
+        self.discovery_window = discovery.get('window', 10)
+        self.discovery_period = discovery.get('period', 60)
+        self.discovery_tick = 0
+        self.discovery_open = False
+        self.discovery_opened_at = None
+        self.discovery_listened = 0.0
+        self.discovery_started = None
+        
+        # Sonde de latence : pings numérotés sur un topic privé, échos appariés à la réception
+        probe = self.config['collector'].get('latency_probe', {})
+        self.ping_topic = f"rpi/network/mqtt/ping/{socket.gethostname()}-{os.getpid()}"
+        self.ping_timeout = probe.get('timeout', 5)
+        self.ping_seq = 0
+        self.pending_pings = {}
+        self.pings_lost = 0
+        
+        # pending_pings partagé avec le thread de traitement (_on_ping_echo)
+        self.pings_lock = threading.Lock()
+        self.rtt_samples = deque(maxlen=probe.get('samples', 100))
     
     def should_ignore_topic(self, topic):
         """Vérifie si un topic doit être ignoré dans les statistiques"""
-        if not self.ignored_topics:
+        if not self.ignored_filter:
             return False
-            
-        for pattern in self.ignored_topics:
-            # Convertir le pattern MQTT en pattern fnmatch
-            # + devient * et # devient **
-            fnmatch_pattern = pattern.replace('+', '*').replace('#', '**')
-            
-            # Gérer le cas spécial de ** à la fin
-            if fnmatch_pattern.endswith('/**'):
-                fnmatch_pattern = fnmatch_pattern[:-2] + '*'
-            
-            if fnmatch.fnmatch(topic, fnmatch_pattern):
-                return True
-                
-        return False
+        
+        return self.ignored_filter.matches(topic)
     
-    def connect_mqtt(self):
-        """Connexion au broker MQTT avec retry robuste"""
-        while True:
-            try:
-                self.connection_attempts += 1
-                
-                # Vérifier si on a atteint la limite
-                if self.max_retries > 0 and self.connection_attempts > self.max_retries:
-                    logger.error(f"Limite de tentatives atteinte ({self.max_retries})")
-                    return False
-                
-                logger.info(f"Tentative de connexion MQTT #{self.connection_attempts} à {self.mqtt_config['host']}:{self.mqtt_config['port']}")
-                
-                # 1. Client principal pour publier les stats
-                self.mqtt_client = mqtt.Client(client_id="mqttstats-publisher")
-                self.mqtt_client.on_connect = lambda c,u,f,rc: self._on_connect(c, u, f, rc, "publisher")
-                self.mqtt_client.on_disconnect = lambda c,u,rc: self._on_disconnect(c, u, rc, "publisher")
-                self.mqtt_client.username_pw_set(
-                    self.mqtt_config['username'],
-                    self.mqtt_config['password']
-                )
-                self.mqtt_client.connect(
-                    self.mqtt_config['host'], 
-                    self.mqtt_config['port'], 
-                    60
-                )
-                self.mqtt_client.loop_start()
-                
-                # 2. Client pour écouter les topics système et utilisateur
-                self.stats_client = mqtt.Client(client_id="mqttstats-listener")
-                self.stats_client.on_connect = lambda c,u,f,rc: self._on_connect(c, u, f, rc, "listener")
-                self.stats_client.on_disconnect = lambda c,u,rc: self._on_disconnect(c, u, rc, "listener")
-                self.stats_client.on_message = self._on_message
-                self.stats_client.username_pw_set(
-                    self.mqtt_config['username'],
-                    self.mqtt_config['password']
-                )
-                self.stats_client.connect(
-                    self.mqtt_config['host'], 
-                    self.mqtt_config['port'], 
-                    60
-                )
-                self.stats_client.loop_start()
-                
-                # Attendre les connexions
-                timeout = 30
-                while (not self.connected or not self.stats_connected) and timeout > 0:
-                    time.sleep(0.5)
-                    timeout -= 0.5
-                
-                if self.connected and self.stats_connected:
-                    logger.info("Connexions MQTT établies avec succès")
-                    self.stats['connection_failures'] = 0
-                    return True
+    def get_subscriptions(self):
+        """Topics système, écho des pings et filtres de découverte permanents"""
+        subscriptions = ["$SYS/#", self.ping_topic]
+        
+        # En mode échantillonné, les filtres ne sont posés que pendant les fenêtres
+        if self.discovery_mode != 'sampled':
+            subscriptions += self.discovery_filters
+        
+        return subscriptions
+    
+    def get_tasks(self):
+        """Publication périodique, et fenêtres d'échantillonnage en mode sampled"""
+        tasks = super().get_tasks()
+        if self.discovery_mode == 'sampled':
+            tasks.append(('discovery', self.discovery_window, self.update_discovery_window))
+        return tasks
+    
+    def update_discovery_window(self):
+        """Ouvre une fenêtre d'écoute toutes les discovery_period secondes, la ferme sinon"""
+        slots = max(1, round(self.discovery_period / self.discovery_window))
+        opening = self.discovery_tick % slots == 0
+        self.discovery_tick += 1
+        
+        now = time.monotonic()
+        if self.discovery_started is None:
+            self.discovery_started = now
+        
+        if self.discovery_opened_at is not None:
+            self.discovery_listened += now - self.discovery_opened_at
+            self.discovery_opened_at = None
+        
+        if opening:
+            self.discovery_opened_at = now
+        
+        if opening != self.discovery_open:
+            self.discovery_open = opening
+            for topic_filter in self.discovery_filters:
+                if opening:
+                    self.mqtt_session.subscribe(topic_filter)
                 else:
-                    raise Exception("Timeout de connexion")
-                
-            except Exception as e:
-                self.stats['connection_failures'] += 1
-                logger.error(f"Erreur connexion MQTT: {e}")
-                
-                # Nettoyer les clients
-                for client in [self.mqtt_client, self.stats_client]:
-                    if client:
-                        try:
-                            client.loop_stop()
-                            client.disconnect()
-                        except:
-                            pass
-                
-                if not self.retry_enabled:
-                    return False
-                
-                # Attendre avant de réessayer
-                logger.info(f"Nouvelle tentative dans {self.retry_delay} secondes...")
-                time.sleep(self.retry_delay)
+                    self.mqtt_session.unsubscribe(topic_filter)
     
-    def _on_connect(self, client, userdata, flags, rc, client_type):
-        """Callback de connexion"""
-        if rc == 0:
-            logger.info(f"Client {client_type} connecté au broker MQTT")
-            
-            if client_type == "publisher":
-                self.connected = True
-                self.mqttData['connected'] = True
-                self.mqttData['status'] = 'ok'
-            else:
-                self.stats_connected = True
-                # S'abonner aux topics système
-                client.subscribe("$SYS/#")
-                # S'abonner à tous les topics utilisateur pour les compter
-                client.subscribe("#")
-                logger.info("Abonné aux topics système ($SYS/#) et utilisateur (#)")
-        else:
-            logger.error(f"Échec connexion MQTT {client_type}, code: {rc}")
+    def sampling_ratio(self):
+        """Part du temps passé abonné aux topics applicatifs (1.0 hors échantillonnage)"""
+        if self.discovery_mode != 'sampled':
+            return 1.0
+        
+        if self.discovery_started is None:
+            return 0.0
+        
+        now = time.monotonic()
+        listened = self.discovery_listened
+        if self.discovery_opened_at is not None:
+            listened += now - self.discovery_opened_at
+        
+        elapsed = now - self.discovery_started
+        return round(listened / elapsed, 3) if elapsed > 0 else 0.0
+    
+    def get_initial_delay(self):
+        """Laisse le temps de recevoir les premières valeurs système"""
+        return 5
+    
+    def get_update_interval(self):
+        """Intervalle de publication configuré"""
+        return self.update_interval
+    
+    def initialize(self):
+        """Démarre le thread de traitement des messages"""
+        self.ingest.start(self._process_batch, name="mqttstats-worker")
+    
+    def cleanup(self):
+        """Arrête le thread de traitement"""
+        self.ingest.stop()
     
-    def _on_disconnect(self, client, userdata, rc, client_type):
-        """Callback de déconnexion"""
-        logger.warning(f"Client {client_type} déconnecté du broker MQTT (code: {rc})")
-        
-        if client_type == "publisher":
-            self.connected = False
-            self.mqttData['connected'] = False
-            self.mqttData['status'] = 'error'
-        else:
-            self.stats_connected = False
-        
-        self.stats['connection_failures'] += 1
+    def on_mqtt_connected(self):
+        """Met à jour l'état exposé au dashboard"""
+        self.mqttData['connected'] = True
+        self.mqttData['status'] = 'ok'
+        logger.info(f"Abonné aux topics système ($SYS/#), découverte {self.discovery_mode}: "
+                    f"{', '.join(self.discovery_filters)}")
+    
+    def on_mqtt_disconnected(self):
+        """Met à jour l'état exposé au dashboard"""
+        self.mqttData['connected'] = False
+        self.mqttData['status'] = 'error'
+    
+    def on_mqtt_message(self, client, userdata, msg):
+        """Messages reçus (thread réseau) : simple mise en file, sans décodage"""
+        self.ingest.put((msg.topic, msg.payload, time.perf_counter()))
+    
+    def _process_batch(self, batch):
+        """Traite un lot de messages (thread de travail) puis publie un nouvel instantané"""
+        for topic, payload, received_at in batch:
+            self._on_message(topic, payload, received_at)
+        
+        self._update_snapshot()
+    
+    def _update_snapshot(self):
+        """Copie immuable de l'état, remplacée en une seule affectation (lecture sans verrou)"""
+        data = self.mqttData
+        self.snapshot = {
+            'received': data['received'],
+            'sent': data['sent'],
+            'clients_connected': data['clients_connected'],
+            'uptime_seconds': data['uptime_seconds'],
+            'uptime': data['uptime'],
+            'latency': data['latency'],
+            'broker_version': data['broker_version'],
+            'broker_load': dict(data['broker_load']),
+            'received_rate': self.sys_series.rate("messages/received"),
+            'sent_rate': self.sys_series.rate("messages/sent")
+        }
+        
+        # Résumé des séries recalculé seulement si des valeurs $SYS sont arrivées
+        if self.sys_dirty:
+            self.sys_dirty = False
+            self.sys_summary = self.sys_series.summary(self.sys_history)
     
-    def _on_message(self, client, userdata, msg):
-        """Callback de réception de message"""
+    def _on_message(self, topic, raw_payload, received_at):
+        """Traitement d'un message reçu (payload en octets, décodé seulement pour $SYS)"""
         try:
-            topic = msg.topic
-            payload = msg.payload.decode('utf-8')
-            
-            # Traiter les topics système
+            # Topics système : seuls payloads lus, décodés à la demande
             if topic.startswith("$SYS/"):
-                self._process_sys_topic(topic, payload)
-            else:
-                # Topics utilisateur - vérifier s'ils doivent être ignorés
-                if not self.should_ignore_topic(topic):
-                    # Ajouter à la liste des topics actifs seulement si non ignoré
-                    if not topic.startswith("rpi/network/mqtt/"):  # Éviter nos propres topics
-                        self.active_topics.add(topic)
-                        self.topic_last_seen[topic] = time.time()
-                        
-                        # Garder seulement les 15 derniers topics
-                        if len(self.active_topics) > 15:
-                            # Supprimer le plus ancien
-                            oldest_topic = min(self.topic_last_seen, key=self.topic_last_seen.get)
-                            self.active_topics.discard(oldest_topic)
-                            del self.topic_last_seen[oldest_topic]
+                self._process_sys_topic(topic, raw_payload.decode('utf-8', errors='replace'), received_at)
+                return
+            
+            # Nos propres topics (stats publiées, écho des pings)
+            if topic.startswith("rpi/network/mqtt/"):
+                if topic == self.ping_topic:
+                    self._on_ping_echo(raw_payload, received_at)
+                return
+            
+            # Topics utilisateur : topic et taille seulement, le payload n'est jamais décodé
+            if not self.should_ignore_topic(topic):
+                # O(1) : le plus ancien est évincé au-delà de la capacité
+                self.active_topics.touch(topic)
+                self.top_talkers.add(topic, len(raw_payload))
             
         except Exception as e:
             logger.error(f"Erreur traitement message: {e}")
     
-    def _process_sys_topic(self, topic, payload):
+    def _process_sys_topic(self, topic, payload, received_at=None):
         """Traite les topics système"""
         try:
             # Stocker la valeur
             self.sys_values[topic] = payload
+            self.sys_dirty = True
             
             # Traiter selon le topic
             if topic == "$SYS/broker/clients/connected":
@@ -276,20 +302,41 @@ class MQTTStatsCollector:
                 # Format: "X seconds"
                 match = re.match(r'(\d+)\s*seconds?', payload)
                 if match:
-                    self.mqttData['uptime_seconds'] = int(match.group(1))
+                    uptime = int(match.group(1))
+                    if uptime < self.mqttData['uptime_seconds']:
+                        # Le broker a redémarré : ses compteurs sont repartis de zéro
+                        logger.info("Redémarrage du broker détecté (uptime en recul)")
+                        # Instant du redémarrage (uptime à la seconde près)
+                        now = received_at if received_at is not None else time.perf_counter()
+                        self.sys_series.restart(now - uptime - 1)
+                    self.mqttData['uptime_seconds'] = uptime
                     self._calculate_uptime()
                     
             elif topic == "$SYS/broker/version":
                 self.mqttData['broker_version'] = payload
                 
             elif topic.startswith("$SYS/broker/load/"):
-                # Charge du broker (messages/seconde)
-                load_type = topic.split('/')[-1]
+                # Charge du broker, déjà moyennée par Mosquitto (clé : messages/received/1min...)
+                load_type = topic[len("$SYS/broker/load/"):]
                 try:
                     self.mqttData['broker_load'][load_type] = float(payload)
-                except:
+                except ValueError:
                     pass
-                    
+                return
+            
+            # Toute autre métrique numérique alimente sa série temporelle
+            if topic.startswith(SYS_PREFIX):
+                try:
+                    value = int(payload)
+                except ValueError:
+                    try:
+                        value = float(payload)
+                    except ValueError:
+                        return
+                
+                now = received_at if received_at is not None else time.perf_counter()
+                self.sys_series.add(topic[len(SYS_PREFIX):], now, value)
+                
         except Exception as e:
             logger.debug(f"Erreur traitement topic système {topic}: {e}")
     
@@ -310,62 +357,75 @@ class MQTTStatsCollector:
         }
     
     def calculate_latency(self):
-        """Calcule la latence en faisant un ping MQTT"""
-        if not self.connected:
-            return
+        """Envoie un ping numéroté sans attendre : l'écho est traité par _on_message"""
+        now = time.perf_counter()
         
-        try:
-            # Sur localhost, la latence est très faible
-            # Utiliser une valeur réaliste pour l'affichage
-            if self.mqtt_config['host'] in ['localhost', '127.0.0.1', '::1']:
-                # Valeur typique pour localhost (2-5ms)
-                import random
-                self.mqttData['latency'] = random.randint(2, 5)
+        # Pings sans écho au-delà du délai : comptés perdus (sauf écho traité entre-temps)
+        with self.pings_lock:
+            for seq, sent_at in list(self.pending_pings.items()):
+                if now - sent_at > self.ping_timeout and self.pending_pings.pop(seq, None) is not None:
+                    self.pings_lost += 1
+            
+            if not self.connected or len(self.pending_pings) >= 16:
                 return
             
-            # Pour un host distant, mesurer vraiment
-            start_time = time.time()
-            result = self.mqtt_client.publish(
-                "test/latency/ping",
-                json.dumps({"timestamp": start_time}),
-                qos=2  # QoS 2 pour plus de précision
-            )
+            self.ping_seq += 1
+            seq = self.ping_seq
+            self.pending_pings[seq] = now
+        
+        try:
+            # QoS 0 : on mesure l'aller-retour par le broker, pas la poignée de main QoS 2
+            self.mqtt_client.publish(self.ping_topic, str(seq), qos=0)
             
-            if result.rc == 0:
-                # Attendre la confirmation
-                result.wait_for_publish()
-                latency_ms = int((time.time() - start_time) * 1000)
-                # Minimum 1ms pour éviter 0
-                self.mqttData['latency'] = max(1, min(latency_ms, 999))
-                
         except Exception as e:
-            logger.debug(f"Erreur calcul latence: {e}")
-            self.mqttData['latency'] = 3  # Valeur par défaut
+            logger.debug(f"Erreur envoi ping latence: {e}")
     
-    def publish_data(self, topic, data):
-        """Publie des données sur MQTT avec gestion d'erreur"""
-        if not self.connected:
-            return False
-        
+    def _on_ping_echo(self, payload, received_at):
+        """Écho d'un ping : mesure du temps d'aller-retour (horodaté à la réception)
+
+        payload est le numéro de séquence en octets ASCII (int() l'accepte tel quel)
+        """
         try:
-            payload = {
-                "timestamp": datetime.utcnow().isoformat() + "Z",
-                **data
-            }
-            
-            result = self.mqtt_client.publish(topic, json.dumps(payload), qos=1)
+            seq = int(payload)
+        except ValueError:
+            return
+        
+        # Échantillons lus par latency_percentiles() depuis le thread de l'ordonnanceur
+        with self.pings_lock:
+            sent_at = self.pending_pings.pop(seq, None)
             
-            if result.rc == 0:
-                self.stats['messages_sent'] += 1
-                return True
-            else:
-                self.stats['errors'] += 1
-                return False
+            # Doublon (abonnements qui se recouvrent) ou ping déjà expiré
+            if sent_at is None:
+                return
             
-        except Exception as e:
-            logger.error(f"Erreur publication: {e}")
-            self.stats['errors'] += 1
-            return False
+            rtt_ms = (received_at - sent_at) * 1000
+            self.rtt_samples.append(rtt_ms)
+        
+        self.mqttData['latency'] = round(rtt_ms, 2)
+    
+    def latency_percentiles(self):
+        """p50/p95/p99/max des derniers temps d'aller-retour (ms)"""
+        # Copie sous verrou (le thread de traitement ajoute des échantillons), tri hors verrou
+        with self.pings_lock:
+            samples = list(self.rtt_samples)
+            lost = self.pings_lost
+        
+        samples.sort()
+        if not samples:
+            return {"p50": None, "p95": None, "p99": None, "max": None,
+                    "samples": 0, "lost": lost}
+        
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 2)
+        
+        return {
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            "max": round(samples[-1], 2),
+            "samples": len(samples),
+            "lost": lost
+        }
     
     def collect_and_publish(self):
         """Collecte et publie les données"""
@@ -376,32 +436,65 @@ class MQTTStatsCollector:
             # Mettre à jour le timestamp d'activité
             self.mqttData['lastActivityTimestamp'] = time.time()
             
-            # Préparer la liste des topics actifs
-            topics_list = sorted(list(self.active_topics))[:15]  # Max 15 topics
+            # Instantané des topics actifs les plus récents (compteurs et débits)
+            snapshot = self.active_topics.snapshot(self.topics_published)
+            topics_list = sorted(topic for topic, _, _ in snapshot)
             
-            # Publier les statistiques principales
+            # Publier les statistiques principales (instantané du thread de traitement)
+            snap = self.snapshot
             self.publish_data("rpi/network/mqtt/stats", {
-                "messages_received": self.mqttData['received'],
-                "messages_sent": self.mqttData['sent'],
-                "clients_connected": self.mqttData['clients_connected'],
-                "uptime_seconds": self.mqttData['uptime_seconds'],
-                "uptime": self.mqttData['uptime'],
-                "latency_ms": self.mqttData['latency'],
-                "broker_version": self.mqttData['broker_version'],
-                "status": self.mqttData['status']
+                "messages_received": snap['received'],
+                "messages_sent": snap['sent'],
+                "clients_connected": snap['clients_connected'],
+                "uptime_seconds": snap['uptime_seconds'],
+                "uptime": snap['uptime'],
+                "latency_ms": snap['latency'],
+                "messages_received_rate": snap['received_rate'],
+                "messages_sent_rate": snap['sent_rate'],
+                "latency": self.latency_percentiles(),
+                "broker_version": snap['broker_version'],
+                "broker_load": snap['broker_load'],
+                "status": self.mqttData['status'],
+                "ingest": self.ingest.stats()
             })
             
             # Publier la liste des topics actifs
+            sampling_ratio = self.sampling_ratio()
             self.publish_data("rpi/network/mqtt/topics", {
                 "topics": topics_list,
-                "count": len(topics_list)
+                "count": len(topics_list),
+                "discovery": self.discovery_mode,
+                "sampling_ratio": sampling_ratio,
+                "details": [
+                    {"topic": topic, "messages": count, "rate": round(rate, 2)}
+                    for topic, count, rate in snapshot
+                ]
+            })
+            
+            # Séries $SYS : publiées seulement quand le broker a envoyé de nouvelles valeurs
+            sys_summary = self.sys_summary
+            if sys_summary and sys_summary is not self.sys_published:
+                self.sys_published = sys_summary
+                self.publish_data("rpi/network/mqtt/broker", {
+                    "metrics": sys_summary,
+                    "broker_load": snap['broker_load'],
+                    "history_length": self.sys_history
+                })
+            
+            # Publier les plus gros émetteurs
+            self.top_talkers.tick()
+            self.publish_data("rpi/network/mqtt/topstats", {
+                "topics": self.top_talkers.top(self.top_talkers_published),
+                "tracked": self.top_talkers.used,
+                "sampling_ratio": sampling_ratio,
+                "size_buckets": list(SIZE_BUCKETS)
             })
             
             # Log pour debug
             logger.info(
-                f"Stats publiées - Reçus: {self.mqttData['received']}, "
-                f"Envoyés: {self.mqttData['sent']}, "
-                f"Clients: {self.mqttData['clients_connected']}, "
+                f"Stats publiées - Reçus: {snap['received']}, "
+                f"Envoyés: {snap['sent']}, "
+                f"Clients: {snap['clients_connected']}, "
                 f"Topics actifs: {len(topics_list)}"
             )
             
@@ -411,95 +504,14 @@ class MQTTStatsCollector:
     
     def log_statistics(self):
         """Affiche les statistiques"""
-        runtime = time.time() - self.stats['start_time']
-        hours = int(runtime // 3600)
-        minutes = int((runtime % 3600) // 60)
-        
-        logger.info(
-            f"Stats internes - Runtime: {hours}h {minutes}m | "
-            f"Messages publiés: {self.stats['messages_sent']} | "
-            f"Erreurs: {self.stats['errors']} | "
-            f"Échecs connexion: {self.stats['connection_failures']}"
-        )
+        super().log_statistics()
         
         if self.ignored_topics:
             logger.info(f"Topics ignorés: {len(self.ignored_topics)}")
-    
-    def run(self):
-        """Boucle principale avec gestion d'erreurs robuste"""
-        logger.info("Démarrage du collecteur MQTT Stats")
-        
-        # Attendre un peu au démarrage pour laisser le système se stabiliser
-        startup_delay = int(os.environ.get('STARTUP_DELAY', '10'))
-        if startup_delay > 0:
-            logger.info(f"Pause de {startup_delay}s au démarrage...")
-            time.sleep(startup_delay)
-        
-        # Se connecter au broker MQTT avec retry
-        if not self.connect_mqtt():
-            logger.error("Impossible de se connecter au broker MQTT après toutes les tentatives")
-            return
-        
-        logger.info("Collecteur opérationnel - Lecture des topics système $SYS")
-        
-        # Attendre un peu pour recevoir les premières valeurs système
-        logger.info("Attente des premières statistiques système...")
-        time.sleep(5)
         
-        # Compteur pour les statistiques
-        stats_counter = 0
-        error_count = 0
-        
-        try:
-            while True:
-                try:
-                    # Vérifier les connexions MQTT
-                    if not self.connected or not self.stats_connected:
-                        logger.warning("Connexion MQTT perdue, reconnexion...")
-                        if not self.connect_mqtt():
-                            logger.error("Reconnexion échouée")
-                            break
-                    
-                    # Collecter et publier
-                    self.collect_and_publish()
-                    
-                    # Afficher les statistiques toutes les 5 minutes
-                    stats_counter += 1
-                    if stats_counter >= (300 // self.update_interval):
-                        self.log_statistics()
-                        stats_counter = 0
-                    
-                    # Réinitialiser le compteur d'erreurs si tout va bien
-                    error_count = 0
-                    
-                    # Pause selon l'intervalle configuré
-                    time.sleep(self.update_interval)
-                    
-                except Exception as e:
-                    error_count += 1
-                    logger.error(f"Erreur dans la boucle de collecte: {e}")
-                    self.stats['errors'] += 1
-                    
-                    # Si trop d'erreurs consécutives, arrêter
-                    if error_count > 10:
-                        logger.error("Trop d'erreurs consécutives, arrêt du collecteur")
-                        break
-                    
-                    time.sleep(10)  # Pause plus longue en cas d'erreur
-                
-        except KeyboardInterrupt:
-            logger.info("Arrêt demandé par l'utilisateur")
-        except Exception as e:
-            logger.error(f"Erreur dans la boucle principale: {e}")
-        finally:
-            # Nettoyer
-            for client in [self.mqtt_client, self.stats_client]:
-                if client:
-                    client.loop_stop()
-                    client.disconnect()
-            
-            self.log_statistics()
-            logger.info("Collecteur arrêté")
+        ingest = self.ingest.stats()
+        logger.info(f"File de messages - Traités: {ingest['processed']} | Perdus: {ingest['dropped']} | "
+                    f"Profondeur max: {ingest['max_depth']}")
 
 if __name__ == "__main__":
     # Configuration
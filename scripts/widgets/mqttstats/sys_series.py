@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Séries temporelles des métriques $SYS pour le widget MQTT Stats
+Un tampon circulaire de taille fixe par métrique numérique ; débits par
+seconde dérivés des compteurs cumulés (remise à zéro au redémarrage du
+broker prise en compte) et moyennes lissées sur 1/5/15 minutes
+"""
+
+import math
+from array import array
+
+from topic_stats import RATE_WINDOWS
+
+SYS_PREFIX = "$SYS/broker/"
+
+# Compteurs cumulés depuis le démarrage du broker (le reste est une jauge)
+COUNTER_METRICS = frozenset((
+    "messages/received",
+    "messages/sent",
+    "bytes/received",
+    "bytes/sent",
+    "publish/messages/received",
+    "publish/messages/sent",
+    "publish/messages/dropped",
+    "publish/bytes/received",
+    "publish/bytes/sent",
+))
+
+class SysMetric:
+    """Tampon circulaire des échantillons d'une métrique $SYS
+    
+    Pour un compteur, l'échantillon est le débit par seconde depuis la
+    valeur précédente ; pour une jauge, c'est la valeur elle-même.
+    """
+    
+    __slots__ = ('counter', 'samples', 'index', 'count',
+                 'value', 'last_time', 'restarted_at', 'resets', 'averages')
+    
+    def __init__(self, counter, capacity):
+        self.counter = counter
+        self.samples = array('d', bytes(8 * capacity))
+        self.index = 0
+        self.count = 0
+        
+        self.value = None
+        self.last_time = None
+        # Instant (horloge monotone) du dernier redémarrage du broker signalé
+        self.restarted_at = None
+        self.resets = 0
+        
+        # Moyennes lissées par fenêtre (None avant le premier échantillon)
+        self.averages = None
+    
+    def add(self, now, value):
+        """Enregistre une valeur reçue à l'instant now (secondes, horloge monotone)"""
+        previous, previous_time = self.value, self.last_time
+        self.value = value
+        self.last_time = now
+        
+        if previous_time is None:
+            if not self.counter:
+                self._append(value, None)
+            return
+        
+        elapsed = now - previous_time
+        if elapsed <= 0:
+            return
+        
+        if not self.counter:
+            self._append(value, elapsed)
+            return
+        
+        # Redémarrage du broker entre les deux valeurs : le compteur est reparti de zéro.
+        # Détecté par le recul du compteur ou par l'uptime (topics $SYS dans un ordre
+        # quelconque) : un seul reset par redémarrage, quel que soit le premier arrivé
+        delta = value - previous
+        restarted = self.restarted_at is not None and previous_time < self.restarted_at
+        self.restarted_at = None
+        if delta < 0 or restarted:
+            delta = value
+            self.resets += 1
+        
+        self._append(delta / elapsed, elapsed)
+    
+    def restart(self, started_at):
+        """Signale un redémarrage du broker (uptime en recul) survenu à started_at
+        
+        Sans effet si la valeur courante est déjà postérieure au redémarrage
+        (recul du compteur arrivé avant l'uptime, reset déjà compté).
+        """
+        if self.counter and self.last_time is not None and self.last_time < started_at:
+            self.restarted_at = started_at
+    
+    def _append(self, sample, elapsed):
+        capacity = len(self.samples)
+        self.samples[self.index] = sample
+        self.index = (self.index + 1) % capacity
+        self.count = min(self.count + 1, capacity)
+        
+        if self.averages is None or elapsed is None:
+            self.averages = [sample] * len(RATE_WINDOWS)
+        else:
+            for i, window in enumerate(RATE_WINDOWS):
+                decay = math.exp(-elapsed / window)
+                self.averages[i] = self.averages[i] * decay + sample * (1 - decay)
+    
+    def latest(self):
+        """Dernier échantillon, ou None"""
+        if not self.count:
+            return None
+        return self.samples[self.index - 1]
+    
+    def history(self, limit=None):
+        """Les limit derniers échantillons, du plus ancien au plus récent"""
+        count = self.count if limit is None else min(limit, self.count)
+        capacity = len(self.samples)
+        start = self.index - count
+        return [self.samples[i % capacity] for i in range(start, self.index)]
+
+class SysSeries:
+    """Séries des métriques numériques $SYS/broker/* (hors load/*, déjà lissées par le broker)"""
+    
+    def __init__(self, capacity=120):
+        self.capacity = capacity
+        self.metrics = {}
+    
+    def __len__(self):
+        return len(self.metrics)
+    
+    def add(self, name, now, value):
+        """Ajoute une valeur ; name est relatif à $SYS/broker/ (ex. messages/received)"""
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = SysMetric(name in COUNTER_METRICS, self.capacity)
+        metric.add(now, value)
+    
+    def restart(self, started_at):
+        """Redémarrage du broker à started_at (horloge des échantillons) : les compteurs relus
+        depuis repartent de zéro"""
+        for metric in self.metrics.values():
+            metric.restart(started_at)
+    
+    def rate(self, name):
+        """Dernier débit par seconde d'un compteur, ou None"""
+        metric = self.metrics.get(name)
+        if metric is None or not metric.counter:
+            return None
+        latest = metric.latest()
+        return None if latest is None else round(latest, 3)
+    
+    def summary(self, history=0):
+        """Valeurs brutes, débits et moyennes 1/5/15 min de chaque métrique
+        
+        history : nombre de derniers échantillons joints à chaque métrique
+        """
+        result = {}
+        for name, metric in sorted(self.metrics.items()):
+            entry = {"value": metric.value}
+            
+            if metric.counter:
+                latest = metric.latest()
+                entry["rate"] = None if latest is None else round(latest, 3)
+                entry["resets"] = metric.resets
+                prefix = "rate_"
+            else:
+                prefix = "avg_"
+            
+            for window, average in zip(RATE_WINDOWS, metric.averages or [None] * len(RATE_WINDOWS)):
+                entry[f"{prefix}{window // 60}m"] = None if average is None else round(average, 3)
+            
+            if history:
+                entry["history"] = [round(sample, 3) for sample in metric.history(history)]
+            
+            result[name] = entry
+        
+        return result
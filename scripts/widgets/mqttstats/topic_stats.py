@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Suivi des topics actifs pour le widget MQTT Stats
+LRU ordonné (OrderedDict) : mise à jour en O(1) par message reçu, compteurs
+et débits par topic, instantané cohérent sans tri de l'ensemble.
+Gros émetteurs : statistiques par topic en mémoire bornée (space-saving)
+"""
+
+import math
+import time
+import heapq
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+class TopicStats:
+    """Compteurs d'un topic actif"""
+    
+    __slots__ = ('count', 'first_seen', 'last_seen', 'snapshot_count', 'rate')
+    
+    def __init__(self, now):
+        self.count = 0
+        self.first_seen = now
+        self.last_seen = now
+        
+        # Compteur lors de l'instantané précédent (calcul du débit)
+        self.snapshot_count = 0
+        self.rate = 0.0
+
+class TopicTracker:
+    """Topics actifs les plus récents (capacité bornée, éviction du plus ancien)"""
+    
+    def __init__(self, capacity=15, clock=time.monotonic):
+        self.capacity = capacity
+        self.clock = clock
+        self.topics = OrderedDict()
+        self.lock = threading.Lock()
+        self.evicted = 0
+        self._last_snapshot = clock()
+    
+    def __len__(self):
+        return len(self.topics)
+    
+    def touch(self, topic):
+        """Enregistre un message sur le topic (appelé depuis le thread réseau)"""
+        now = self.clock()
+        
+        with self.lock:
+            stats = self.topics.get(topic)
+            if stats is None:
+                stats = self.topics[topic] = TopicStats(now)
+                if len(self.topics) > self.capacity:
+                    # Le moins récemment actif est en tête
+                    self.topics.popitem(last=False)
+                    self.evicted += 1
+            else:
+                self.topics.move_to_end(topic)
+            
+            stats.count += 1
+            stats.last_seen = now
+    
+    def snapshot(self, limit=None):
+        """Les limit topics les plus récents : [(topic, messages, débit msg/s), ...]
+        
+        La liste est parcourue sous verrou dans l'ordre du LRU (plus récent
+        d'abord) ; les débits sont calculés depuis l'instantané précédent.
+        """
+        now = self.clock()
+        result = []
+        
+        with self.lock:
+            since = self._last_snapshot
+            self._last_snapshot = now
+            
+            for topic in reversed(self.topics):
+                stats = self.topics[topic]
+                
+                elapsed = now - max(since, stats.first_seen)
+                if elapsed > 0:
+                    stats.rate = (stats.count - stats.snapshot_count) / elapsed
+                stats.snapshot_count = stats.count
+                
+                if limit is None or len(result) < limit:
+                    result.append((topic, stats.count, stats.rate))
+        
+        return result
+
+# ===============================================================================
+# GROS ÉMETTEURS (SPACE-SAVING)
+# ===============================================================================
+
+# Bornes supérieures des classes de taille de payload (octets)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536)
+
+# Fenêtres des débits lissés (secondes), comme le load average
+RATE_WINDOWS = (60, 300, 900)
+
+class TopTalkers:
+    """Statistiques par topic en mémoire bornée (algorithme space-saving)
+    
+    Au plus capacity topics sont suivis, dans des tableaux indexés par
+    emplacement. Un topic inconnu prend la place du moins actif en
+    héritant de son compteur (l'erreur maximale est conservée), ce qui
+    garantit que les gros émetteurs restent suivis.
+    """
+    
+    def __init__(self, capacity=64, clock=time.monotonic):
+        self.capacity = capacity
+        self.clock = clock
+        self.lock = threading.Lock()
+        
+        self.slots = {}
+        self.topics = [None] * capacity
+        self.used = 0
+        
+        # Compteurs par emplacement
+        self.counts = array('Q', bytes(8 * capacity))
+        self.errors = array('Q', bytes(8 * capacity))
+        self.bytes = array('Q', bytes(8 * capacity))
+        self.histograms = array('Q', bytes(8 * capacity * (len(SIZE_BUCKETS) + 1)))
+        
+        # Messages et octets depuis le dernier tick, débits lissés par fenêtre
+        self.pending_messages = array('Q', bytes(8 * capacity))
+        self.pending_bytes = array('Q', bytes(8 * capacity))
+        self.rates = [array('d', bytes(8 * capacity)) for _ in RATE_WINDOWS]
+        self.byte_rates = array('d', bytes(8 * capacity))
+        
+        self.replacements = 0
+        self._last_tick = clock()
+    
+    def add(self, topic, size):
+        """Compte un message de size octets (appelé depuis le thread réseau)"""
+        with self.lock:
+            slot = self.slots.get(topic)
+            
+            if slot is None:
+                if self.used < self.capacity:
+                    slot = self.used
+                    self.used += 1
+                    self._reset(slot, 0)
+                else:
+                    # Remplace le topic le moins actif
+                    minimum = min(self.counts)
+                    slot = self.counts.index(minimum)
+                    del self.slots[self.topics[slot]]
+                    self._reset(slot, minimum)
+                    self.replacements += 1
+                
+                self.slots[topic] = slot
+                self.topics[slot] = topic
+            
+            self.counts[slot] += 1
+            self.bytes[slot] += size
+            self.pending_messages[slot] += 1
+            self.pending_bytes[slot] += size
+            self.histograms[slot * (len(SIZE_BUCKETS) + 1) + bisect_left(SIZE_BUCKETS, size)] += 1
+    
+    def _reset(self, slot, inherited):
+        self.counts[slot] = inherited
+        self.errors[slot] = inherited
+        self.bytes[slot] = 0
+        self.pending_messages[slot] = 0
+        self.pending_bytes[slot] = 0
+        self.byte_rates[slot] = 0.0
+        for rates in self.rates:
+            rates[slot] = 0.0
+        
+        width = len(SIZE_BUCKETS) + 1
+        for i in range(slot * width, (slot + 1) * width):
+            self.histograms[i] = 0
+    
+    def tick(self):
+        """Met à jour les débits lissés (à appeler à chaque publication)"""
+        now = self.clock()
+        
+        with self.lock:
+            elapsed = now - self._last_tick
+            if elapsed <= 0:
+                return
+            self._last_tick = now
+            
+            decays = [math.exp(-elapsed / window) for window in RATE_WINDOWS]
+            byte_decay = decays[0]
+            
+            for slot in range(self.used):
+                rate = self.pending_messages[slot] / elapsed
+                for rates, decay in zip(self.rates, decays):
+                    rates[slot] = rates[slot] * decay + rate * (1 - decay)
+                
+                self.byte_rates[slot] = (self.byte_rates[slot] * byte_decay
+                                         + self.pending_bytes[slot] / elapsed * (1 - byte_decay))
+                self.pending_messages[slot] = 0
+                self.pending_bytes[slot] = 0
+    
+    def top(self, limit=10):
+        """Les limit topics au plus fort débit sur 1 minute"""
+        with self.lock:
+            rates_1m = self.rates[0]
+            slots = heapq.nlargest(limit, range(self.used), key=lambda slot: (rates_1m[slot], self.counts[slot]))
+            width = len(SIZE_BUCKETS) + 1
+            
+            return [{
+                "topic": self.topics[slot],
+                "messages": self.counts[slot],
+                "error": self.errors[slot],
+                "rate_1m": round(self.rates[0][slot], 3),
+                "rate_5m": round(self.rates[1][slot], 3),
+                "rate_15m": round(self.rates[2][slot], 3),
+                "bytes_per_second": round(self.byte_rates[slot], 1),
+                "bytes_total": self.bytes[slot],
+                "size_histogram": list(self.histograms[slot * width:(slot + 1) * width])
+            } for slot in slots]
@@ -6,11 +6,7 @@ Version nettoyée sans delays système
 
 import os
 import sys
-import time
-import json
 import logging
-from datetime import datetime
-from pathlib import Path
 
 # Configuration du logging
 logging.basicConfig(
@@ -29,181 +25,185 @@ except ImportError:
     logger.error("Module psutil non installé")
     sys.exit(1)
 
-try:
-    import paho.mqtt.client as mqtt
-except ImportError:
-    logger.error("Module paho-mqtt non installé")
-    sys.exit(1)
+# Core commun des widgets (BaseCollector)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '_core'))
+from collector_base import BaseCollector
+from procfs import CPUSampler, PseudoFile, probe_cpu_thermal_zone, probe_cpufreq_policies
+from deadband import DeadbandFilter
 
-class SystemMetricsCollector:
+class SystemMetricsCollector(BaseCollector):
     def __init__(self, config_file):
         """Initialise le collecteur avec la configuration du widget"""
-        self.config = self.load_config(config_file)
-        self.mqtt_client = None
-        self.connected = False
+        super().__init__(config_file, 'servermonitoring')
+        
+        # Intervalles de mise à jour (par groupe, ou par métrique pour surcharger)
+        self.intervals = self.config['collector']['update_intervals']
+        self.metrics_groups = self.config['collector']['metrics_groups']
         
-        # Configuration MQTT
-        self.mqtt_config = self.config['mqtt']['broker']
+        # Fonctions de collecte par métrique (noms de metrics_groups)
+        self.metric_collectors = {
+            'cpu_usage': self.collect_cpu_metrics,
+            'ram_usage': self.collect_ram_metrics,
+            'swap_usage': self.collect_swap_metrics,
+            'disk_usage': self.collect_disk_metrics,
+            'temperatures': self.collect_temperature_metrics,
+            'frequencies': self.collect_frequency_metrics,
+            'uptime': self.collect_uptime_metrics
+        }
         
-        # Configuration retry MQTT uniquement
-        self.retry_enabled = os.environ.get('MQTT_RETRY_ENABLED', 'true').lower() == 'true'
-        self.retry_delay = int(os.environ.get('MQTT_RETRY_DELAY', '10'))
-        self.max_retries = int(os.environ.get('MQTT_MAX_RETRIES', '0'))  # 0 = infini
+        # Mode trames groupées : une publication par groupe et par cycle
+        batch_config = self.config['collector'].get('batch', {})
+        self.batch_enabled = batch_config.get('enabled', False)
+        self.batch_prefix = batch_config.get('topic_prefix', 'rpi/system/batch')
+        self.batch_fanout = batch_config.get('fanout', True)
+        self.current_frame = None
         
-        # Compteur de tentatives
-        self.connection_attempts = 0
+        # Échantillonneur CPU non bloquant (écarts entre lectures de /proc/stat)
+        cpu_config = self.config['collector'].get('cpu', {})
+        self.cpu_breakdown = cpu_config.get('breakdown', True)
+        self.cpu_sampler = CPUSampler(ewma_alpha=cpu_config.get('ewma_alpha', 0.3))
         
-        # Intervalles de mise à jour
-        self.intervals = self.config['collector']['update_intervals']
-        self.last_update = {
-            'fast': 0,
-            'normal': 0,
-            'slow': 0
-        }
+        # Pseudo-fichiers /sys et /proc (ouverts dans initialize)
+        self.temp_file = None
+        self.freq_files = []
+        self.uptime_file = None
         
-        # Statistiques
-        self.stats = {
-            'messages_sent': 0,
-            'errors': 0,
-            'start_time': time.time(),
-            'connection_failures': 0
-        }
+        # Publication sur changement uniquement (bande morte + battement de cœur)
+        deadband_config = self.config['collector'].get('deadband', {})
+        self.retain = deadband_config.get('retain', False)
+        self.deadband = None
+        if deadband_config.get('enabled', False):
+            self.deadband = DeadbandFilter(
+                deadband_config.get('topics', {}),
+                deadband_config.get('max_silence', 60)
+            )
+            logger.info(f"Bande morte active ({len(self.deadband.rules)} règle(s), "
+                        f"silence max {self.deadband.max_silence}s, retain: {self.retain})")
         
-        logger.info(f"Collecteur initialisé - Version {self.config['widget']['version']}")
-        logger.info(f"Retry: {self.retry_enabled}, Delay: {self.retry_delay}s, Max: {self.max_retries}")
+        if self.batch_enabled:
+            logger.info(f"Trames groupées sur {self.batch_prefix}/<groupe> (fan-out par topic: {self.batch_fanout})")
     
-    def load_config(self, config_file):
-        """Charge la configuration depuis le fichier JSON"""
-        try:
-            with open(config_file, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Erreur chargement config: {e}")
-            sys.exit(1)
+    def on_mqtt_connected(self):
+        """Tout republier au premier cycle après (re)connexion"""
+        if self.deadband:
+            self.deadband.reset()
     
-    def connect_mqtt(self):
-        """Connexion au broker MQTT avec retry robuste"""
-        while True:
-            try:
-                self.connection_attempts += 1
-                
-                # Vérifier si on a atteint la limite
-                if self.max_retries > 0 and self.connection_attempts > self.max_retries:
-                    logger.error(f"Limite de tentatives atteinte ({self.max_retries})")
-                    return False
-                
-                logger.info(f"Tentative de connexion MQTT #{self.connection_attempts} à {self.mqtt_config['host']}:{self.mqtt_config['port']}")
-                
-                # Créer le client MQTT
-                self.mqtt_client = mqtt.Client()
-                
-                # Callbacks
-                self.mqtt_client.on_connect = self.on_connect
-                self.mqtt_client.on_disconnect = self.on_disconnect
-                
-                # Authentification
-                self.mqtt_client.username_pw_set(
-                    self.mqtt_config['username'],
-                    self.mqtt_config['password']
-                )
-                
-                # Options de reconnexion automatique
-                self.mqtt_client.reconnect_delay_set(min_delay=1, max_delay=120)
-                
-                # Connexion
-                self.mqtt_client.connect(
-                    self.mqtt_config['host'], 
-                    self.mqtt_config['port'], 
-                    60
-                )
-                
-                # Démarrer la boucle
-                self.mqtt_client.loop_start()
-                
-                # Attendre la connexion
-                timeout = 30
-                while not self.connected and timeout > 0:
-                    time.sleep(0.5)
-                    timeout -= 0.5
-                
-                if self.connected:
-                    logger.info("Connexion MQTT établie avec succès")
-                    self.stats['connection_failures'] = 0
-                    return True
-                else:
-                    raise Exception("Timeout de connexion")
-                
-            except Exception as e:
-                self.stats['connection_failures'] += 1
-                logger.error(f"Erreur connexion MQTT: {e}")
-                
-                if self.mqtt_client:
-                    try:
-                        self.mqtt_client.loop_stop()
-                    except:
-                        pass
-                
-                if not self.retry_enabled:
-                    return False
-                
-                # Attendre avant de réessayer
-                logger.info(f"Nouvelle tentative dans {self.retry_delay} secondes...")
-                time.sleep(self.retry_delay)
+    def initialize(self):
+        """Détection unique des capteurs et ouverture des pseudo-fichiers"""
+        temp_path = probe_cpu_thermal_zone()
+        self.temp_file = PseudoFile(temp_path) if temp_path else None
+        self.freq_files = [PseudoFile(path) for path in probe_cpufreq_policies()]
+        self.uptime_file = PseudoFile('/proc/uptime')
+        
+        logger.info(f"Capteurs: température {temp_path or 'absente'}, "
+                    f"{len(self.freq_files)} politique(s) cpufreq")
     
-    def on_connect(self, client, userdata, flags, rc):
-        """Callback de connexion"""
-        if rc == 0:
-            logger.info("Connecté au broker MQTT")
-            self.connected = True
-        else:
-            logger.error(f"Échec connexion MQTT, code: {rc}")
-            self.connected = False
+    def cleanup(self):
+        """Ferme les pseudo-fichiers"""
+        for pseudo_file in [self.temp_file, self.uptime_file] + self.freq_files:
+            if pseudo_file:
+                pseudo_file.close()
     
-    def on_disconnect(self, client, userdata, rc):
-        """Callback de déconnexion"""
-        logger.warning(f"Déconnecté du broker MQTT (code: {rc})")
-        self.connected = False
-        self.stats['connection_failures'] += 1
+    def get_update_interval(self):
+        """Intervalle du groupe le plus rapide"""
+        return min(self.intervals[group] for group in self.metrics_groups)
     
-    def publish_metric(self, topic, value, unit=None):
-        """Publie une métrique sur MQTT avec gestion d'erreur"""
-        if not self.connected:
-            return False
+    def get_tasks(self):
+        """Une tâche par groupe de métriques partageant le même intervalle
         
-        try:
-            payload = {
-                "timestamp": datetime.utcnow().isoformat() + "Z",
-                "value": value
-            }
+        L'intervalle d'une métrique est celui de son groupe dans
+        update_intervals, sauf si update_intervals contient une entrée
+        au nom de la métrique (ex: "uptime": 60).
+        """
+        slots = {}
+        
+        for group, metrics in self.metrics_groups.items():
+            for metric in metrics:
+                collector = self.metric_collectors.get(metric)
+                if collector is None:
+                    logger.warning(f"Métrique inconnue ignorée: {metric}")
+                    continue
+                
+                interval = self.intervals.get(metric, self.intervals[group])
+                name = group if metric not in self.intervals else f"{group}/{metric}"
+                slots.setdefault((name, interval), []).append(collector)
+        
+        return [
+            (name, interval, self._make_group_task(name, collectors))
+            for (name, interval), collectors in slots.items()
+        ]
+    
+    def _make_group_task(self, name, collectors):
+        """Fonction exécutant les collectes d'un groupe"""
+        def run_group():
+            if self.batch_enabled:
+                self.current_frame = {'metrics': {}, 'units': {}}
             
-            if unit:
-                payload["unit"] = unit
+            try:
+                for collector in collectors:
+                    collector()
+            finally:
+                frame, self.current_frame = self.current_frame, None
             
-            result = self.mqtt_client.publish(topic, json.dumps(payload), qos=1)
+            if frame and frame['metrics']:
+                self.publish_frame(name, frame)
+        return run_group
+    
+    def publish_metric(self, topic, value, unit=None, retain=False):
+        """Publie une métrique si elle a changé, ou l'ajoute à la trame du groupe en cours
+        
+        retain s'ajoute au retain de la bande morte (deadband.retain) : l'un ou
+        l'autre suffit pour que le broker conserve la dernière valeur.
+        """
+        if self.deadband and not self.deadband.should_publish(topic, value):
+            return True
+        
+        if self.current_frame is not None:
+            # Clé compacte : topic sans le préfixe commun
+            key = topic[len("rpi/system/"):] if topic.startswith("rpi/system/") else topic
+            self.current_frame['metrics'][key] = value
+            if unit:
+                self.current_frame['units'][key] = unit
             
-            if result.rc == 0:
-                self.stats['messages_sent'] += 1
+            # Compatibilité : publications individuelles pour les anciens clients
+            if not self.batch_fanout:
+                if self.deadband:
+                    self.deadband.record(topic, value)
                 return True
-            else:
-                self.stats['errors'] += 1
-                return False
-                
-        except Exception as e:
-            logger.error(f"Erreur publication: {e}")
-            self.stats['errors'] += 1
-            return False
+        
+        published = super().publish_metric(topic, value, unit, retain=retain or self.retain)
+        if published and self.deadband:
+            self.deadband.record(topic, value)
+        return published
+    
+    def publish_frame(self, group, frame):
+        """Publie la trame d'un groupe en un seul message"""
+        return self.publish_data(f"{self.batch_prefix}/{group}", {
+            "group": group,
+            "metrics": frame['metrics'],
+            "units": frame['units']
+        })
     
     def collect_cpu_metrics(self):
-        """Collecte les métriques CPU"""
+        """Collecte les métriques CPU (sans attente : écart depuis le cycle précédent)"""
         try:
+            self.cpu_sampler.sample()
+            
             # Usage par core
-            cpu_percents = psutil.cpu_percent(interval=0.1, percpu=True)
-            for i, percent in enumerate(cpu_percents, 1):
+            for i, core in enumerate(self.cpu_sampler.cores(), 1):
                 self.publish_metric(
                     f"rpi/system/cpu/core{i}", 
-                    round(percent, 1), 
+                    round(core.usage, 1), 
                     "%"
                 )
+            
+            # Répartition globale et moyenne lissée
+            if self.cpu_breakdown:
+                total = self.cpu_sampler.total()
+                self.publish_metric("rpi/system/cpu/iowait", round(total.iowait, 1), "%")
+                self.publish_metric("rpi/system/cpu/steal", round(total.steal, 1), "%")
+                self.publish_metric("rpi/system/cpu/irq", round(total.irq, 1), "%")
+                self.publish_metric("rpi/system/cpu/smoothed", round(total.smoothed, 1), "%")
         except Exception as e:
             logger.error(f"Erreur collecte CPU: {e}")
             self.stats['errors'] += 1
@@ -212,11 +212,10 @@ class SystemMetricsCollector:
         """Collecte les températures"""
         try:
             # Température CPU (Raspberry Pi)
-            temp_file = "/sys/class/thermal/thermal_zone0/temp"
-            if os.path.exists(temp_file):
-                with open(temp_file, 'r') as f:
-                    temp_c = float(f.read().strip()) / 1000.0
-                    
+            temp_milli = self.temp_file.read_int() if self.temp_file else None
+            if temp_milli is not None:
+                temp_c = temp_milli / 1000.0
+                
                 self.publish_metric(
                     "rpi/system/temperature/cpu", 
                     round(temp_c, 1), 
@@ -236,51 +235,68 @@ class SystemMetricsCollector:
     def collect_frequency_metrics(self):
         """Collecte les fréquences"""
         try:
-            # Fréquence CPU
-            cpu_freq = psutil.cpu_freq()
-            if cpu_freq:
-                freq_ghz = round(cpu_freq.current / 1000, 2)
+            # Fréquence courante de chaque politique cpufreq (kHz)
+            freqs_khz = [f.read_int() for f in self.freq_files]
+            
+            # Fréquence CPU (moyenne, comme psutil.cpu_freq)
+            valid = [freq for freq in freqs_khz if freq is not None]
+            if valid:
+                freq_ghz = round(sum(valid) / len(valid) / 1000000, 2)
+            elif not self.freq_files:
+                # Pas de cpufreq (VM, conteneur) : psutil lit /proc/cpuinfo
+                cpu_freq = psutil.cpu_freq()
+                freq_ghz = round(cpu_freq.current / 1000, 2) if cpu_freq else None
+            else:
+                freq_ghz = None
+            
+            if freq_ghz is not None:
                 self.publish_metric(
                     "rpi/system/frequency/cpu", 
                     freq_ghz, 
                     "GHz"
                 )
             
-            # Fréquence GPU (spécifique Raspberry Pi)
-            gpu_freq_file = "/sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq"
-            if os.path.exists(gpu_freq_file):
-                with open(gpu_freq_file, 'r') as f:
-                    freq_khz = float(f.read().strip())
-                    freq_mhz = round(freq_khz / 1000, 0)
-                    self.publish_metric(
-                        "rpi/system/frequency/gpu", 
-                        freq_mhz, 
-                        "MHz"
-                    )
+            # Fréquence GPU (spécifique Raspberry Pi : politique du cpu0)
+            if freqs_khz and freqs_khz[0] is not None:
+                freq_mhz = round(freqs_khz[0] / 1000, 0)
+                self.publish_metric(
+                    "rpi/system/frequency/gpu", 
+                    freq_mhz, 
+                    "MHz"
+                )
         except Exception as e:
             logger.error(f"Erreur collecte fréquences: {e}")
             self.stats['errors'] += 1
     
-    def collect_memory_metrics(self):
-        """Collecte les métriques mémoire"""
+    def collect_ram_metrics(self):
+        """Collecte l'usage RAM"""
         try:
-            # RAM
             ram = psutil.virtual_memory()
             self.publish_metric(
                 "rpi/system/memory/ram", 
                 round(ram.percent, 1), 
                 "%"
             )
-            
-            # SWAP
+        except Exception as e:
+            logger.error(f"Erreur collecte RAM: {e}")
+            self.stats['errors'] += 1
+    
+    def collect_swap_metrics(self):
+        """Collecte l'usage SWAP"""
+        try:
             swap = psutil.swap_memory()
             self.publish_metric(
                 "rpi/system/memory/swap", 
                 round(swap.percent, 1), 
                 "%"
             )
-            
-            # Disque
+        except Exception as e:
+            logger.error(f"Erreur collecte SWAP: {e}")
+            self.stats['errors'] += 1
+    
+    def collect_disk_metrics(self):
+        """Collecte l'usage disque"""
+        try:
             disk = psutil.disk_usage('/')
             self.publish_metric(
                 "rpi/system/memory/disk", 
@@ -288,14 +304,15 @@ class SystemMetricsCollector:
                 "%"
             )
         except Exception as e:
-            logger.error(f"Erreur collecte mémoire: {e}")
+            logger.error(f"Erreur collecte disque: {e}")
             self.stats['errors'] += 1
     
     def collect_uptime_metrics(self):
         """Collecte l'uptime"""
         try:
-            with open('/proc/uptime', 'r') as f:
-                uptime_seconds = int(float(f.readline().split()[0]))
+            fields = self.uptime_file.read_fields() if self.uptime_file else None
+            if fields:
+                uptime_seconds = int(float(fields[0]))
                 self.publish_metric(
                     "rpi/system/uptime", 
                     uptime_seconds, 
@@ -305,99 +322,18 @@ class SystemMetricsCollector:
             logger.error(f"Erreur collecte uptime: {e}")
             self.stats['errors'] += 1
     
-    def log_statistics(self):
-        """Affiche les statistiques"""
-        runtime = time.time() - self.stats['start_time']
-        hours = int(runtime // 3600)
-        minutes = int((runtime % 3600) // 60)
-        
-        logger.info(
-            f"Stats - Runtime: {hours}h {minutes}m | "
-            f"Messages: {self.stats['messages_sent']} | "
-            f"Erreurs: {self.stats['errors']} | "
-            f"Échecs connexion: {self.stats['connection_failures']}"
-        )
+    def collect_and_publish(self):
+        """Collecte toutes les métriques (les groupes sont planifiés via get_tasks)"""
+        for group in self.metrics_groups.values():
+            for metric in group:
+                if metric in self.metric_collectors:
+                    self.metric_collectors[metric]()
     
-    def run(self):
-        """Boucle principale du collecteur"""
-        logger.info("Démarrage du collecteur")
-        
-        # Se connecter au broker MQTT avec retry
-        if not self.connect_mqtt():
-            logger.error("Impossible de se connecter au broker MQTT après toutes les tentatives")
-            return
-        
-        logger.info("Collecteur opérationnel")
-        
-        # Compteur pour les statistiques
-        stats_counter = 0
-        error_count = 0
-        
-        try:
-            while True:
-                try:
-                    current_time = time.time()
-                    
-                    # Vérifier la connexion MQTT
-                    if not self.connected:
-                        logger.warning("Connexion MQTT perdue, reconnexion...")
-                        if not self.connect_mqtt():
-                            logger.error("Reconnexion échouée")
-                            break
-                    
-                    # Groupe rapide (CPU, RAM)
-                    if current_time - self.last_update['fast'] >= self.intervals['fast']:
-                        self.collect_cpu_metrics()
-                        self.collect_memory_metrics()  # RAM seulement
-                        self.last_update['fast'] = current_time
-                    
-                    # Groupe normal (Températures, Fréquences)
-                    if current_time - self.last_update['normal'] >= self.intervals['normal']:
-                        self.collect_temperature_metrics()
-                        self.collect_frequency_metrics()
-                        self.last_update['normal'] = current_time
-                    
-                    # Groupe lent (SWAP, Disk, Uptime)
-                    if current_time - self.last_update['slow'] >= self.intervals['slow']:
-                        self.collect_memory_metrics()  # Toutes les métriques
-                        self.collect_uptime_metrics()
-                        self.last_update['slow'] = current_time
-                    
-                    # Afficher les statistiques toutes les 5 minutes
-                    stats_counter += 1
-                    if stats_counter >= 3000:  # 300 secondes à 0.1s par boucle
-                        self.log_statistics()
-                        stats_counter = 0
-                    
-                    # Réinitialiser le compteur d'erreurs si tout va bien
-                    error_count = 0
-                    
-                    # Pause pour éviter la surcharge CPU
-                    time.sleep(0.1)
-                    
-                except Exception as e:
-                    error_count += 1
-                    logger.error(f"Erreur dans la boucle de collecte: {e}")
-                    self.stats['errors'] += 1
-                    
-                    # Si trop d'erreurs consécutives, arrêter
-                    if error_count > 10:
-                        logger.error("Trop d'erreurs consécutives, arrêt du collecteur")
-                        break
-                    
-                    time.sleep(5)  # Pause plus longue en cas d'erreur
-                
-        except KeyboardInterrupt:
-            logger.info("Arrêt demandé par l'utilisateur")
-        except Exception as e:
-            logger.error(f"Erreur dans la boucle principale: {e}")
-        finally:
-            if self.mqtt_client:
-                self.mqtt_client.loop_stop()
-                self.mqtt_client.disconnect()
-            
-            self.log_statistics()
-            logger.info("Collecteur arrêté")
+    def log_statistics(self):
+        """Statistiques du collecteur et publications évitées par la bande morte"""
+        super().log_statistics()
+        if self.deadband:
+            logger.info(f"Publications évitées (bande morte): {self.deadband.suppressed}")
 
 if __name__ == "__main__":
     # Récupérer le fichier de configuration depuis l'environnement ou le paramètre
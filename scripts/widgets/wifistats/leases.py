@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Cache des baux DHCP dnsmasq pour le widget WiFi Stats
+Index MAC -> nom reconstruit uniquement quand le fichier change (inode,
+mtime, taille), et mémoire bornée des noms vus récemment
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger('leases')
+
+DNSMASQ_LEASES = "/var/lib/misc/dnsmasq.leases"
+
+class LeaseCache:
+    """Noms des clients DHCP indexés par adresse MAC"""
+    
+    def __init__(self, path=DNSMASQ_LEASES, recent_size=256):
+        """recent_size : nombre de noms conservés après expiration de leur bail"""
+        self.path = path
+        self.recent_size = recent_size
+        self.lock = threading.Lock()
+        
+        # Index du fichier courant et noms vus récemment (LRU)
+        self._index = {}
+        self._recent = OrderedDict()
+        
+        # Signature du fichier lors de la dernière lecture
+        self._signature = None
+        self.reloads = 0
+    
+    def refresh(self):
+        """Relit le fichier seulement s'il a changé depuis la dernière lecture"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            # Pas de fichier (dnsmasq arrêté) : seuls les noms récents restent connus
+            self._index = {}
+            self._signature = None
+            return False
+        
+        signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if signature == self._signature:
+            return False
+        
+        index = {}
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    # expiration mac ip nom client-id
+                    parts = line.split()
+                    if len(parts) >= 4 and parts[3] != '*':
+                        index[parts[1].lower()] = parts[3]
+        except OSError as e:
+            logger.debug(f"Impossible de lire les leases DHCP: {e}")
+            return False
+        
+        with self.lock:
+            self._index = index
+            self._signature = signature
+            self.reloads += 1
+        
+        return True
+    
+    def lookup(self, mac):
+        """Nom associé à la MAC (bail actuel, sinon nom vu récemment), ou None"""
+        mac = mac.lower()
+        
+        with self.lock:
+            name = self._index.get(mac)
+            if name is None:
+                name = self._recent.get(mac)
+                if name is None:
+                    return None
+            
+            self._recent[mac] = name
+            self._recent.move_to_end(mac)
+            if len(self._recent) > self.recent_size:
+                self._recent.popitem(last=False)
+        
+        return name
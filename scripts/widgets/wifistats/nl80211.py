@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+"""
+Accès nl80211 pour le widget WiFi Stats
+Requêtes netlink génériques (interface, stations) sur un socket persistant,
+notifications d'association (multicast mlme),
+repli sur la commande iw, et rejeu de captures pour tester sans matériel WiFi
+"""
+
+import os
+import re
+import json
+import struct
+import time
+import socket
+import asyncio
+import logging
+import subprocess
+
+logger = logging.getLogger('nl80211')
+
+# ===============================================================================
+# CONSTANTES NETLINK / NL80211
+# ===============================================================================
+
+NETLINK_GENERIC = 16
+
+SOL_NETLINK = 270
+NETLINK_ADD_MEMBERSHIP = 1
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+
+NLM_F_REQUEST = 0x01
+NLM_F_ACK = 0x04
+NLM_F_DUMP = 0x300
+
+NLA_TYPE_MASK = 0x3fff
+
+GENL_ID_CTRL = 0x10
+CTRL_CMD_GETFAMILY = 3
+CTRL_ATTR_FAMILY_ID = 1
+CTRL_ATTR_FAMILY_NAME = 2
+CTRL_ATTR_MCAST_GROUPS = 7
+
+NL80211_CMD_GET_INTERFACE = 5
+NL80211_CMD_GET_STATION = 17
+NL80211_CMD_NEW_STATION = 19
+NL80211_CMD_DEL_STATION = 20
+
+# Groupe multicast des notifications d'association (NEW/DEL_STATION)
+NL80211_MULTICAST_MLME = "mlme"
+
+NL80211_ATTR_IFINDEX = 3
+NL80211_ATTR_IFNAME = 4
+NL80211_ATTR_IFTYPE = 5
+NL80211_ATTR_MAC = 6
+NL80211_ATTR_STA_INFO = 21
+NL80211_ATTR_WIPHY_FREQ = 38
+NL80211_ATTR_SSID = 52
+
+NL80211_IFTYPE_STATION = 2
+NL80211_IFTYPE_AP = 3
+
+NL80211_STA_INFO_INACTIVE_TIME = 1
+NL80211_STA_INFO_RX_BYTES = 2
+NL80211_STA_INFO_TX_BYTES = 3
+NL80211_STA_INFO_SIGNAL = 7
+NL80211_STA_INFO_CONNECTED_TIME = 16
+
+NLMSG_HEADER = struct.Struct('=IHHII')
+GENL_HEADER = struct.Struct('=BBH')
+NLA_HEADER = struct.Struct('=HH')
+
+class NL80211Error(Exception):
+    """Erreur netlink (famille absente, interface inconnue, socket fermé...)"""
+
+# ===============================================================================
+# ENCODAGE / DÉCODAGE DES ATTRIBUTS
+# ===============================================================================
+
+def _align(length):
+    return (length + 3) & ~3
+
+def pack_attr(attr_type, data):
+    """Encode un attribut netlink (données brutes, alignées sur 4 octets)"""
+    length = NLA_HEADER.size + len(data)
+    return NLA_HEADER.pack(length, attr_type) + data + b'\x00' * (_align(length) - length)
+
+def pack_u32(attr_type, value):
+    return pack_attr(attr_type, struct.pack('=I', value))
+
+def pack_string(attr_type, value):
+    return pack_attr(attr_type, value.encode() + b'\x00')
+
+def parse_attrs(data, offset=0):
+    """Décode une suite d'attributs en {type: octets}"""
+    attrs = {}
+    end = len(data)
+    
+    while offset + NLA_HEADER.size <= end:
+        length, attr_type = NLA_HEADER.unpack_from(data, offset)
+        if length < NLA_HEADER.size:
+            break
+        attrs[attr_type & NLA_TYPE_MASK] = data[offset + NLA_HEADER.size:offset + length]
+        offset += _align(length)
+    
+    return attrs
+
+def attr_u32(attrs, attr_type, default=None):
+    value = attrs.get(attr_type)
+    return struct.unpack_from('=I', value)[0] if value and len(value) >= 4 else default
+
+def attr_s8(attrs, attr_type, default=None):
+    value = attrs.get(attr_type)
+    return struct.unpack_from('=b', value)[0] if value else default
+
+def attr_string(attrs, attr_type, default=None):
+    value = attrs.get(attr_type)
+    return value.split(b'\x00', 1)[0].decode(errors='replace') if value is not None else default
+
+def format_mac(data):
+    return ':'.join(f"{b:02x}" for b in data[:6])
+
+def iter_messages(data):
+    """Découpe un datagramme netlink en (type, séquence, corps)"""
+    offset = 0
+    while offset + NLMSG_HEADER.size <= len(data):
+        length, msg_type, _, seq, _ = NLMSG_HEADER.unpack_from(data, offset)
+        if length < NLMSG_HEADER.size:
+            raise NL80211Error("Message netlink tronqué")
+        yield msg_type, seq, data[offset + NLMSG_HEADER.size:offset + length]
+        offset += _align(length)
+
+# ===============================================================================
+# TRANSPORTS : SOCKET NETLINK, ENREGISTREMENT ET REJEU
+# ===============================================================================
+
+class NetlinkSocket:
+    """Socket netlink générique du noyau"""
+    
+    def __init__(self, timeout=2.0):
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_GENERIC)
+        self.sock.settimeout(timeout)
+        self.sock.bind((0, 0))
+    
+    def send(self, data):
+        self.sock.send(data)
+    
+    def recv(self):
+        return self.sock.recv(65536)
+    
+    def add_membership(self, group_id):
+        """Abonnement à un groupe multicast (notifications du noyau)"""
+        self.sock.setsockopt(SOL_NETLINK, NETLINK_ADD_MEMBERSHIP, group_id)
+    
+    def close(self):
+        self.sock.close()
+
+def _request_key(data):
+    """Clé d'une requête pour l'enregistrement : "<type>:<commande>" """
+    _, msg_type, _, _, _ = NLMSG_HEADER.unpack_from(data)
+    cmd = data[NLMSG_HEADER.size]
+    return f"{msg_type}:{cmd}"
+
+class RecordingSocket(NetlinkSocket):
+    """Socket netlink qui conserve les réponses brutes de chaque requête"""
+    
+    def __init__(self, path, timeout=2.0):
+        super().__init__(timeout)
+        self.path = path
+        self.exchanges = {}
+        self._key = None
+    
+    def send(self, data):
+        self._key = _request_key(data)
+        self.exchanges[self._key] = []
+        super().send(data)
+    
+    def recv(self):
+        data = super().recv()
+        self.exchanges[self._key].append(data.hex())
+        return data
+    
+    def save(self):
+        """Écrit (ou complète) la capture au format des fixtures"""
+        fixture = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                fixture = json.load(f)
+        
+        fixture.setdefault('nl80211', {}).setdefault('exchanges', {}).update(self.exchanges)
+        with open(self.path, 'w') as f:
+            json.dump(fixture, f, indent=2)
+
+class ReplaySocket:
+    """Rejoue les réponses enregistrées dans une fixture (sans noyau ni matériel)"""
+    
+    def __init__(self, exchanges):
+        self.exchanges = exchanges
+        self._pending = []
+    
+    def send(self, data):
+        key = _request_key(data)
+        if key not in self.exchanges:
+            raise NL80211Error(f"Requête {key} absente de la fixture")
+        
+        seq = NLMSG_HEADER.unpack_from(data)[3]
+        self._pending = [self._with_seq(bytes.fromhex(chunk), seq) for chunk in self.exchanges[key]]
+    
+    def recv(self):
+        if not self._pending:
+            raise socket.timeout("Fin de la fixture")
+        return self._pending.pop(0)
+    
+    def close(self):
+        self._pending = []
+    
+    @staticmethod
+    def _with_seq(chunk, seq):
+        """Remplace le numéro de séquence enregistré par celui de la requête"""
+        chunk = bytearray(chunk)
+        offset = 0
+        while offset + NLMSG_HEADER.size <= len(chunk):
+            length = NLMSG_HEADER.unpack_from(chunk, offset)[0]
+            if length < NLMSG_HEADER.size:
+                break
+            struct.pack_into('=I', chunk, offset + 8, seq)
+            offset += _align(length)
+        return bytes(chunk)
+
+class EventReplaySocket:
+    """Rejoue des notifications enregistrées, puis se comporte comme un socket muet"""
+    
+    def __init__(self, chunks, timeout=1.0):
+        self._pending = [bytes.fromhex(chunk) for chunk in chunks]
+        self.timeout = timeout
+    
+    def recv(self):
+        if not self._pending:
+            time.sleep(self.timeout)
+            raise socket.timeout("Fin de la fixture")
+        return self._pending.pop(0)
+    
+    def close(self):
+        self._pending = []
+
+# ===============================================================================
+# CLIENT NL80211
+# ===============================================================================
+
+class NL80211Client:
+    """Requêtes nl80211 sur un socket netlink persistant"""
+    
+    def __init__(self, transport=None):
+        self.transport = transport or NetlinkSocket()
+        self.seq = 0
+        self.family_id = None
+        self.mcast_groups = {}
+        self._resolve_family()
+    
+    def close(self):
+        self.transport.close()
+    
+    def request(self, msg_type, cmd, attrs=b'', dump=False, version=1):
+        """Envoie une requête et retourne la liste des (commande, attributs) reçus"""
+        self.seq += 1
+        flags = NLM_F_REQUEST | NLM_F_ACK | (NLM_F_DUMP if dump else 0)
+        payload = GENL_HEADER.pack(cmd, version, 0) + attrs
+        self.transport.send(NLMSG_HEADER.pack(NLMSG_HEADER.size + len(payload), msg_type, flags, self.seq, 0) + payload)
+        
+        replies = []
+        while True:
+            for reply_type, seq, body in iter_messages(self.transport.recv()):
+                if seq != self.seq:
+                    continue
+                
+                if reply_type == NLMSG_DONE:
+                    return replies
+                
+                if reply_type == NLMSG_ERROR:
+                    error = struct.unpack_from('=i', body)[0]
+                    if error:
+                        raise NL80211Error(f"Erreur netlink: {os.strerror(-error)}")
+                    # Acquittement : fin de la réponse
+                    return replies
+                
+                replies.append((body[0], parse_attrs(body, GENL_HEADER.size)))
+    
+    def _resolve_family(self):
+        """Identifiant de la famille nl80211 et de ses groupes multicast"""
+        replies = self.request(GENL_ID_CTRL, CTRL_CMD_GETFAMILY, pack_string(CTRL_ATTR_FAMILY_NAME, "nl80211"))
+        if not replies:
+            raise NL80211Error("Famille nl80211 introuvable")
+        
+        attrs = replies[0][1]
+        family_id = attrs.get(CTRL_ATTR_FAMILY_ID)
+        if not family_id:
+            raise NL80211Error("Famille nl80211 introuvable")
+        self.family_id = struct.unpack_from('=H', family_id)[0]
+        
+        # Groupes multicast (liste imbriquée d'attributs id/nom)
+        for group in parse_attrs(attrs.get(CTRL_ATTR_MCAST_GROUPS, b'')).values():
+            group_attrs = parse_attrs(group)
+            name = attr_string(group_attrs, 1)
+            group_id = attr_u32(group_attrs, 2)
+            if name and group_id is not None:
+                self.mcast_groups[name] = group_id
+    
+    def get_interface(self, ifindex):
+        """Informations de l'interface : nom, type, SSID, fréquence"""
+        replies = self.request(self.family_id, NL80211_CMD_GET_INTERFACE, pack_u32(NL80211_ATTR_IFINDEX, ifindex))
+        if not replies:
+            raise NL80211Error(f"Interface {ifindex} inconnue")
+        
+        attrs = replies[0][1]
+        return {
+            'ifname': attr_string(attrs, NL80211_ATTR_IFNAME),
+            'iftype': attr_u32(attrs, NL80211_ATTR_IFTYPE),
+            'ssid': attr_string(attrs, NL80211_ATTR_SSID),
+            'frequency': attr_u32(attrs, NL80211_ATTR_WIPHY_FREQ)
+        }
+    
+    def get_stations(self, ifindex):
+        """Stations associées à l'interface"""
+        replies = self.request(self.family_id, NL80211_CMD_GET_STATION, pack_u32(NL80211_ATTR_IFINDEX, ifindex), dump=True)
+        return [parse_station(attrs) for _, attrs in replies if NL80211_ATTR_MAC in attrs]
+
+def parse_station(attrs):
+    """Décode les attributs d'une station (NEW_STATION)"""
+    info = parse_attrs(attrs.get(NL80211_ATTR_STA_INFO, b''))
+    return {
+        'mac': format_mac(attrs[NL80211_ATTR_MAC]),
+        'connected_time': attr_u32(info, NL80211_STA_INFO_CONNECTED_TIME),
+        'inactive_time': attr_u32(info, NL80211_STA_INFO_INACTIVE_TIME),
+        'rx_bytes': attr_u32(info, NL80211_STA_INFO_RX_BYTES),
+        'tx_bytes': attr_u32(info, NL80211_STA_INFO_TX_BYTES),
+        'signal': attr_s8(info, NL80211_STA_INFO_SIGNAL)
+    }
+
+class NL80211Events:
+    """Notifications d'association/dissociation des stations d'une interface
+    
+    Socket dédié (les réponses aux requêtes ne s'y mélangent pas) abonné au
+    groupe multicast mlme ; read() attend au plus timeout secondes.
+    """
+    
+    def __init__(self, group_id, ifindex, transport=None, timeout=1.0):
+        self.ifindex = ifindex
+        self.transport = transport or NetlinkSocket(timeout)
+        if hasattr(self.transport, 'add_membership'):
+            self.transport.add_membership(group_id)
+    
+    def read(self):
+        """Retourne [('join'|'leave', station), ...] ([] si rien avant le timeout)"""
+        try:
+            data = self.transport.recv()
+        except socket.timeout:
+            return []
+        
+        events = []
+        for _, seq, body in iter_messages(data):
+            # Les notifications multicast ont un numéro de séquence nul
+            if seq != 0 or len(body) < GENL_HEADER.size:
+                continue
+            
+            cmd = body[0]
+            if cmd not in (NL80211_CMD_NEW_STATION, NL80211_CMD_DEL_STATION):
+                continue
+            
+            attrs = parse_attrs(body, GENL_HEADER.size)
+            if attr_u32(attrs, NL80211_ATTR_IFINDEX) != self.ifindex or NL80211_ATTR_MAC not in attrs:
+                continue
+            
+            kind = 'join' if cmd == NL80211_CMD_NEW_STATION else 'leave'
+            events.append((kind, parse_station(attrs)))
+        
+        return events
+    
+    def close(self):
+        self.transport.close()
+
+# ===============================================================================
+# BACKENDS DU COLLECTEUR
+# ===============================================================================
+
+IFTYPE_MODES = {
+    NL80211_IFTYPE_AP: 'AP',
+    NL80211_IFTYPE_STATION: 'client'
+}
+
+class NL80211Backend:
+    """État de l'AP et stations via nl80211 (aucun processus lancé)"""
+    
+    name = 'nl80211'
+    
+    def __init__(self, interface, transport=None, ifindex=None, event_chunks=None):
+        self.interface = interface
+        self.client = NL80211Client(transport)
+        self.ifindex = ifindex if ifindex is not None else socket.if_nametoindex(interface)
+        
+        # Notifications enregistrées (rejeu d'une fixture)
+        self.event_chunks = event_chunks
+    
+    def get_interface(self):
+        """{'mode': 'AP'|'client'|'unknown', 'ssid': ...}"""
+        info = self.client.get_interface(self.ifindex)
+        return {
+            'mode': IFTYPE_MODES.get(info['iftype'], 'unknown'),
+            'ssid': info['ssid']
+        }
+    
+    def get_stations(self):
+        """[{'mac': ..., 'connected_time': secondes}, ...]"""
+        return self.client.get_stations(self.ifindex)
+    
+    # Runtime asyncio : netlink répond sans attente, les appels synchrones suffisent
+    async def get_interface_async(self):
+        return self.get_interface()
+    
+    async def get_stations_async(self):
+        return self.get_stations()
+    
+    def open_events(self, transport=None):
+        """Ouvre le flux de notifications NEW_STATION/DEL_STATION"""
+        group_id = self.client.mcast_groups.get(NL80211_MULTICAST_MLME)
+        if group_id is None:
+            raise NL80211Error("Groupe multicast mlme absent")
+        if transport is None and self.event_chunks is not None:
+            transport = EventReplaySocket(self.event_chunks)
+        return NL80211Events(group_id, self.ifindex, transport)
+    
+    def close(self):
+        self.client.close()
+
+class IwBackend:
+    """Repli : analyse de la sortie texte de la commande iw"""
+    
+    name = 'iw'
+    
+    def __init__(self, interface, runner=None):
+        self.interface = interface
+        self.runner = runner or self._run
+    
+    @staticmethod
+    def _run(args):
+        result = subprocess.run(args, capture_output=True, text=True)
+        return result.returncode, result.stdout
+    
+    @staticmethod
+    async def _run_async(args):
+        """Exécution de iw sans bloquer la boucle asyncio"""
+        process = await asyncio.create_subprocess_exec(
+            *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        stdout, _ = await process.communicate()
+        return process.returncode, stdout.decode('utf-8', errors='replace')
+    
+    def _info_args(self):
+        return ['iw', 'dev', self.interface, 'info']
+    
+    def _station_args(self):
+        return ['iw', 'dev', self.interface, 'station', 'dump']
+    
+    def get_interface(self):
+        return self.parse_interface(*self.runner(self._info_args()))
+    
+    def get_stations(self):
+        return self.parse_stations(*self.runner(self._station_args()))
+    
+    async def get_interface_async(self):
+        return self.parse_interface(*await self._run_for_async(self._info_args()))
+    
+    async def get_stations_async(self):
+        return self.parse_stations(*await self._run_for_async(self._station_args()))
+    
+    async def _run_for_async(self, args):
+        # Runner fourni (rejeu d'une fixture) : pas de processus, appel direct
+        if self.runner is not self._run:
+            return self.runner(args)
+        return await self._run_async(args)
+    
+    @staticmethod
+    def parse_interface(returncode, output):
+        """Mode et SSID depuis la sortie de iw dev <interface> info"""
+        status = {'ssid': None, 'mode': 'unknown'}
+        
+        if returncode != 0:
+            return status
+        
+        for line in output.split('\n'):
+            if 'ssid' in line:
+                match = re.search(r'ssid\s+(.+)', line)
+                if match:
+                    status['ssid'] = match.group(1)
+            elif 'type' in line:
+                if 'AP' in line:
+                    status['mode'] = 'AP'
+                elif 'managed' in line:
+                    status['mode'] = 'client'
+        
+        return status
+    
+    @staticmethod
+    def parse_stations(returncode, output):
+        """Stations depuis la sortie de iw dev <interface> station dump"""
+        stations = []
+        
+        if returncode != 0:
+            return stations
+        
+        current = None
+        for line in output.split('\n'):
+            if line.startswith('Station'):
+                # Nouveau client
+                current = {'mac': line.split()[1], 'connected_time': None}
+                stations.append(current)
+            elif current is not None and 'connected time:' in line:
+                # Temps de connexion en secondes
+                match = re.search(r'connected time:\s*(\d+)', line)
+                if match:
+                    current['connected_time'] = int(match.group(1))
+        
+        return stations
+    
+    def close(self):
+        pass
+
+def load_fixture(path):
+    """Charge une fixture (captures nl80211 et/ou sorties iw)"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def fixture_runner(fixture):
+    """Remplace l'exécution de iw par les sorties enregistrées"""
+    outputs = fixture.get('iw', {})
+    
+    def run(args):
+        key = 'station_dump' if 'station' in args else 'info'
+        if key not in outputs:
+            return 1, ''
+        return 0, outputs[key]
+    return run
+
+def open_backend(interface, backend='auto', fixture_path=None, record_path=None):
+    """Ouvre le backend demandé ('nl80211', 'iw' ou 'auto' = nl80211 puis iw)"""
+    fixture = load_fixture(fixture_path) if fixture_path else None
+    
+    if backend in ('auto', 'nl80211'):
+        try:
+            if fixture is not None:
+                nl80211 = fixture.get('nl80211', {})
+                return NL80211Backend(interface, ReplaySocket(nl80211.get('exchanges', {})),
+                                      ifindex=nl80211.get('ifindex', 0),
+                                      event_chunks=nl80211.get('events', []))
+            
+            transport = RecordingSocket(record_path) if record_path else None
+            return NL80211Backend(interface, transport)
+        
+        except (NL80211Error, OSError) as e:
+            if backend == 'nl80211':
+                raise
+            logger.warning(f"nl80211 indisponible ({e}), repli sur iw")
+    
+    runner = fixture_runner(fixture) if fixture is not None else None
+    return IwBackend(interface, runner)
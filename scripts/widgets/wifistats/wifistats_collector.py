@@ -7,11 +7,8 @@ Version simplifiée : nom, MAC et uptime uniquement
 import os
 import sys
 import time
-import json
-import subprocess
-import re
 import logging
-from datetime import datetime
+import threading
 
 # Configuration du logging
 logging.basicConfig(
@@ -23,153 +20,135 @@ logging.basicConfig(
 )
 logger = logging.getLogger('wifistats')
 
-try:
-    import paho.mqtt.client as mqtt
-except ImportError:
-    logger.error("Module paho-mqtt non installé")
-    sys.exit(1)
+# Core commun des widgets (BaseCollector)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '_core'))
+from collector_base import BaseCollector
+from nl80211 import open_backend, IwBackend, NL80211Error
+from leases import LeaseCache
 
-class WiFiStatsCollector:
+class WiFiStatsCollector(BaseCollector):
+    # Pause au démarrage par défaut (STARTUP_DELAY)
+    default_startup_delay = 10
+    
+    # Récupération des clients mesurée par l'instrumentation
+    timed_methods = ('get_ap_clients',)
+    
     def __init__(self, config_file):
         """Initialise le collecteur"""
-        self.config = self.load_config(config_file)
-        self.mqtt_client = None
-        self.connected = False
+        super().__init__(config_file, 'wifistats')
         
         # Configuration
-        self.mqtt_config = self.config['mqtt']['broker']
         self.update_interval = self.config['collector']['update_intervals']['default']
         
-        # Configuration retry depuis l'environnement
-        self.retry_enabled = os.environ.get('MQTT_RETRY_ENABLED', 'true').lower() == 'true'
-        self.retry_delay = int(os.environ.get('MQTT_RETRY_DELAY', '10'))
-        self.max_retries = int(os.environ.get('MQTT_MAX_RETRIES', '0'))  # 0 = infini
-        
-        # Compteur de tentatives
-        self.connection_attempts = 0
-        
         # Interface WiFi (généralement wlan0)
         self.interface = "wlan0"
         
         # Cache pour stocker les temps de connexion
         self.client_first_seen = {}
         
-        # Statistiques
-        self.stats = {
-            'messages_sent': 0,
-            'errors': 0,
-            'start_time': time.time(),
-            'connection_failures': 0
-        }
+        # Noms DHCP (index MAC -> nom, relu seulement quand le fichier change)
+        self.leases = LeaseCache(os.environ.get('WIFISTATS_LEASES', "/var/lib/misc/dnsmasq.leases"))
+        
+        # Accès WiFi : nl80211 (socket persistant), iw en repli
+        self.backend_mode = self.config['collector'].get('backend', 'auto')
+        self.backend = None
         
-        logger.info(f"Collecteur WiFi Stats simplifié initialisé - Version {self.config['widget']['version']}")
+        # Rejeu d'une capture (tests sans matériel) ou enregistrement des réponses nl80211
+        self.fixture_path = os.environ.get('WIFISTATS_FIXTURE')
+        self.record_path = os.environ.get('WIFISTATS_RECORD')
+        
+        # Mode "events" : suivi des associations en temps réel + instantané périodique
+        self.mode = self.config['collector'].get('mode', 'poll')
+        self.snapshot_interval = self.config['collector']['update_intervals'].get('snapshot', 60)
+        self.events = None
+        self.events_thread = None
+        self.events_stop = threading.Event()
+        
+        # Table des stations : MAC -> instant d'association (horloge monotone)
+        self.stations = {}
+        self.stations_lock = threading.Lock()
+        
+        # Partagés avec le thread des événements : socket netlink des requêtes,
+        # publications (statistiques, tampon disque) et cache des baux
+        self.backend_lock = threading.Lock()
+        self.publish_lock = threading.Lock()
+        self.leases_lock = threading.Lock()
     
-    def load_config(self, config_file):
-        """Charge la configuration"""
-        try:
-            with open(config_file, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Erreur chargement config: {e}")
-            sys.exit(1)
+    def on_mqtt_connected(self):
+        """Aucun abonnement nécessaire"""
+        pass
     
-    def connect_mqtt(self):
-        """Connexion au broker MQTT avec retry robuste"""
-        while True:
+    def initialize(self):
+        """Ouvre le backend WiFi (une seule fois)"""
+        self.backend = open_backend(self.interface, self.backend_mode,
+                                    self.fixture_path, self.record_path)
+        logger.info(f"Backend WiFi: {self.backend.name}"
+                    + (f" (fixture {self.fixture_path})" if self.fixture_path else ""))
+        
+        if self.mode == 'events':
             try:
-                self.connection_attempts += 1
-                
-                if self.max_retries > 0 and self.connection_attempts > self.max_retries:
-                    logger.error(f"Limite de tentatives atteinte ({self.max_retries})")
-                    return False
-                
-                logger.info(f"Tentative de connexion MQTT #{self.connection_attempts}")
-                
-                self.mqtt_client = mqtt.Client()
-                self.mqtt_client.on_connect = lambda c,u,f,rc: self._on_connect(rc)
-                self.mqtt_client.on_disconnect = lambda c,u,rc: self._on_disconnect(rc)
-                
-                self.mqtt_client.username_pw_set(
-                    self.mqtt_config['username'],
-                    self.mqtt_config['password']
-                )
-                
-                self.mqtt_client.reconnect_delay_set(min_delay=1, max_delay=120)
-                
-                self.mqtt_client.connect(
-                    self.mqtt_config['host'], 
-                    self.mqtt_config['port'], 
-                    60
-                )
-                
-                self.mqtt_client.loop_start()
-                
-                timeout = 30
-                while not self.connected and timeout > 0:
-                    time.sleep(0.5)
-                    timeout -= 0.5
-                
-                if self.connected:
-                    logger.info("Connexion MQTT établie avec succès")
-                    self.stats['connection_failures'] = 0
-                    return True
-                else:
-                    raise Exception("Timeout de connexion")
-                
+                self.events = self.backend.open_events()
+            except (AttributeError, NL80211Error, OSError) as e:
+                # Backend iw ou noyau sans notifications : retour au polling
+                logger.warning(f"Notifications nl80211 indisponibles ({e}), mode polling")
+                self.mode = 'poll'
+                return
+            
+            # Table initiale avant la première notification
+            try:
+                self._sync_stations(self._query('get_stations'))
             except Exception as e:
-                self.stats['connection_failures'] += 1
-                logger.error(f"Erreur connexion MQTT: {e}")
-                
-                if self.mqtt_client:
-                    try:
-                        self.mqtt_client.loop_stop()
-                    except:
-                        pass
-                
-                if not self.retry_enabled:
-                    return False
-                
-                logger.info(f"Nouvelle tentative dans {self.retry_delay} secondes...")
-                time.sleep(self.retry_delay)
+                logger.error(f"Erreur lecture initiale des stations: {e}")
+            
+            self.events_stop.clear()
+            self.events_thread = threading.Thread(target=self._events_loop, name="wifi-events", daemon=True)
+            self.events_thread.start()
+            logger.info(f"Mode événements : deltas immédiats, instantané toutes les {self.snapshot_interval}s")
     
-    def _on_connect(self, rc):
-        """Callback de connexion"""
-        if rc == 0:
-            logger.info("Connecté au broker MQTT")
-            self.connected = True
-        else:
-            logger.error(f"Échec connexion MQTT, code: {rc}")
+    def cleanup(self):
+        """Arrête le suivi des événements et ferme les sockets netlink"""
+        self.events_stop.set()
+        if self.events_thread:
+            self.events_thread.join(timeout=5)
+            self.events_thread = None
+        if self.events:
+            self.events.close()
+            self.events = None
+        if self.backend:
+            self.backend.close()
     
-    def _on_disconnect(self, rc):
-        """Callback de déconnexion"""
-        logger.warning(f"Déconnecté du broker MQTT (code: {rc})")
-        self.connected = False
-        self.stats['connection_failures'] += 1
+    def _query(self, method):
+        """Appel au backend, avec repli définitif sur iw si nl80211 échoue en mode auto"""
+        with self.backend_lock:
+            try:
+                return getattr(self.backend, method)()
+            except (NL80211Error, OSError) as e:
+                self._fallback_to_iw(e)
+                return getattr(self.backend, method)()
     
-    def publish_data(self, topic, data):
-        """Publie des données sur MQTT"""
-        if not self.connected:
-            return False
+    async def _aquery(self, method):
+        """Variante asynchrone de _query (runtime asyncio) : iw est attendu sans bloquer"""
+        # netlink répond sans attente : appel synchrone sous le verrou du socket
+        if self.backend.name == 'nl80211':
+            return self._query(method)
         
         try:
-            payload = {
-                "timestamp": datetime.utcnow().isoformat() + "Z",
-                **data
-            }
-            
-            result = self.mqtt_client.publish(topic, json.dumps(payload), qos=1)
-            
-            if result.rc == 0:
-                self.stats['messages_sent'] += 1
-                return True
-            else:
-                self.stats['errors'] += 1
-                return False
-            
-        except Exception as e:
-            logger.error(f"Erreur publication: {e}")
-            self.stats['errors'] += 1
-            return False
+            return await getattr(self.backend, f"{method}_async")()
+        except (NL80211Error, OSError) as e:
+            self._fallback_to_iw(e)
+            return await getattr(self.backend, f"{method}_async")()
+    
+    def _fallback_to_iw(self, error):
+        """Remplace le backend nl80211 par iw, ou relève l'erreur si le repli n'est pas permis"""
+        if self.backend.name != 'nl80211' or self.backend_mode != 'auto' or self.fixture_path:
+            raise error
+        logger.warning(f"Erreur nl80211 ({error}), repli sur iw")
+        self.backend.close()
+        self.backend = IwBackend(self.interface)
+    
+    def get_update_interval(self):
+        """Intervalle de publication (instantané basse fréquence en mode événements)"""
+        return self.snapshot_interval if self.mode == 'events' else self.update_interval
     
     def format_uptime(self, seconds):
         """Formate l'uptime en format lisible"""
@@ -181,76 +160,52 @@ class WiFiStatsCollector:
         # Format complet avec padding : 00j 00h 00m 00s
         return f"{days:02d}j {hours:02d}h {minutes:02d}m {secs:02d}s"
     
-    def get_ap_clients(self):
+    def get_ap_clients(self, status=None):
         """Récupère la liste simplifiée des clients connectés"""
-        clients = []
-        
         try:
             # Vérifier que l'interface existe et est en mode AP
-            check_cmd = f"iw dev {self.interface} info"
-            check_result = subprocess.run(check_cmd.split(), capture_output=True, text=True)
+            if status is None:
+                status = self._query('get_interface')
             
-            if check_result.returncode != 0 or 'type AP' not in check_result.stdout:
+            if status['mode'] != 'AP':
                 logger.debug("Interface non en mode AP ou non disponible")
-                return clients
+                return []
             
-            # Utiliser iw pour lister les stations
-            cmd = f"iw dev {self.interface} station dump"
-            result = subprocess.run(cmd.split(), capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                current_client = {}
-                
-                for line in result.stdout.split('\n'):
-                    if line.startswith('Station'):
-                        # Nouveau client
-                        if current_client and 'mac' in current_client:
-                            clients.append(current_client)
-                        
-                        mac = line.split()[1]
-                        current_client = {'mac': mac}
-                        
-                    elif 'connected time:' in line:
-                        # Temps de connexion en secondes
-                        match = re.search(r'connected time:\s*(\d+)', line)
-                        if match:
-                            connected_seconds = int(match.group(1))
-                            current_client['uptime'] = self.format_uptime(connected_seconds)
-                
-                # Ajouter le dernier client
-                if current_client and 'mac' in current_client:
-                    clients.append(current_client)
-            
-            # Enrichir avec les noms depuis DHCP
-            self._enrich_with_names(clients)
+            return self._build_clients(self._query('get_stations'))
             
         except Exception as e:
             logger.error(f"Erreur récupération clients: {e}")
             self.stats['errors'] += 1
+            return []
+    
+    def _build_clients(self, stations):
+        """Clients (MAC, uptime, nom) à partir d'un dump des stations"""
+        # Mode événements : le dump périodique corrige la table des stations
+        if self.mode == 'events':
+            self._sync_stations(stations)
+        
+        clients = []
+        for station in stations:
+            client = {'mac': station['mac']}
+            if station.get('connected_time') is not None:
+                client['uptime'] = self.format_uptime(station['connected_time'])
+            clients.append(client)
+        
+        # Enrichir avec les noms depuis DHCP
+        self._enrich_with_names(clients)
         
         return clients
     
     def _enrich_with_names(self, clients):
         """Ajoute uniquement les noms des devices"""
-        try:
-            # Lire le fichier de leases dnsmasq
-            leases_file = "/var/lib/misc/dnsmasq.leases"
-            if os.path.exists(leases_file):
-                with open(leases_file, 'r') as f:
-                    for line in f:
-                        parts = line.strip().split()
-                        if len(parts) >= 4:
-                            mac = parts[1].lower()
-                            name = parts[3] if parts[3] != '*' else None
-                            
-                            # Chercher le client correspondant
-                            for client in clients:
-                                if client.get('mac', '').lower() == mac:
-                                    if name and name != '*':
-                                        client['name'] = name
-                                    break
-        except Exception as e:
-            logger.debug(f"Impossible de lire les leases DHCP: {e}")
+        # Le fichier de leases dnsmasq n'est relu que s'il a changé
+        with self.leases_lock:
+            self.leases.refresh()
+            
+            for client in clients:
+                name = self.leases.lookup(client['mac'])
+                if name:
+                    client['name'] = name
         
         # Si pas de nom, utiliser un nom générique basé sur le MAC
         for client in clients:
@@ -274,129 +229,156 @@ class WiFiStatsCollector:
         }
         
         try:
-            cmd = f"iw dev {self.interface} info"
-            result = subprocess.run(cmd.split(), capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                for line in result.stdout.split('\n'):
-                    if 'ssid' in line:
-                        match = re.search(r'ssid\s+(.+)', line)
-                        if match:
-                            status['ssid'] = match.group(1)
-                    elif 'type' in line:
-                        if 'AP' in line:
-                            status['mode'] = 'AP'
-                        elif 'managed' in line:
-                            status['mode'] = 'client'
-        
+            status.update(self._query('get_interface'))
         except Exception as e:
             logger.error(f"Erreur récupération status AP: {e}")
         
         return status
     
+    def _events_loop(self):
+        """Thread de lecture des notifications NEW_STATION/DEL_STATION"""
+        while not self.events_stop.is_set():
+            try:
+                for kind, station in self.events.read():
+                    self._apply_event(kind, station)
+            except Exception as e:
+                if self.events_stop.is_set():
+                    break
+                logger.error(f"Erreur lecture notifications nl80211: {e}")
+                self.stats['errors'] += 1
+                self.events_stop.wait(1)
+    
+    def _apply_event(self, kind, station):
+        """Met à jour la table des stations et publie le delta"""
+        mac = station['mac']
+        
+        # NEW_STATION ne porte pas toujours la durée d'association : station relue
+        connected = station.get('connected_time')
+        if kind == 'join' and connected is None:
+            connected = self._station_connected_time(mac)
+        
+        with self.stations_lock:
+            if kind == 'join':
+                if mac in self.stations:
+                    return
+                self.stations[mac] = time.monotonic() - connected
+            else:
+                if self.stations.pop(mac, None) is None:
+                    return
+            count = len(self.stations)
+        
+        delta = {"type": "delta", "joined": [], "left": [], "count": count}
+        if kind == 'join':
+            delta["joined"].append(self._format_client(mac, connected))
+            logger.info(f"Client associé: {mac}")
+        else:
+            delta["left"].append(mac)
+            logger.info(f"Client dissocié: {mac}")
+        
+        self.publish_data("rpi/network/wifi/clients", delta)
+    
+    def _station_connected_time(self, mac):
+        """Durée d'association d'une station (secondes, 0 si inconnue)"""
+        try:
+            for station in self._query('get_stations'):
+                if station['mac'] == mac:
+                    return station.get('connected_time') or 0
+        except Exception as e:
+            logger.debug(f"Lecture de la station {mac} impossible: {e}")
+        return 0
+    
+    def publish_data(self, topic, data, retain=False):
+        """Publication sérialisée avec le thread des événements (deltas)"""
+        with self.publish_lock:
+            return super().publish_data(topic, data, retain)
+    
+    def _format_client(self, mac, connected_seconds):
+        """Client au format publié (nom, MAC, uptime)"""
+        client = {'mac': mac, 'uptime': self.format_uptime(int(connected_seconds))}
+        self._enrich_with_names([client])
+        return {
+            'name': client.get('name', 'Unknown'),
+            'mac': mac,
+            'uptime': client['uptime']
+        }
+    
+    def _sync_stations(self, stations):
+        """Resynchronise la table avec un dump complet (événements éventuellement perdus)"""
+        now = time.monotonic()
+        with self.stations_lock:
+            self.stations = {
+                station['mac']: now - (station.get('connected_time') or 0)
+                for station in stations
+            }
+    
     def collect_and_publish(self):
         """Collecte et publie les données simplifiées"""
         try:
-            # Récupérer les clients
-            clients = self.get_ap_clients()
+            # Une seule requête d'interface par cycle (status et vérification du mode AP)
+            status = self.get_ap_status()
             
-            # Format simplifié : juste nom, MAC et uptime
-            simplified_clients = []
-            for client in clients:
-                simplified_clients.append({
-                    'name': client.get('name', 'Unknown'),
-                    'mac': client.get('mac', ''),
-                    'uptime': client.get('uptime', '0s')
-                })
+            # Récupérer les clients
+            clients = self.get_ap_clients(status)
             
-            # Publier la liste des clients
-            self.publish_data("rpi/network/wifi/clients", {
-                "clients": simplified_clients,
-                "count": len(simplified_clients)
-            })
+            self._publish_snapshot(status, clients)
             
-            # Récupérer et publier le status minimal
-            status = self.get_ap_status()
-            status['clients_count'] = len(clients)
+        except Exception as e:
+            logger.error(f"Erreur collecte/publication: {e}")
+            self.stats['errors'] += 1
+    
+    async def collect(self):
+        """Collecte asynchrone (runtime asyncio) : les appels à iw n'arrêtent pas la boucle"""
+        try:
+            status = {'ssid': None, 'mode': 'unknown'}
+            try:
+                status.update(await self._aquery('get_interface'))
+            except Exception as e:
+                logger.error(f"Erreur récupération status AP: {e}")
             
-            self.publish_data("rpi/network/wifi/status", status)
+            clients = []
+            if status['mode'] == 'AP':
+                try:
+                    clients = self._build_clients(await self._aquery('get_stations'))
+                except Exception as e:
+                    logger.error(f"Erreur récupération clients: {e}")
+                    self.stats['errors'] += 1
+            else:
+                logger.debug("Interface non en mode AP ou non disponible")
             
-            logger.debug(f"Données publiées - {len(clients)} clients")
+            self._publish_snapshot(status, clients)
             
         except Exception as e:
             logger.error(f"Erreur collecte/publication: {e}")
             self.stats['errors'] += 1
     
-    def log_statistics(self):
-        """Affiche les statistiques"""
-        runtime = time.time() - self.stats['start_time']
-        hours = int(runtime // 3600)
-        minutes = int((runtime % 3600) // 60)
-        
-        logger.info(
-            f"Stats - Runtime: {hours}h {minutes}m | "
-            f"Messages: {self.stats['messages_sent']} | "
-            f"Erreurs: {self.stats['errors']}"
-        )
-    
-    def run(self):
-        """Boucle principale"""
-        logger.info("Démarrage du collecteur WiFi Stats simplifié")
+    def _publish_snapshot(self, status, clients):
+        """Publie l'instantané des clients et le status de l'AP"""
+        # Format simplifié : juste nom, MAC et uptime
+        simplified_clients = []
+        for client in clients:
+            simplified_clients.append({
+                'name': client.get('name', 'Unknown'),
+                'mac': client.get('mac', ''),
+                'uptime': client.get('uptime', '0s')
+            })
         
-        startup_delay = int(os.environ.get('STARTUP_DELAY', '10'))
-        if startup_delay > 0:
-            logger.info(f"Pause de {startup_delay}s au démarrage...")
-            time.sleep(startup_delay)
+        # Publier la liste des clients
+        self.publish_data("rpi/network/wifi/clients", {
+            "type": "snapshot",
+            "clients": simplified_clients,
+            "count": len(simplified_clients)
+        })
         
-        if not self.connect_mqtt():
-            logger.error("Impossible de se connecter au broker MQTT")
-            return
+        # Publier le status minimal
+        status['clients_count'] = len(clients)
         
-        logger.info("Collecteur opérationnel")
+        self.publish_data("rpi/network/wifi/status", status)
         
-        stats_counter = 0
-        error_count = 0
+        logger.debug(f"Données publiées - {len(clients)} clients")
         
-        try:
-            while True:
-                try:
-                    if not self.connected:
-                        logger.warning("Connexion MQTT perdue, reconnexion...")
-                        if not self.connect_mqtt():
-                            logger.error("Reconnexion échouée")
-                            break
-                    
-                    self.collect_and_publish()
-                    
-                    stats_counter += 1
-                    if stats_counter >= (300 // self.update_interval):
-                        self.log_statistics()
-                        stats_counter = 0
-                    
-                    error_count = 0
-                    time.sleep(self.update_interval)
-                    
-                except Exception as e:
-                    error_count += 1
-                    logger.error(f"Erreur dans la boucle: {e}")
-                    self.stats['errors'] += 1
-                    
-                    if error_count > 10:
-                        logger.error("Trop d'erreurs consécutives")
-                        break
-                    
-                    time.sleep(10)
-                
-        except KeyboardInterrupt:
-            logger.info("Arrêt demandé")
-        finally:
-            if self.mqtt_client:
-                self.mqtt_client.loop_stop()
-                self.mqtt_client.disconnect()
-            
-            self.log_statistics()
-            logger.info("Collecteur arrêté")
-
+        if self.record_path and self.backend.name == 'nl80211':
+            self.backend.client.transport.save()
+    
 if __name__ == "__main__":
     config_file = os.environ.get('CONFIG_FILE')
     